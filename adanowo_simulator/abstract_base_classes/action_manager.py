@@ -1,6 +1,13 @@
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+import numpy as np
 from omegaconf import DictConfig
 
+if TYPE_CHECKING:
+    import torch
+
 
 class AbstractActionManager(ABC):
     """Abstract class for an action manager.
@@ -85,3 +92,44 @@ class AbstractActionManager(ABC):
     def close(self) -> None:
         """Closes the action manager."""
         pass
+
+    def evaluate_setpoints(self, setpoints: dict[str, np.ndarray], disturbances: dict[str, float | np.ndarray]) -> \
+            tuple[dict[str, np.ndarray], np.ndarray, np.ndarray]:
+        """Calculates the dependent variables of a batch of setpoints (arrays of equal length) and checks the bounds.
+
+        Returns
+        -------
+        dict[str, np.ndarray]
+            Dependent variables by name.
+        np.ndarray
+            Whether each point satisfies all setpoint bounds.
+        np.ndarray
+            Whether each point satisfies all dependent variable bounds.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot evaluate batches of setpoints.")
+
+    def evaluate_setpoints_differentiable(self, setpoints: dict[str, torch.Tensor],
+                                          disturbances: dict[str, torch.Tensor]) -> \
+            tuple[dict[str, torch.Tensor], dict[str, torch.Tensor], dict[str, torch.Tensor]]:
+        """Calculates the dependent variables and the constraint margins of a batch of setpoints (float64 tensors of
+        equal length) so that autograd can differentiate them with respect to the setpoints.
+
+        Returns
+        -------
+        dict[str, torch.Tensor]
+            Dependent variables by name.
+        dict[str, torch.Tensor]
+            Margin of each setpoint bound, e.g. "ProductionSpeedSetpoint.lower". A bound is satisfied if its margin is
+            not negative.
+        dict[str, torch.Tensor]
+            Margin of each dependent variable bound.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot differentiate setpoints.")
+
+    def snapshot(self) -> dict:
+        """Returns the state that changes during an episode as plain Python objects, see :py:meth:'restore'."""
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
+
+    def restore(self, snapshot: dict) -> None:
+        """Restores a state returned by :py:meth:'snapshot' without resetting."""
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
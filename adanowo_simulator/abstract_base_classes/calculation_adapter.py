@@ -1,5 +1,11 @@
+from __future__ import annotations
+
 import numpy as np
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import torch
 
 
 class AbstractCalculationAdapter(ABC):
@@ -14,3 +20,7 @@ class AbstractCalculationAdapter(ABC):
     def calculate(self, X: dict[str, float]) -> np.array:
         """Performs a calculation."""
         pass
+
+    def calculate_differentiable(self, X: dict[str, torch.Tensor]) -> torch.Tensor:
+        """Performs the calculation for inputs 'X' (tensors of equal length) so that autograd can differentiate it."""
+        raise NotImplementedError(f"{type(self).__name__} is not differentiable.")
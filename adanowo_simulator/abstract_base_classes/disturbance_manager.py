@@ -33,3 +33,11 @@ class AbstractDisturbanceManager(ABC):
     def close(self) -> None:
         """Closes the disturbance manager."""
         pass
+
+    def snapshot(self) -> dict:
+        """Returns the state that changes during an episode as plain Python objects, see :py:meth:'restore'."""
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
+
+    def restore(self, snapshot: dict) -> None:
+        """Restores a state returned by :py:meth:'snapshot' without resetting."""
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
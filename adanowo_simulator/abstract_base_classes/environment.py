@@ -167,3 +167,29 @@ class AbstractEnvironment(ABC):
         Thus, it is recommended to always call it if the environment is not needed anymore.
         """
         pass
+
+    def snapshot(self) -> bytes:
+        """
+        Returns the state of the environment and its members (except the experiment tracker) in serialized form.
+        Pass it to :py:meth:'restore' to continue from this state, e.g. to branch several times from the same state.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
+
+    def restore(self, snapshot: bytes) -> None:
+        """Restores a state returned by :py:meth:'snapshot' without resetting."""
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
+
+    def rollout(self, action_sequence: list[dict[str, float]] | dict[str, list[float]], num_samples: int = 1) -> dict:
+        """
+        Simulates a sequence of actions from the current state without changing the environment and returns the stacked
+        objective values, states, outputs and constraint flags. 'num_samples' noise realizations of the outputs are
+        sampled per step.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support rollouts.")
+
+    def evaluate_gradient(self, setpoints: dict[str, float] | None = None) -> dict:
+        """
+        Evaluates the objective and the constraint margins at 'setpoints' (the current ones by default) without
+        changing the environment and returns them with their gradients with respect to the used setpoints.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support gradients.")
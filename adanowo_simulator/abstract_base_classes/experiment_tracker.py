@@ -21,6 +21,12 @@ class AbstractExperimentTracker(ABC):
     def config(self, c):
         pass
 
+    @property
+    def consumes_log_variables(self) -> bool:
+        """Whether the tracker uses the log variables passed to step() and reset(). If not, the environment may pass
+        empty dicts instead of compiling the log variables."""
+        return True
+
     @abstractmethod
     def step(self, log_variables: dict[str, dict[str, float]], step_index: int) -> None:
         """Performs a variable log.
@@ -1,6 +1,12 @@
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
 import numpy as np
 
+if TYPE_CHECKING:
+    import torch
+
 
 class AbstractModelAdapter(ABC):
     """Abstract class for a model adapter.
@@ -49,6 +55,16 @@ class AbstractModelAdapter(ABC):
         """
         pass
 
+    def predict_mean_differentiable(self, X: dict[str, torch.Tensor]) -> torch.Tensor:
+        """Applies the underlying model to inputs 'X' (float64 tensors of equal length) and returns the mean as a
+        float64 tensor of the same length, which can be differentiated with respect to the inputs by autograd."""
+        raise NotImplementedError(f"{type(self).__name__} is not differentiable.")
+
+    def share_memory(self) -> None:
+        """Prepares the model to be shared with forked worker processes, e.g. by moving its tensors to shared memory
+        and computing prediction caches. Models without large state do not need to do anything."""
+        pass
+
     @abstractmethod
     def close(self) -> None:
         pass
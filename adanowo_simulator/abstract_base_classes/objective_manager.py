@@ -1,6 +1,13 @@
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+import numpy as np
 from omegaconf import DictConfig
 
+if TYPE_CHECKING:
+    import torch
+
 
 class AbstractObjectiveManager(ABC):
     """Abstract class for an objective manager.
@@ -83,3 +90,35 @@ class AbstractObjectiveManager(ABC):
     def close(self) -> None:
         """Closes the objective manager."""
         pass
+
+    def evaluate_samples(self, state: dict[str, float], outputs: dict[str, np.ndarray], setpoint_constraints_met: bool,
+                         dependent_variable_constraints_met: bool, output_bounds: dict[str, dict[str, float | None]]) \
+            -> tuple[np.ndarray, np.ndarray]:
+        """Calculates the objective values of several samples of the outputs (arrays of equal length) of one state.
+
+        Unlike :py:meth:'step', the constraints of the state are passed as a whole and the output bounds are passed
+        explicitly, so that samples of past steps can be evaluated, too.
+
+        Returns
+        -------
+        np.ndarray
+            Objective value of each sample.
+        np.ndarray
+            Whether each sample satisfies all output bounds.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot evaluate samples.")
+
+    def evaluate_differentiable(self, state: dict[str, torch.Tensor], outputs: dict[str, torch.Tensor],
+                                output_bounds: dict[str, dict[str, float | None]]) \
+            -> tuple[torch.Tensor, dict[str, torch.Tensor]]:
+        """Calculates the objective value without penalty and the margins of the output bounds (a bound is satisfied
+        if its margin is not negative) for tensors of equal length, so that autograd can differentiate them."""
+        raise NotImplementedError(f"{type(self).__name__} cannot differentiate the objective.")
+
+    def snapshot(self) -> dict:
+        """Returns the state that changes during an episode as plain Python objects, see :py:meth:'restore'."""
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
+
+    def restore(self, snapshot: dict) -> None:
+        """Restores a state returned by :py:meth:'snapshot' without resetting."""
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
@@ -1,6 +1,13 @@
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+import numpy as np
 from omegaconf import DictConfig
 
+if TYPE_CHECKING:
+    import torch
+
 
 class AbstractOutputManager(ABC):
     """Abstract class for an output manager.
@@ -36,3 +43,34 @@ class AbstractOutputManager(ABC):
         """Closes the output manager."""
         pass
 
+    def prefetch_models(self, output_models: dict[str, str]) -> None:
+        """
+        Announces that outputs will be switched to other models later, e.g. by a scenario. Output managers that load
+        models can start loading them in the background. The default does nothing.
+        """
+        pass
+
+    def snapshot(self) -> dict:
+        """Returns the state that changes during an episode as plain Python objects, see :py:meth:'restore'."""
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
+
+    def restore(self, snapshot: dict) -> None:
+        """Restores a state returned by :py:meth:'snapshot' without resetting."""
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
+
+    def predict(self, X: dict[str, np.ndarray], output_models: dict[str, str] | None = None) \
+            -> tuple[dict[str, np.ndarray], dict[str, np.ndarray]]:
+        """
+        Returns the means and variances of the output distributions for a batch of states (arrays of equal length) by
+        output name, without sampling. With 'output_models' (model names by output name), these models are used instead
+        of those of the :py:attr:'config', and models that are not allocated are loaded only for this call, so the
+        allocated and prefetched models are not changed. Output managers without models do not support this.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot predict outputs.")
+
+    def predict_differentiable(self, X: dict[str, torch.Tensor]) -> dict[str, torch.Tensor]:
+        """
+        Returns the means of the output distributions for a batch of states (float64 tensors of equal length) by
+        output name as tensors that autograd can differentiate with respect to the states.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot differentiate outputs.")
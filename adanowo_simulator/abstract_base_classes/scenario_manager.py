@@ -25,9 +25,11 @@ class AbstractScenarioManager(ABC):
 
     @abstractmethod
     def step(self, step_index: int, disturbance_manager: AbstractDisturbanceManager,
-             output_manager: AbstractOutputManager, objective_manager: AbstractObjectiveManager) -> None:
+             output_manager: AbstractOutputManager, objective_manager: AbstractObjectiveManager,
+             prefetch: bool = True) -> None:
         """Changes the :py:attr:'config' of the passed environment members.
-        Parameter 'step_index' may be important to determine what to change."""
+        Parameter 'step_index' may be important to determine what to change. Without 'prefetch', upcoming output models
+        are not announced to the output manager, e.g. for steps of a lookahead that are undone afterwards."""
         pass
 
     def reset(self) -> None:
@@ -38,3 +40,11 @@ class AbstractScenarioManager(ABC):
     def close(self) -> None:
         """Closes the scenario manager."""
         pass
+
+    def snapshot(self) -> dict:
+        """Returns the state that changes during an episode as plain Python objects, see :py:meth:'restore'."""
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
+
+    def restore(self, snapshot: dict) -> None:
+        """Restores a state returned by :py:meth:'snapshot' without resetting."""
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots.")
@@ -1,13 +1,21 @@
+from __future__ import annotations
+
 from omegaconf import DictConfig, OmegaConf
 import importlib
 import pathlib as pl
 import logging
 import sys
 from copy import copy
+from typing import TYPE_CHECKING
+
+import numpy as np
 
 from adanowo_simulator.abstract_base_classes.action_manager import AbstractActionManager
 from adanowo_simulator.calculation_adapter import CalculationAdapter
 
+if TYPE_CHECKING:
+    import torch
+
 logger = logging.getLogger(__name__)
 
 DEFAULT_RELATIVE_PATH = "dependent_variable_calculations"
@@ -93,6 +101,57 @@ class ActionManager(AbstractActionManager):
     def close(self) -> None:
         self._ready = False
 
+    def evaluate_setpoints(self, setpoints: dict[str, np.ndarray], disturbances: dict[str, float | np.ndarray]) -> \
+            tuple[dict[str, np.ndarray], np.ndarray, np.ndarray]:
+        if not self._ready:
+            raise RuntimeError("Cannot call evaluate_setpoints() before calling reset().")
+        point_count = len(next(iter(setpoints.values())))
+        X = {name: np.broadcast_to(value, (point_count,)) for name, value in (setpoints | disturbances).items()}
+        dependent_variables = {name: calculation.calculate(X)
+                               for name, calculation in self._dependent_variable_calculations.items()}
+
+        def check_constraints(boundaries_to_check: DictConfig, actual_vars: dict[str, np.ndarray]) -> np.ndarray:
+            constraints_satisfied = np.ones(point_count, dtype=bool)
+            for ctrl_name, boundaries in boundaries_to_check.items():
+                lower, upper = boundaries.get("lower"), boundaries.get("upper")
+                if lower is not None:
+                    constraints_satisfied &= ~(actual_vars[ctrl_name] < lower)
+                if upper is not None:
+                    constraints_satisfied &= ~(actual_vars[ctrl_name] > upper)
+            return constraints_satisfied
+
+        return dependent_variables, check_constraints(self._config.setpoint_bounds, X), \
+            check_constraints(self._config.dependent_variable_bounds, dependent_variables)
+
+    def evaluate_setpoints_differentiable(self, setpoints: dict[str, torch.Tensor],
+                                          disturbances: dict[str, torch.Tensor]) -> \
+            tuple[dict[str, torch.Tensor], dict[str, torch.Tensor], dict[str, torch.Tensor]]:
+        if not self._ready:
+            raise RuntimeError("Cannot call evaluate_setpoints_differentiable() before calling reset().")
+        X = setpoints | disturbances
+        dependent_variables = {name: calculation.calculate_differentiable(X)
+                               for name, calculation in self._dependent_variable_calculations.items()}
+
+        def constraint_margins(boundaries_to_check: DictConfig, actual_vars: dict[str, torch.Tensor]) \
+                -> dict[str, torch.Tensor]:
+            margins = dict()
+            for ctrl_name, boundaries in boundaries_to_check.items():
+                lower, upper = boundaries.get("lower"), boundaries.get("upper")
+                if lower is not None:
+                    margins[f"{ctrl_name}.lower"] = actual_vars[ctrl_name] - lower
+                if upper is not None:
+                    margins[f"{ctrl_name}.upper"] = upper - actual_vars[ctrl_name]
+            return margins
+
+        return dependent_variables, constraint_margins(self._config.setpoint_bounds, X), \
+            constraint_margins(self._config.dependent_variable_bounds, dependent_variables)
+
+    def snapshot(self) -> dict:
+        return {"setpoints": copy(self._setpoints)}
+
+    def restore(self, snapshot: dict) -> None:
+        self._setpoints = copy(snapshot["setpoints"])
+
     def _constraints_satisfied(self, setpoints: dict[str, float], dependent_variables: dict[str, float]) -> \
             tuple[dict[str, bool], dict[str, bool]]:
         def check_constraints(boundaries_to_check: DictConfig, actual_vars: dict[str, float]):
@@ -1,8 +1,14 @@
+from __future__ import annotations
+
 from types import ModuleType, MethodType
+from typing import TYPE_CHECKING
 import numpy as np
 
 from adanowo_simulator.abstract_base_classes.calculation_adapter import AbstractCalculationAdapter
 
+if TYPE_CHECKING:
+    import torch
+
 
 class CalculationAdapter(AbstractCalculationAdapter):
 
@@ -12,3 +18,10 @@ class CalculationAdapter(AbstractCalculationAdapter):
     def calculate(self, X: dict[str, float]) -> np.array:
         c = np.array(self._calculate(X)).flatten()
         return c
+
+    def calculate_differentiable(self, X: dict[str, torch.Tensor]) -> torch.Tensor:
+        import torch
+        c = self._calculate(X)
+        if not torch.is_tensor(c):
+            raise TypeError("The calculation does not support torch tensors, so it cannot be differentiated.")
+        return c.flatten()
@@ -0,0 +1,177 @@
+import json
+import struct
+import pathlib as pl
+
+import numpy as np
+import pandas as pd
+
+FILE_FORMATS = ("hdf5", "parquet", "npy")
+HDF5_KEY = "table"
+NPY_LAYOUT_FILE = "columns.json"  # names, length and metadata of the columns of a npy directory
+NPY_HEADER_SIZE = 128  # bytes, reserved for the header of each .npy file until the length is known
+
+
+class ColumnarWriter:
+    """
+    Appends chunks of equally long columns to a file.
+
+    Supported formats are HDF5 tables (via PyTables), Parquet files (requires the optional dependency pyarrow) and
+    directories with one .npy file per column, which can be memory-mapped with :py:func:'memory_map_columns'. All
+    can be read back into a pandas DataFrame with :py:func:'read_columnar'. An existing file at 'path' is replaced.
+    """
+
+    def __init__(self, path: str | pl.Path, file_format: str = "hdf5", metadata: dict[str, str] | None = None):
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f"Unknown file format {file_format}. Use one of {FILE_FORMATS}.")
+        self._path = pl.Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._file_format: str = file_format
+        self._metadata: dict[str, str] = metadata or dict()
+        self._store: pd.HDFStore | None = None
+        self._parquet_writer = None
+        self._npy_files: list | None = None
+        self._npy_columns: list[str] = []
+        self._npy_dtypes: list[np.dtype] = []
+        self._npy_length: int = 0
+        if self._file_format == "hdf5":
+            self._store = pd.HDFStore(self._path, mode="w")
+        elif self._file_format == "npy":
+            self._path.mkdir(exist_ok=True)
+            for old_file in [self._path / NPY_LAYOUT_FILE, *self._path.glob("column_*.npy")]:
+                old_file.unlink(missing_ok=True)
+            self._npy_files = []
+        else:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError as e:
+                raise ImportError("Writing Parquet files requires pyarrow. Install it or use the hdf5 format.") from e
+
+    @property
+    def path(self) -> pl.Path:
+        return self._path
+
+    def append(self, columns: pd.DataFrame) -> None:
+        if columns.empty:
+            return
+        if self._file_format == "hdf5":
+            new_table = HDF5_KEY not in self._store
+            self._store.append(HDF5_KEY, columns, index=False)
+            if new_table:
+                for name, value in self._metadata.items():
+                    setattr(self._store.get_storer(HDF5_KEY).attrs, name, value)
+        elif self._file_format == "npy":
+            if not self._npy_columns:
+                self._npy_columns = [str(name) for name in columns.columns]
+                self._npy_dtypes = [columns[name].to_numpy().dtype for name in columns.columns]
+                if any(dtype.hasobject for dtype in self._npy_dtypes):
+                    raise ValueError("Only numeric and boolean columns can be written to npy files.")
+                for index in range(len(self._npy_columns)):
+                    npy_file = open(self._path / f"column_{index}.npy", "wb")
+                    # the header is written when the file is closed.
+                    npy_file.write(bytes(NPY_HEADER_SIZE))
+                    self._npy_files.append(npy_file)
+            for npy_file, name, dtype in zip(self._npy_files, self._npy_columns, self._npy_dtypes):
+                np.ascontiguousarray(columns[name].to_numpy(), dtype=dtype).tofile(npy_file)
+            self._npy_length += len(columns)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(columns, preserve_index=False)
+            if self._parquet_writer is None:
+                schema = table.schema.with_metadata(table.schema.metadata | self._metadata)
+                self._parquet_writer = pq.ParquetWriter(self._path, schema)
+            self._parquet_writer.write_table(table)
+
+    def close(self) -> None:
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self._npy_files is not None:
+            for npy_file, dtype in zip(self._npy_files, self._npy_dtypes):
+                npy_file.seek(0)
+                npy_file.write(_npy_header(dtype, self._npy_length))
+                npy_file.close()
+            self._npy_files = None
+            (self._path / NPY_LAYOUT_FILE).write_text(json.dumps(
+                {"columns": self._npy_columns, "length": self._npy_length, "metadata": self._metadata}))
+
+
+def _npy_header(dtype: np.dtype, length: int) -> bytes:
+    """Header of a one-dimensional .npy file (format version 1.0), padded to NPY_HEADER_SIZE bytes."""
+    header = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (length,)})
+    # magic string, version and header length take 10 bytes, the header ends with a newline.
+    header = header.ljust(NPY_HEADER_SIZE - 11) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def read_columnar(path: str | pl.Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Reads a file written by a :py:class:'ColumnarWriter'. The format is inferred from the file suffix, directories
+    are read as npy columns.
+    """
+    path = pl.Path(path)
+    if path.is_dir():
+        frame = pd.DataFrame({name: np.array(values) for name, values in memory_map_columns(path, columns).items()})
+    elif path.suffix == ".parquet":
+        frame = pd.read_parquet(path, columns=columns)
+    else:
+        frame = pd.read_hdf(path, HDF5_KEY, columns=columns)
+    # chunks are written without index.
+    return frame.reset_index(drop=True)
+
+
+def memory_map_columns(path: str | pl.Path, columns: list[str] | None = None) -> dict[str, np.ndarray]:
+    """Read-only memory maps of the columns of a npy directory written by a :py:class:'ColumnarWriter' by name."""
+    path = pl.Path(path)
+    layout = json.loads((path / NPY_LAYOUT_FILE).read_text())
+    indices = {name: index for index, name in enumerate(layout["columns"])}
+    unknown = [name for name in columns or [] if name not in indices]
+    if unknown:
+        raise KeyError(f"Unknown columns {unknown} in {path}.")
+    return {name: np.load(path / f"column_{indices[name]}.npy", mmap_mode="r")
+            for name in (columns if columns is not None else layout["columns"])}
+
+
+class ColumnBuffer:
+    """
+    Preallocated buffer for rows of a fixed set of float columns and an integer index column.
+    Values that are not set for a row stay NaN. Full buffers have to be emptied with :py:meth:'pop'.
+    """
+
+    def __init__(self, columns: list[str], capacity: int, index_name: str = "Step"):
+        if capacity < 1:
+            raise ValueError("The buffer capacity must be at least 1.")
+        self._columns: list[str] = list(columns)
+        self._index_name: str = index_name
+        self._values = np.full((capacity, len(self._columns)), np.nan)
+        self._index = np.zeros(capacity, dtype=np.int64)
+        self._size: int = 0
+
+    @property
+    def columns(self) -> list[str]:
+        return self._columns
+
+    @property
+    def full(self) -> bool:
+        return self._size == len(self._index)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def new_row(self, index: int) -> np.ndarray:
+        """Returns a view of the next row, which is filled with NaN."""
+        row = self._values[self._size]
+        row.fill(np.nan)
+        self._index[self._size] = index
+        self._size += 1
+        return row
+
+    def pop(self) -> pd.DataFrame:
+        """Returns the buffered rows as DataFrame and empties the buffer."""
+        frame = pd.DataFrame(self._values[:self._size].copy(), columns=self._columns)
+        frame.insert(0, self._index_name, self._index[:self._size].copy())
+        self._size = 0
+        return frame
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import logging
+import pathlib as pl
+
+import hydra
+import numpy as np
+import pandas as pd
+from omegaconf import DictConfig, OmegaConf
+
+from adanowo_simulator.columnar_storage import ColumnarWriter, read_columnar
+from adanowo_simulator.sweep import sweep_bounds
+from adanowo_simulator.worker_pool import local_evaluation_config, fork_context, initialize_worker, call_in_worker
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("uniform", "random_walk")
+MANIFEST_FILE = "manifest.json"
+SHARD_SUFFIXES = {"hdf5": ".h5", "parquet": ".parquet", "npy": ""}
+
+
+class EpisodeGenerator:
+    """
+    Simulates episodes of transitions with an environment of its own. Every episode starts with a reset and its
+    actions are drawn in advance by a random policy, so the whole episode is simulated in one
+    :py:meth:'~adanowo_simulator.environment.Environment.rollout'. The global NumPy generator and the policy are seeded
+    from the seed of the dataset and the index of the episode, so an episode does not depend on the process or the
+    shard that generates it.
+    """
+
+    def __init__(self, config: DictConfig):
+        from adanowo_simulator.environment_factory import EnvironmentFactory
+        config = local_evaluation_config(config)
+        config.action_setup.actions_are_relative = False
+        self._settings: DictConfig = config.dataset_settings
+        if self._settings.policy not in POLICIES:
+            raise ValueError(f"Unknown policy {self._settings.policy}. Use one of {POLICIES}.")
+        self._used_setpoints: list[str] = list(config.env_setup.used_setpoints)
+        bounded_setpoints = [name for name in self._used_setpoints
+                             if (config.action_setup.setpoint_bounds.get(name) or dict()).get("lower") is not None
+                             and (config.action_setup.setpoint_bounds.get(name) or dict()).get("upper") is not None]
+        # setpoints without bounds keep their value after the reset.
+        self._bounds: dict[str, tuple[float, float]] = sweep_bounds(config.action_setup, bounded_setpoints) \
+            if bounded_setpoints else dict()
+        self._environment = EnvironmentFactory(config).create_environment()
+
+    def generate(self, episode: int) -> pd.DataFrame:
+        """
+        Columns "Episode", "Step", "States/<name>", "Actions/<setpoint>", "Performance-Metrics/<metric>",
+        "Outputs/<output>", "Next-States/<name>" and "Truncated" of the transitions of an episode. The states are the
+        disturbances, setpoints and dependent variables that are observed before and after each step, the metrics are
+        the objective value (the reward) and whether the constraints of the step are met.
+        """
+        sequence = np.random.SeedSequence(int(self._settings.seed), spawn_key=(episode,))
+        environment_sequence, policy_sequence = sequence.spawn(2)
+        np.random.seed(environment_sequence.generate_state(4))
+        _, initial_state, _, _ = self._environment.reset()
+        episode_length = int(self._settings.episode_length)
+        # one more step yields the disturbances that are observed after the last transition.
+        actions = self._actions(initial_state, episode_length + 1, np.random.default_rng(policy_sequence))
+        rollout = self._environment.rollout(actions)
+
+        states = rollout["States"]
+        # the next state has the disturbances of the next step and the setpoints and dependent variables of this one.
+        disturbance_names = set(self._environment.disturbance_manager.step())
+        next_states = {name: values[1:] if name in disturbance_names else values[:-1]
+                       for name, values in states.items()}
+        columns = {
+            "Episode": np.full(episode_length, episode, dtype=np.int64),
+            "Step": np.arange(1, episode_length + 1, dtype=np.int64)
+        }
+        for name in initial_state:
+            columns[f"States/{name}"] = np.concatenate([[initial_state[name]], next_states[name][:-1]])
+        for name in self._used_setpoints:
+            columns[f"Actions/{name}"] = actions[name][:-1]
+        columns["Performance-Metrics/Objective-Value"] = rollout["Objective-Value"][0, :-1]
+        columns["Performance-Metrics/Setpoint-Constraints-Met"] = \
+            rollout["Setpoint-Constraints-Met"][:-1].astype(np.int8)
+        columns["Performance-Metrics/Dependent-Variable-Constraints-Met"] = \
+            rollout["Dependent-Variable-Constraints-Met"][:-1].astype(np.int8)
+        columns["Performance-Metrics/Output-Constraints-Met"] = \
+            rollout["Output-Constraints-Met"][0, :-1].astype(np.int8)
+        for name, samples in rollout["Outputs"].items():
+            columns[f"Outputs/{name}"] = samples[0, :-1]
+        for name in initial_state:
+            columns[f"Next-States/{name}"] = next_states[name]
+        columns["Truncated"] = (columns["Step"] == episode_length).astype(np.int8)
+        return pd.DataFrame(columns)
+
+    def generate_shard(self, path: str | pl.Path, first_episode: int, episode_count: int) -> dict:
+        """Writes the episodes [first_episode, first_episode + episode_count) into a columnar file in chunks."""
+        start_time = time.perf_counter()
+        writer = ColumnarWriter(path, self._settings.format)
+        chunk_size = int(self._settings.chunk_size)
+        buffered, buffered_rows, transition_count = [], 0, 0
+        try:
+            for episode in range(first_episode, first_episode + episode_count):
+                transitions = self.generate(episode)
+                buffered.append(transitions)
+                buffered_rows += len(transitions)
+                transition_count += len(transitions)
+                if buffered_rows >= chunk_size:
+                    writer.append(pd.concat(buffered, ignore_index=True))
+                    buffered, buffered_rows = [], 0
+            if buffered:
+                writer.append(pd.concat(buffered, ignore_index=True))
+        finally:
+            writer.close()
+        return {"path": pl.Path(path).name, "first_episode": first_episode, "episodes": episode_count,
+                "transitions": transition_count, "duration": time.perf_counter() - start_time}
+
+    def close(self) -> None:
+        self._environment.close()
+
+    def _actions(self, initial_state: dict[str, float], horizon: int, generator: np.random.Generator) \
+            -> dict[str, np.ndarray]:
+        actions = {name: np.full(horizon, float(initial_state[name])) for name in self._used_setpoints}
+        for name, (lower, upper) in self._bounds.items():
+            if self._settings.policy == "uniform":
+                actions[name] = generator.uniform(lower, upper, horizon)
+            else:
+                steps = generator.normal(0.0, float(self._settings.step_scale) * (upper - lower), horizon)
+                position = float(initial_state[name])
+                for t in range(horizon):
+                    position = min(max(position + steps[t], lower), upper)
+                    actions[name][t] = position
+        return actions
+
+
+class TransitionDatasetGenerator:
+    """
+    Generates an offline dataset of transitions (state, action, reward, next state, outputs and constraint flags) of
+    random episodes, e.g. for offline reinforcement learning or to train surrogate models.
+
+    The episodes are split into shards, which are generated by a pool of 'num_workers' processes, each with its own
+    :py:class:'EpisodeGenerator' and copy of the models. Each shard is streamed in chunks into its own columnar file
+    (see :py:class:'~adanowo_simulator.columnar_storage.ColumnarWriter'), so memory is bounded by the chunk size and
+    the episode length independently of the size of the dataset. A manifest lists the shards, their episodes and
+    transitions and the settings. Because the episodes are seeded by their index, the dataset is the same for any
+    number of workers and shards. The settings are taken from the dataset_settings of the config.
+    """
+
+    def __init__(self, config: DictConfig):
+        self._config: DictConfig = config.copy()
+        self._settings: DictConfig = self._config.dataset_settings
+        if self._settings.policy not in POLICIES:
+            raise ValueError(f"Unknown policy {self._settings.policy}. Use one of {POLICIES}.")
+        if self._settings.format not in SHARD_SUFFIXES:
+            raise ValueError(f"Unknown file format {self._settings.format}. Use one of {tuple(SHARD_SUFFIXES)}.")
+        if min(self._settings.num_episodes, self._settings.episode_length, self._settings.num_workers,
+               self._settings.chunk_size, self._settings.get("num_shards") or 1) < 1:
+            raise ValueError("The numbers of episodes, steps, workers, shards and the chunk size must be at least 1.")
+
+    def shards(self) -> list[tuple[int, int]]:
+        """First episode and number of episodes of each shard."""
+        num_episodes = int(self._settings.num_episodes)
+        num_shards = min(int(self._settings.get("num_shards") or self._settings.num_workers), num_episodes)
+        edges = np.linspace(0, num_episodes, num_shards + 1).round().astype(int)
+        return [(int(start), int(stop - start)) for start, stop in zip(edges[:-1], edges[1:])]
+
+    def run(self, path: str | pl.Path | None = None) -> dict[str, float]:
+        """
+        Generates all shards into the directory 'path' (the path of the settings by default) and writes the manifest.
+        Returns the number of transitions, episodes and shards, the duration in seconds and the transitions per second.
+        """
+        path = pl.Path(path if path is not None else self._settings.path)
+        path.mkdir(parents=True, exist_ok=True)
+        start_time = time.perf_counter()
+        shards = self.shards()
+        tasks = [("generate_shard", str(path / f"shard-{index:05d}{SHARD_SUFFIXES[self._settings.format]}"),
+                  first_episode, episode_count) for index, (first_episode, episode_count) in enumerate(shards)]
+        num_workers = min(int(self._settings.num_workers), len(tasks))
+        results = []
+        if num_workers <= 1:
+            generator = EpisodeGenerator(self._config)
+            try:
+                for method, *arguments in tasks:
+                    results.append(getattr(generator, method)(*arguments))
+                    self._log_shard(results[-1], len(results), len(tasks))
+            finally:
+                generator.close()
+        else:
+            with fork_context().Pool(num_workers, initializer=initialize_worker,
+                                     initargs=(EpisodeGenerator, self._config)) as pool:
+                for result in pool.imap_unordered(call_in_worker, tasks):
+                    results.append(result)
+                    self._log_shard(result, len(results), len(tasks))
+        results.sort(key=lambda result: result["first_episode"])
+
+        duration = time.perf_counter() - start_time
+        transition_count = sum(result["transitions"] for result in results)
+        manifest = {
+            "format": self._settings.format,
+            "transitions": transition_count,
+            "episodes": int(self._settings.num_episodes),
+            "shards": [{name: value for name, value in result.items() if name != "duration"} for result in results],
+            "settings": OmegaConf.to_container(self._settings, resolve=True),
+            "config": OmegaConf.to_yaml(self._config)
+        }
+        # replaces a previous manifest only when the new one is complete.
+        temporary_path = path / (MANIFEST_FILE + ".tmp")
+        temporary_path.write_text(json.dumps(manifest, indent=2))
+        os.replace(temporary_path, path / MANIFEST_FILE)
+        summary = {"Transitions": transition_count, "Episodes": int(self._settings.num_episodes),
+                   "Shards": len(results), "Duration": duration, "Transitions-Per-Second": transition_count / duration}
+        logger.info(f"Generated {transition_count} transitions in {len(results)} shards with {num_workers} workers in "
+                    f"{duration:.1f} s ({summary['Transitions-Per-Second']:.0f} per second) into {path}.")
+        return summary
+
+    @staticmethod
+    def _log_shard(result: dict, finished_count: int, shard_count: int) -> None:
+        logger.info(f"Shard {finished_count}/{shard_count}: {result['transitions']} transitions of episodes "
+                    f"{result['first_episode']}-{result['first_episode'] + result['episodes'] - 1} in "
+                    f"{result['duration']:.1f} s ({result['transitions'] / result['duration']:.0f} per second).")
+
+
+def read_dataset(path: str | pl.Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """Reads the shards of a dataset of a :py:class:'TransitionDatasetGenerator' in the order of the episodes."""
+    path = pl.Path(path)
+    manifest = json.loads((path / MANIFEST_FILE).read_text())
+    return pd.concat([read_columnar(path / shard["path"], columns) for shard in manifest["shards"]],
+                     ignore_index=True)
+
+
+@hydra.main(version_base=None, config_path=None, config_name="main")
+def main(config: DictConfig) -> None:
+    """
+    Command line entry point, e.g. python -m adanowo_simulator.dataset --config-path $(pwd)/config
+    dataset_settings.num_workers=8. The config folder is not installed with the package, so its absolute path is
+    required.
+    """
+    TransitionDatasetGenerator(config).run()
+
+
+if __name__ == "__main__":
+    main()
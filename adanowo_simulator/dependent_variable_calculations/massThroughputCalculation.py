@@ -9,8 +9,9 @@ def prcnt_to_mult(prcnt: float) -> float:
 
 def calculate(X: dict) -> np.array:
     X = X.copy()
+    # arrays and torch tensors are kept, so that the calculation can be differentiated with autograd.
     for key in X.keys():
-        X[key] = np.array(X[key]).reshape(-1, 1)
+        X[key] = X[key].reshape(-1, 1) if hasattr(X[key], "reshape") else np.array(X[key]).reshape(-1, 1)
 
     weight_per_area_theoretical = \
         X["CardDeliveryWeightPerArea"] * \
@@ -25,5 +26,5 @@ def calculate(X: dict) -> np.array:
         X["ProductWidth"] * \
         G_MIN_TO_KG_H
 
-    mass_throughput = np.array(mass_throughput).flatten()
+    mass_throughput = mass_throughput.flatten()
     return mass_throughput
@@ -1,6 +1,7 @@
 from omegaconf import DictConfig, OmegaConf
 
 from adanowo_simulator.abstract_base_classes.disturbance_manager import AbstractDisturbanceManager
+from adanowo_simulator.snapshot import restore_config_values
 
 
 class DisturbanceManager(AbstractDisturbanceManager):
@@ -32,3 +33,9 @@ class DisturbanceManager(AbstractDisturbanceManager):
 
     def close(self) -> None:
         self._ready = False
+
+    def snapshot(self) -> dict:
+        return {"disturbances": OmegaConf.to_container(self._config.disturbances)}
+
+    def restore(self, snapshot: dict) -> None:
+        restore_config_values(self._config.disturbances, snapshot["disturbances"])
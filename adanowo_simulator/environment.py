@@ -1,7 +1,8 @@
-import sys
+import math
 import logging
 from copy import copy
-from omegaconf import DictConfig
+import numpy as np
+from omegaconf import DictConfig, OmegaConf
 
 from adanowo_simulator.abstract_base_classes.environment import AbstractEnvironment
 from adanowo_simulator.abstract_base_classes.output_manager import AbstractOutputManager
@@ -10,9 +11,12 @@ from adanowo_simulator.abstract_base_classes.action_manager import AbstractActio
 from adanowo_simulator.abstract_base_classes.disturbance_manager import AbstractDisturbanceManager
 from adanowo_simulator.abstract_base_classes.experiment_tracker import AbstractExperimentTracker
 from adanowo_simulator.abstract_base_classes.scenario_manager import AbstractScenarioManager
+from adanowo_simulator.stage_timer import StageTimer
+from adanowo_simulator.snapshot import serialize_snapshot, deserialize_snapshot
 
-logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 logger = logging.getLogger(__name__)
+# Timed stages of a step. During reset, the stages are timed as "Reset/<stage>".
+STAGES = ("Disturbances", "Actions", "Outputs", "Objective", "Tracker", "Next-Step")
 
 
 def compile_log_variables(
@@ -50,15 +54,19 @@ class Environment(AbstractEnvironment):
             self, config: DictConfig, disturbance_manager: AbstractDisturbanceManager,
             action_manager: AbstractActionManager, output_manager: AbstractOutputManager,
             objective_manager: AbstractObjectiveManager, scenario_manager: AbstractScenarioManager,
-            experiment_tracker: AbstractExperimentTracker):
+            experiment_tracker: AbstractExperimentTracker, stage_timer: StageTimer | None = None,
+            track_stage_timings: bool = False):
         self._disturbance_manager: AbstractDisturbanceManager = disturbance_manager
         self._action_manager: AbstractActionManager = action_manager
         self._output_manager: AbstractOutputManager = output_manager
         self._objective_manager: AbstractObjectiveManager = objective_manager
         self._scenario_manager: AbstractScenarioManager = scenario_manager
         self._experiment_tracker: AbstractExperimentTracker = experiment_tracker
+        self._stage_timer: StageTimer = stage_timer if stage_timer is not None else StageTimer()
+        self._track_stage_timings: bool = track_stage_timings
 
-        self.log_vars = None
+        self._log_vars: dict | None = None
+        self._log_variable_args: tuple | None = None
         self._initial_config: DictConfig = config.copy()
         self._config: DictConfig = self._initial_config.copy()
         self._step_index: int = -1
@@ -97,41 +105,67 @@ class Environment(AbstractEnvironment):
     def experiment_tracker(self) -> AbstractExperimentTracker:
         return self._experiment_tracker
 
+    @property
+    def stage_timer(self) -> StageTimer:
+        """Timer of the stages of step and reset. Call stage_timer.summary() for the aggregated durations."""
+        return self._stage_timer
+
     @property
     def step_index(self):
         return self._step_index
 
+    @property
+    def log_vars(self) -> dict | None:
+        """Log variables of the last step. They are only compiled on first access if the tracker does not need them."""
+        if self._log_vars is None and self._log_variable_args is not None:
+            self._log_vars = compile_log_variables(*self._log_variable_args)
+            self._log_variable_args = None
+        return self._log_vars
+
+    @log_vars.setter
+    def log_vars(self, log_variables: dict | None):
+        self._log_vars = log_variables
+        self._log_variable_args = None
+
     def step(self, actions: dict) -> tuple[float, dict[str, float], dict[str, float], DictConfig]:
         if not self._ready:
             raise RuntimeError("Cannot call step() before calling reset().")
+        timer = self._stage_timer
         try:
             if self._step_index == 1:
                 logger.info("Experiment is running.")
             assert set(actions.keys()) == set(self._config.used_setpoints), "Action dict does not match used setpoints."
-            disturbances = self._disturbance_manager.step()
-            setpoints, dependent_variables, setpoints_okay, dependent_variables_okay = \
-                self._action_manager.step(actions, disturbances)
-            state = disturbances | setpoints | dependent_variables
-            outputs = self._output_manager.step(state)
-            self._update_setpoints(setpoints, state)
-            objective_value, output_constraints_met = self._objective_manager.step(
-                state, outputs, setpoints_okay, dependent_variables_okay)
-            log_variables = compile_log_variables(
-                objective_value,
-                setpoints_okay,
-                dependent_variables_okay,
-                output_constraints_met,
-                actions,
-                outputs,
-                setpoints,
-                dependent_variables,
-                disturbances
-            )
-            self._experiment_tracker.step(log_variables, self._step_index)
-            self.log_vars = copy(log_variables)
+            with timer.span("Step"):
+                with timer.span("Disturbances"):
+                    disturbances = self._disturbance_manager.step()
+                with timer.span("Actions"):
+                    setpoints, dependent_variables, setpoints_okay, dependent_variables_okay = \
+                        self._action_manager.step(actions, disturbances)
+                state = disturbances | setpoints | dependent_variables
+                with timer.span("Outputs"):
+                    outputs = self._output_manager.step(state)
+                self._update_setpoints(setpoints, state)
+                with timer.span("Objective"):
+                    objective_value, output_constraints_met = self._objective_manager.step(
+                        state, outputs, setpoints_okay, dependent_variables_okay)
+                with timer.span("Tracker"):
+                    log_variables = self._track(
+                        objective_value,
+                        setpoints_okay,
+                        dependent_variables_okay,
+                        output_constraints_met,
+                        actions,
+                        outputs,
+                        setpoints,
+                        dependent_variables,
+                        disturbances
+                    )
+                    self._experiment_tracker.step(log_variables, self._step_index)
 
-            # Execute scenario for the next step so the agent is already informed about production context changes.
-            state_with_new_context, quality_bounds_next = self._prepare_next_step(setpoints, dependent_variables)
+                # Execute scenario for the next step so the agent is already informed about production context changes.
+                with timer.span("Next-Step"):
+                    state_with_new_context, quality_bounds_next = self._prepare_next_step(setpoints,
+                                                                                          dependent_variables)
 
         except Exception as e:
             self.close()
@@ -141,34 +175,42 @@ class Environment(AbstractEnvironment):
 
     def reset(self) -> tuple[float, dict[str, float], dict[str, float], DictConfig]:
         logger.info("Resetting environment...")
+        timer = self._stage_timer
         try:
             # step 0.
             self._step_index = 0
             self._config = self._initial_config.copy()
-            self._scenario_manager.reset()
-            disturbances = self._disturbance_manager.reset()
-            setpoints, dependent_variables, setpoints_okay, dependent_variables_okay = \
-                self._action_manager.reset(disturbances)
-            state = disturbances | setpoints | dependent_variables
-            outputs = self._output_manager.reset(state)
-            objective_value, output_constraints_met = self._objective_manager.reset(
-                state, outputs, setpoints_okay, dependent_variables_okay)
-            log_variables = compile_log_variables(
-                objective_value,
-                setpoints_okay,
-                dependent_variables_okay,
-                output_constraints_met,
-                {},
-                outputs,
-                setpoints,
-                dependent_variables,
-                disturbances
-            )
-            self._experiment_tracker.reset(log_variables)
-            self.log_vars = copy(log_variables)
+            with timer.span("Reset"):
+                self._scenario_manager.reset()
+                with timer.span("Reset/Disturbances"):
+                    disturbances = self._disturbance_manager.reset()
+                with timer.span("Reset/Actions"):
+                    setpoints, dependent_variables, setpoints_okay, dependent_variables_okay = \
+                        self._action_manager.reset(disturbances)
+                state = disturbances | setpoints | dependent_variables
+                with timer.span("Reset/Outputs"):
+                    outputs = self._output_manager.reset(state)
+                with timer.span("Reset/Objective"):
+                    objective_value, output_constraints_met = self._objective_manager.reset(
+                        state, outputs, setpoints_okay, dependent_variables_okay)
+                with timer.span("Reset/Tracker"):
+                    log_variables = self._track(
+                        objective_value,
+                        setpoints_okay,
+                        dependent_variables_okay,
+                        output_constraints_met,
+                        {},
+                        outputs,
+                        setpoints,
+                        dependent_variables,
+                        disturbances
+                    )
+                    self._experiment_tracker.reset(log_variables)
 
-            # prepare step 1.
-            state_with_new_context, quality_bounds_next = self._prepare_next_step(setpoints, dependent_variables)
+                # prepare step 1.
+                with timer.span("Reset/Next-Step"):
+                    state_with_new_context, quality_bounds_next = self._prepare_next_step(setpoints,
+                                                                                          dependent_variables)
 
         except Exception as e:
             self.close()
@@ -179,6 +221,201 @@ class Environment(AbstractEnvironment):
 
         return objective_value, state_with_new_context, outputs, quality_bounds_next
 
+    def snapshot(self) -> bytes:
+        """
+        Returns the step index, the global NumPy random state and the state of all members except the experiment
+        tracker in serialized form. Loaded models are not part of a snapshot.
+        """
+        if not self._ready:
+            raise RuntimeError("Cannot call snapshot() before calling reset().")
+        return serialize_snapshot({
+            "step_index": self._step_index,
+            "random_state": np.random.get_state(),
+            "disturbance_manager": self._disturbance_manager.snapshot(),
+            "action_manager": self._action_manager.snapshot(),
+            "output_manager": self._output_manager.snapshot(),
+            "objective_manager": self._objective_manager.snapshot(),
+            "scenario_manager": self._scenario_manager.snapshot()
+        })
+
+    def restore(self, snapshot: bytes) -> None:
+        """
+        Continues from a state returned by :py:meth:'snapshot' of this environment. If the snapshot uses other output
+        models than the current step, they are swapped in at the next step. The experiment tracker is not restored, so
+        it sees the restored step indices again.
+        """
+        if not self._ready:
+            raise RuntimeError("Cannot call restore() before calling reset().")
+        state = deserialize_snapshot(snapshot)
+        try:
+            self._disturbance_manager.restore(state["disturbance_manager"])
+            self._action_manager.restore(state["action_manager"])
+            self._output_manager.restore(state["output_manager"])
+            self._objective_manager.restore(state["objective_manager"])
+            self._scenario_manager.restore(state["scenario_manager"])
+        except Exception as e:
+            self.close()
+            raise e
+        np.random.set_state(state["random_state"])
+        self._step_index = state["step_index"]
+        self.log_vars = None
+
+    def rollout(self, action_sequence: list[dict[str, float]] | dict[str, list[float]], num_samples: int = 1) -> dict:
+        """
+        Simulates a sequence of actions (one action dict per step or one sequence per action) from the current state
+        in one call and restores the current state afterwards, so the environment and the experiment tracker are left
+        unchanged.
+
+        The disturbances, setpoints and scenarios are stepped as in :py:meth:'step', but every model is evaluated once
+        for all steps of the horizon that use it and 'num_samples' noise realizations of the outputs are sampled at
+        once. Models that the scenario switches to within the horizon are loaded only for the rollout, the allocated
+        and prefetched models of the output manager are kept. The noise is drawn from the global NumPy generator before restoring it, so rollouts from the same state
+        use the same noise (common random numbers), which makes comparisons of action sequences less noisy.
+
+        Returns
+        -------
+        dict
+            "Objective-Value": array (num_samples, horizon),
+            "States": dict of arrays (horizon,) by variable name,
+            "Outputs": dict of arrays (num_samples, horizon) by output name,
+            "Setpoint-Constraints-Met": array (horizon,),
+            "Dependent-Variable-Constraints-Met": array (horizon,),
+            "Output-Constraints-Met": array (num_samples, horizon).
+        """
+        if not self._ready:
+            raise RuntimeError("Cannot call rollout() before calling reset().")
+        if num_samples < 1:
+            raise ValueError("The number of samples must be at least 1.")
+        if isinstance(action_sequence, dict):
+            horizon = min((len(values) for values in action_sequence.values()), default=0)
+            action_sequence = [{name: float(values[t]) for name, values in action_sequence.items()}
+                               for t in range(horizon)]
+        horizon = len(action_sequence)
+        if horizon == 0:
+            raise ValueError("The action sequence is empty.")
+        used_setpoints = set(self._config.used_setpoints)
+        if any(set(actions.keys()) != used_setpoints for actions in action_sequence):
+            raise ValueError("Action dict does not match used setpoints.")
+
+        snapshot = self.snapshot()
+        try:
+            with self._stage_timer.span("Rollout"):
+                states, setpoints_okay, dependent_variables_okay, output_bounds, output_models = [], [], [], [], []
+                for actions in action_sequence:
+                    disturbances = self._disturbance_manager.step()
+                    setpoints, dependent_variables, setpoints_okay_t, dependent_variables_okay_t = \
+                        self._action_manager.step(actions, disturbances)
+                    states.append(disturbances | setpoints | dependent_variables)
+                    setpoints_okay.append(all(setpoints_okay_t.values()))
+                    dependent_variables_okay.append(all(dependent_variables_okay_t.values()))
+                    output_bounds.append(OmegaConf.to_container(self._objective_manager.config.output_bounds))
+                    output_models.append(dict(self._output_manager.config.output_models))
+                    self._step_index += 1
+                    # the steps are undone, so the scheduled models are not prefetched.
+                    self._scenario_manager.step(self._step_index, self._disturbance_manager, self._output_manager,
+                                                self._objective_manager, prefetch=False)
+
+                state_arrays = {name: np.array([state[name] for state in states], dtype=np.float64)
+                                for name in states[0]}
+                mean_pred, var_pred = self._predict_segments(state_arrays, output_models)
+                outputs = {
+                    output_name: mean_pred[output_name] + np.sqrt(var_pred[output_name])
+                    * np.random.standard_normal((num_samples, horizon))
+                    for output_name in mean_pred
+                }
+
+                objective_values = np.empty((num_samples, horizon))
+                output_constraints_met = np.empty((num_samples, horizon), dtype=bool)
+                for t in range(horizon):
+                    objective_values[:, t], output_constraints_met[:, t] = self._objective_manager.evaluate_samples(
+                        states[t], {output_name: samples[:, t] for output_name, samples in outputs.items()},
+                        setpoints_okay[t], dependent_variables_okay[t], output_bounds[t])
+            self.restore(snapshot)
+        except Exception as e:
+            self.close()
+            raise e
+
+        return {
+            "Objective-Value": objective_values,
+            "States": state_arrays,
+            "Outputs": outputs,
+            "Setpoint-Constraints-Met": np.array(setpoints_okay),
+            "Dependent-Variable-Constraints-Met": np.array(dependent_variables_okay),
+            "Output-Constraints-Met": output_constraints_met
+        }
+
+    def evaluate_gradient(self, setpoints: dict[str, float] | None = None) -> dict:
+        """
+        Evaluates the objective and the constraint margins at 'setpoints' (absolute values, the current setpoints are
+        used for the missing ones) for the current disturbances, output bounds and output models and differentiates
+        them with respect to the used setpoints by autograd. The dependent variable calculations, the mean of every
+        output model and the objective function are evaluated on torch tensors, so they have to support them.
+
+        The objective value is that of the mean outputs, which is the expected objective value for objectives that are
+        linear in the outputs like the baseline objective. The penalty for violated bounds is not differentiable, so the
+        margins of all bounds are returned instead: the distance of the variable to its bound, negative if the bound is
+        violated. Setpoints that are rounded by the models (like the layer count) have zero gradients. The environment
+        is not changed.
+
+        Returns
+        -------
+        dict
+            "Objective-Value": float,
+            "Objective-Gradient": dict of floats by used setpoint,
+            "Outputs": dict of mean outputs by output name,
+            "Setpoint-Constraint-Margins": dict of floats by bound, e.g. "ProductionSpeedSetpoint.lower",
+            "Dependent-Variable-Constraint-Margins": dict of floats by bound,
+            "Output-Constraint-Margins": dict of floats by bound,
+            "Constraint-Gradients": dict of gradients (dict of floats by used setpoint) by bound.
+        """
+        if not self._ready:
+            raise RuntimeError("Cannot call evaluate_gradient() before calling reset().")
+        import torch
+
+        current_setpoints = self._action_manager.snapshot()["setpoints"]
+        setpoints = setpoints or dict()
+        if not set(setpoints.keys()) <= set(current_setpoints.keys()):
+            raise ValueError(f"Unknown setpoints {sorted(set(setpoints.keys()) - set(current_setpoints.keys()))}.")
+        # a read-only query: errors, e.g. of managers or model scripts that do not support tensors, leave the
+        # environment usable, so it is not closed.
+        with self._stage_timer.span("Gradient"):
+            used_setpoints = list(self._config.used_setpoints)
+            setpoint_tensors = {name: torch.tensor([float(setpoints.get(name, value))], dtype=torch.float64,
+                                                   requires_grad=name in used_setpoints)
+                                for name, value in current_setpoints.items()}
+            disturbance_tensors = {name: torch.tensor([float(value)], dtype=torch.float64)
+                                   for name, value in self._disturbance_manager.step().items()}
+            dependent_variables, setpoint_margins, dependent_variable_margins = \
+                self._action_manager.evaluate_setpoints_differentiable(setpoint_tensors, disturbance_tensors)
+            state = disturbance_tensors | setpoint_tensors | dependent_variables
+            outputs = self._output_manager.predict_differentiable(state)
+            objective_value, output_margins = self._objective_manager.evaluate_differentiable(
+                state, outputs, OmegaConf.to_container(self._objective_manager.config.output_bounds))
+
+            inputs = [setpoint_tensors[name] for name in used_setpoints]
+
+            def gradient(value: torch.Tensor) -> dict[str, float]:
+                if not value.requires_grad:
+                    return {name: 0.0 for name in used_setpoints}
+                partials = torch.autograd.grad(value.sum(), inputs, retain_graph=True, allow_unused=True)
+                return {name: float(partial) if partial is not None else 0.0
+                        for name, partial in zip(used_setpoints, partials)}
+
+            margins = setpoint_margins | dependent_variable_margins | output_margins
+            result = {
+                "Objective-Value": objective_value.item(),
+                "Objective-Gradient": gradient(objective_value),
+                "Outputs": {output_name: output.item() for output_name, output in outputs.items()},
+                "Setpoint-Constraint-Margins": {bound: margin.item()
+                                                for bound, margin in setpoint_margins.items()},
+                "Dependent-Variable-Constraint-Margins": {bound: margin.item()
+                                                          for bound, margin in dependent_variable_margins.items()},
+                "Output-Constraint-Margins": {bound: margin.item()
+                                              for bound, margin in output_margins.items()},
+                "Constraint-Gradients": {bound: gradient(margin) for bound, margin in margins.items()}
+            }
+        return result
+
     def close(self) -> None:
         logger.info("Closing environment...")
         exceptions = []
@@ -221,6 +458,44 @@ class Environment(AbstractEnvironment):
         quality_bounds_next = copy(self._objective_manager.config.output_bounds)
         return state_with_new_context, quality_bounds_next
 
+    def _predict_segments(self, state_arrays: dict[str, np.ndarray], output_models: list[dict[str, str]]) \
+            -> tuple[dict[str, np.ndarray], dict[str, np.ndarray]]:
+        """
+        Predicts the outputs of a rollout in one batch per run of steps with the same output models. The models of the
+        output manager are not swapped, models that are not allocated are only loaded for their run.
+        """
+        horizon = len(output_models)
+        mean_pred, var_pred = dict(), dict()
+        start = 0
+        while start < horizon:
+            stop = start + 1
+            while stop < horizon and output_models[stop] == output_models[start]:
+                stop += 1
+            mean_segment, var_segment = self._output_manager.predict(
+                {name: values[start:stop] for name, values in state_arrays.items()}, output_models[start])
+            for output_name in mean_segment:
+                mean_pred.setdefault(output_name, np.empty(horizon))[start:stop] = mean_segment[output_name]
+                var_pred.setdefault(output_name, np.empty(horizon))[start:stop] = var_segment[output_name]
+            start = stop
+        return mean_pred, var_pred
+
+    def _track(self, *log_variable_args) -> dict:
+        """
+        Compiles the log variables for the experiment tracker. If the tracker does not consume them, compiling is
+        deferred until log_vars is accessed and an empty dict is passed to the tracker instead.
+        """
+        if self._experiment_tracker.consumes_log_variables:
+            log_variables = compile_log_variables(*log_variable_args)
+            self.log_vars = copy(log_variables)
+            if self._track_stage_timings:
+                # durations of the current step so far, the tracker and next step stages are from the last step.
+                last = self._stage_timer.last
+                log_variables["Stage-Timings"] = {stage: last.get(stage, math.nan) for stage in STAGES}
+            return log_variables
+        self._log_vars = None
+        self._log_variable_args = log_variable_args
+        return dict()
+
     @staticmethod
     def _update_setpoints(setpoints, state):
         """
@@ -3,18 +3,27 @@ from omegaconf import DictConfig, OmegaConf
 from adanowo_simulator.objective_manager import ObjectiveManager
 from adanowo_simulator.action_manager import ActionManager
 from adanowo_simulator.disturbance_manager import DisturbanceManager
-from adanowo_simulator.output_manager import ParallelOutputManager, SequentialOutputManager
-from adanowo_simulator.output_manager_opcua import OpcuaOutputManager
+from adanowo_simulator.output_manager import ParallelOutputManager, SequentialOutputManager, ThreadedOutputManager
 from adanowo_simulator.scenario_manager import ScenarioManager
-from adanowo_simulator.experiment_tracker import WandBTracker, EmptyTracker
+from adanowo_simulator.experiment_tracker import WandBTracker, EmptyTracker, AsynchronousTracker, ColumnarTracker, \
+    AggregatingTracker
 from adanowo_simulator.environment import Environment
+from adanowo_simulator.stage_timer import StageTimer
 from adanowo_simulator.objective_functions import baseline_objective, baseline_penalty
 import adanowo_simulator.objective_functions_augsburg as objective_functions_augsburg
 
+OBJECTIVE_FUNCTIONS = {
+    "baseline": (baseline_objective, baseline_penalty),
+    # custom objective function for augsburg
+    "augsburg": (objective_functions_augsburg.baseline_objective, objective_functions_augsburg.baseline_penalty)
+}
+
 
 class EnvironmentFactory:
     def __init__(self, config: DictConfig):
         self.config = config
+        # shared by the environment and the output manager it creates.
+        self.stage_timer = StageTimer(self.config.profiling_settings.enabled)
 
     def create_disturbance_manager(self):
         return DisturbanceManager(self.config.disturbance_setup)
@@ -23,29 +32,47 @@ class EnvironmentFactory:
         return ActionManager(self.config.action_setup, self.config.action_setup.actions_are_relative)
 
     def create_output_manager(self):
-        # Decide whether to create a SequentialOutputManager or ParallelOutputManager
+        # Decide whether to create a SequentialOutputManager, ThreadedOutputManager or ParallelOutputManager
         if self.config.physical_execution:
+            from adanowo_simulator.output_manager_opcua import OpcuaOutputManager  # asyncua is slow to import.
             return OpcuaOutputManager(self.config.output_setup)
+        if self.config.output_setup.get("model_server", {}).get("enabled", False):
+            from adanowo_simulator.model_server import ServerOutputManager
+            return ServerOutputManager(self.config.output_setup, self.stage_timer)
+        if self.config.get("threaded_execution", False):
+            return ThreadedOutputManager(self.config.output_setup, self.stage_timer)
         if self.config.parallel_execution:
-            return ParallelOutputManager(self.config.output_setup)
+            return ParallelOutputManager(self.config.output_setup, self.stage_timer)
         else:
-            return SequentialOutputManager(self.config.output_setup)
+            return SequentialOutputManager(self.config.output_setup, self.stage_timer)
 
     def create_objective_manager(self):
-        if self.config.physical_execution:  # custom objective function for augsburg
-            return ObjectiveManager(objective_functions_augsburg.baseline_objective,
-                                    objective_functions_augsburg.baseline_penalty,
-                                    self.config.objective_setup)
-        return ObjectiveManager(baseline_objective, baseline_penalty, self.config.objective_setup)
+        objective_functions = self.config.objective_setup.get("objective_functions")
+        if objective_functions is None:
+            objective_functions = "augsburg" if self.config.physical_execution else "baseline"
+        objective_function, penalty_function = OBJECTIVE_FUNCTIONS[objective_functions]
+        return ObjectiveManager(objective_function, penalty_function, self.config.objective_setup)
 
     def create_scenario_manager(self):
         return ScenarioManager(self.config.scenario_setup)
 
     def create_experiment_tracker(self):
-        if self.config.tracking_enabled:
-            return WandBTracker(self.config.wandb_settings, self.config)
-        else:
+        if not self.config.tracking_enabled:
             return EmptyTracker(OmegaConf.create(), OmegaConf.create())
+        tracking_settings = self.config.tracking_settings
+        if tracking_settings.backend == "wandb":
+            tracker = WandBTracker(self.config.wandb_settings, self.config, tracking_settings.log_interval)
+        elif tracking_settings.backend == "columnar":
+            tracker = ColumnarTracker(self.config.columnar_settings, self.config, self.config.env_setup)
+        else:
+            raise ValueError(f"Unknown tracking backend {tracking_settings.backend}.")
+        if tracking_settings.asynchronous:
+            tracker = AsynchronousTracker(tracker, tracking_settings.queue_size, tracking_settings.back_pressure,
+                                          tracking_settings.sample_interval)
+        if tracking_settings.aggregate:
+            tracker = AggregatingTracker(tracker, tracking_settings.summary_interval, tracking_settings.quantiles,
+                                         tracking_settings.aggregated_categories)
+        return tracker
 
     def create_environment(self):
         return Environment(
@@ -55,5 +82,7 @@ class EnvironmentFactory:
             self.create_output_manager(),
             self.create_objective_manager(),
             self.create_scenario_manager(),
-            self.create_experiment_tracker()
+            self.create_experiment_tracker(),
+            self.stage_timer,
+            self.config.profiling_settings.track
         )
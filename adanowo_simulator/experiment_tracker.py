@@ -1,15 +1,72 @@
-import wandb as wb
+from __future__ import annotations
+
+import logging
+import threading
+from collections import deque
+from typing import TYPE_CHECKING
+
 from omegaconf import DictConfig, OmegaConf
 
 from adanowo_simulator.abstract_base_classes.experiment_tracker import AbstractExperimentTracker
+from adanowo_simulator.streaming_statistics import VariableStatistics
+
+if TYPE_CHECKING:
+    from adanowo_simulator.columnar_storage import ColumnarWriter, ColumnBuffer
+
+logger = logging.getLogger(__name__)
+# Log variable categories whose variables are fixed by the env_setup.
+ENV_SETUP_CATEGORIES = {
+    "Actions": "used_setpoints",
+    "Outputs": "used_outputs",
+    "Setpoints": "used_setpoints",
+    "Dependent-Variables": "used_dependent_variable_setpoints",
+    "Disturbances": "used_disturbances"
+}
+# Suffix of the log variables and categories that hold constraint checks (1 for met, 0 for violated).
+CONSTRAINT_SUFFIX = "Constraints-Met"
+SUMMARY_SUFFIX = "-Summary"
+
+
+class LogVariableFlattener:
+    """
+    Flattens log variables into a single dict with "category/name" keys.
+    Each key string is built only once and reused for all following steps.
+    """
+
+    def __init__(self):
+        self._keys: dict[str, dict[str, str]] = dict()
+
+    def __call__(self, log_variables: dict[str, dict[str, float]]) -> dict[str, float]:
+        flat_log_variables = dict()
+        for category, variables in log_variables.items():
+            keys = self._keys.get(category)
+            if keys is None:
+                keys = self._keys[category] = dict()
+            for name, value in variables.items():
+                key = keys.get(name)
+                if key is None:
+                    key = keys[name] = f"{category}/{name}"
+                flat_log_variables[key] = value
+        return flat_log_variables
 
 
 class WandBTracker(AbstractExperimentTracker):
+    """
+    Tracker that logs to Weights and Biases.
 
-    def __init__(self, tracker_config: DictConfig, tracked_config: DictConfig):
+    All variables of a step are logged with a single call. The logged rows can be buffered and sent every
+    'log_interval' steps to further reduce the overhead. Buffered rows are flushed when the tracker is closed.
+    """
+
+    def __init__(self, tracker_config: DictConfig, tracked_config: DictConfig, log_interval: int = 1):
+        if log_interval < 1:
+            raise ValueError("The log interval must be at least 1.")
         self._initial_tracker_config: DictConfig = tracker_config.copy()
         self._tracker_config: DictConfig = self._initial_tracker_config.copy()
         self._tracked_config: DictConfig = tracked_config.copy()
+        self._log_interval: int = log_interval
+        self._flatten = LogVariableFlattener()
+        self._buffer: list[tuple[dict[str, float], int]] = []
         self._run = None
         self._ready: bool = False
 
@@ -24,9 +81,9 @@ class WandBTracker(AbstractExperimentTracker):
     def step(self, log_variables: dict[str, dict[str, float]], step_index: int) -> None:
         if self._ready:
             try:
-                for category, variables in log_variables.items():
-                    for name, value in variables.items():
-                        self._run.log({f"{category}/{name}": value}, step_index)
+                self._buffer.append((self._flatten(log_variables), step_index))
+                if len(self._buffer) >= self._log_interval:
+                    self._flush()
             except Exception as e:
                 self.close()
                 raise e
@@ -38,6 +95,7 @@ class WandBTracker(AbstractExperimentTracker):
         try:
             self._tracker_config = self._initial_tracker_config.copy()
             tracked_config_container = OmegaConf.to_container(self._tracked_config)
+            import wandb as wb  # imported on first use, it takes long to import.
             self._run = wb.init(config=tracked_config_container, **self._tracker_config)
             self._ready = True
         except Exception as e:
@@ -46,10 +104,19 @@ class WandBTracker(AbstractExperimentTracker):
 
     def close(self) -> None:
         if self._run:
-            self._run.finish()
-            self._tracker_config = OmegaConf.create()
-            self._run = None
-            self._ready = False
+            try:
+                self._flush()
+            finally:
+                self._run.finish()
+                self._tracker_config = OmegaConf.create()
+                self._run = None
+                self._ready = False
+        self._buffer = []
+
+    def _flush(self) -> None:
+        for flat_log_variables, step_index in self._buffer:
+            self._run.log(flat_log_variables, step_index)
+        self._buffer = []
 
 
 class EmptyTracker(AbstractExperimentTracker):
@@ -69,6 +136,10 @@ class EmptyTracker(AbstractExperimentTracker):
     def config(self, c):
         self._tracker_config = c
 
+    @property
+    def consumes_log_variables(self) -> bool:
+        return False
+
     def step(self, log_variables: dict[str, dict[str, float]], step_index: int) -> None:
         return
 
@@ -77,3 +148,352 @@ class EmptyTracker(AbstractExperimentTracker):
 
     def close(self) -> None:
         return
+
+
+class ColumnarTracker(AbstractExperimentTracker):
+    """
+    Local tracker that writes the log variables into a columnar file.
+
+    The schema is fixed at reset: The variables of the categories in ENV_SETUP_CATEGORIES are taken from the
+    env_setup, all other categories (e.g. constraint checks) from the initial log variables. Without an env_setup,
+    the schema is taken from the first non-empty log variables. Variables that are not part of the schema are ignored,
+    missing variables are stored as NaN.
+
+    Each step is written into a preallocated buffer, which is appended to the file whenever 'chunk_size' steps are
+    buffered and on close. The initial log variables are stored as step 0. Read the file back with
+    :py:func:'~adanowo_simulator.columnar_storage.read_columnar'.
+    """
+
+    def __init__(self, tracker_config: DictConfig, tracked_config: DictConfig, env_config: DictConfig | None = None):
+        self._initial_tracker_config: DictConfig = tracker_config.copy()
+        self._tracker_config: DictConfig = self._initial_tracker_config.copy()
+        self._tracked_config: DictConfig = tracked_config.copy()
+        self._env_config: DictConfig | None = env_config.copy() if env_config is not None else None
+        self._column_indices: dict[str, dict[str, int]] | None = None
+        self._buffer: ColumnBuffer | None = None
+        self._writer: ColumnarWriter | None = None
+        self._ignored_variables: set[str] = set()
+        self._ready: bool = False
+
+    @property
+    def config(self) -> DictConfig:
+        return self._tracker_config
+
+    @config.setter
+    def config(self, c):
+        self._tracker_config = c
+
+    @property
+    def path(self) -> str:
+        return self._tracker_config.path
+
+    def step(self, log_variables: dict[str, dict[str, float]], step_index: int) -> None:
+        if not self._ready:
+            raise RuntimeError("Cannot call step() before calling reset().")
+        try:
+            self._append(log_variables, step_index)
+        except Exception as e:
+            self.close()
+            raise e
+
+    def reset(self, initial_log_variables: dict[str, dict[str, float]]) -> None:
+        self.close()
+        try:
+            self._tracker_config = self._initial_tracker_config.copy()
+            from adanowo_simulator.columnar_storage import ColumnarWriter
+            self._writer = ColumnarWriter(self._tracker_config.path, self._tracker_config.format,
+                                          {"config": OmegaConf.to_yaml(self._tracked_config)})
+            self._ready = True
+            self._append(initial_log_variables, 0)
+        except Exception as e:
+            self.close()
+            raise e
+
+    def close(self) -> None:
+        try:
+            if self._buffer is not None and len(self._buffer):
+                self._writer.append(self._buffer.pop())
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = None
+            self._buffer = None
+            self._column_indices = None
+            self._ignored_variables = set()
+            self._ready = False
+
+    def _append(self, log_variables: dict[str, dict[str, float]], step_index: int) -> None:
+        if self._column_indices is None:
+            if not any(log_variables.values()):
+                return
+            self._create_schema(log_variables)
+        row = self._buffer.new_row(step_index)
+        for category, variables in log_variables.items():
+            column_indices = self._column_indices.get(category, dict())
+            for name, value in variables.items():
+                column_index = column_indices.get(name)
+                if column_index is None:
+                    self._ignore(category, name)
+                elif value is not None:
+                    row[column_index] = value
+        if self._buffer.full:
+            self._writer.append(self._buffer.pop())
+
+    def _create_schema(self, log_variables: dict[str, dict[str, float]]) -> None:
+        categories = list(log_variables.keys())
+        if self._env_config is not None:
+            categories += [category for category in ENV_SETUP_CATEGORIES if category not in log_variables]
+        columns = []
+        self._column_indices = dict()
+        for category in categories:
+            if self._env_config is not None and category in ENV_SETUP_CATEGORIES:
+                names = self._env_config[ENV_SETUP_CATEGORIES[category]] or []
+            else:
+                names = log_variables[category].keys()
+            self._column_indices[category] = dict()
+            for name in names:
+                self._column_indices[category][name] = len(columns)
+                columns.append(f"{category}/{name}")
+        from adanowo_simulator.columnar_storage import ColumnBuffer
+        self._buffer = ColumnBuffer(columns, self._tracker_config.chunk_size)
+
+    def _ignore(self, category: str, name: str) -> None:
+        key = f"{category}/{name}"
+        if key not in self._ignored_variables:
+            self._ignored_variables.add(key)
+            logger.warning(f"Log variable {key} is not part of the schema and will not be tracked.")
+
+
+class AsynchronousTracker(AbstractExperimentTracker):
+    """
+    Decorator that hands the steps of another tracker over to a background thread.
+
+    Log variables are copied into a bounded queue, so :py:meth:'step' returns immediately and tracker I/O does not
+    stall the control loop. The behaviour for a full queue is set by 'back_pressure':
+    * "block" - Wait until the background thread has made room.
+    * "drop_oldest" - Discard the oldest queued step.
+    * "sample" - Keep only every 'sample_interval'-th step (waiting for room) and discard the others.
+    :py:meth:'reset' and :py:meth:'close' wait until all queued steps have been passed to the decorated tracker.
+    Errors of the decorated tracker are raised on the next call.
+    """
+
+    BACK_PRESSURE_MODES = ("block", "drop_oldest", "sample")
+
+    def __init__(self, tracker: AbstractExperimentTracker, queue_size: int = 1000, back_pressure: str = "block",
+                 sample_interval: int = 10):
+        if back_pressure not in self.BACK_PRESSURE_MODES:
+            raise ValueError(f"Unknown back pressure mode {back_pressure}. Use one of {self.BACK_PRESSURE_MODES}.")
+        if queue_size < 1 or sample_interval < 1:
+            raise ValueError("Queue size and sample interval must be at least 1.")
+        self._tracker: AbstractExperimentTracker = tracker
+        self._queue_size: int = queue_size
+        self._back_pressure: str = back_pressure
+        self._sample_interval: int = sample_interval
+        self._queue: deque[tuple[dict[str, dict[str, float]], int]] = deque()
+        self._condition = threading.Condition()
+        self._pending: int = 0  # queued steps and the step currently being tracked.
+        self._full_queue_count: int = 0
+        self._dropped_steps: int = 0
+        self._error: Exception | None = None
+        self._stop: bool = False
+        self._thread: threading.Thread | None = None
+        self._ready: bool = False
+
+    @property
+    def config(self) -> DictConfig:
+        return self._tracker.config
+
+    @config.setter
+    def config(self, c):
+        self._tracker.config = c
+
+    @property
+    def tracker(self) -> AbstractExperimentTracker:
+        return self._tracker
+
+    @property
+    def consumes_log_variables(self) -> bool:
+        return self._tracker.consumes_log_variables
+
+    @property
+    def dropped_steps(self) -> int:
+        return self._dropped_steps
+
+    def step(self, log_variables: dict[str, dict[str, float]], step_index: int) -> None:
+        if not self._ready:
+            raise RuntimeError("Cannot call step() before calling reset().")
+        self._raise_error()
+        # copy, since the environment may change the variable dicts after the step.
+        log_variables = {category: dict(variables) for category, variables in log_variables.items()}
+        with self._condition:
+            if len(self._queue) >= self._queue_size:
+                if self._back_pressure == "drop_oldest":
+                    self._queue.popleft()
+                    self._pending -= 1
+                    self._dropped_steps += 1
+                elif self._back_pressure == "sample" and self._full_queue_count % self._sample_interval != 0:
+                    self._full_queue_count += 1
+                    self._dropped_steps += 1
+                    return
+                else:
+                    self._full_queue_count += 1
+                    self._condition.wait_for(lambda: len(self._queue) < self._queue_size or self._error is not None)
+                    self._raise_error()
+            else:
+                self._full_queue_count = 0
+            self._queue.append((log_variables, step_index))
+            self._pending += 1
+            self._condition.notify_all()
+
+    def reset(self, initial_log_variables: dict[str, dict[str, float]]) -> None:
+        self._flush()
+        self._raise_error()
+        if self._thread is None:
+            self._stop = False
+            self._thread = threading.Thread(target=self._track, name="experiment-tracker", daemon=True)
+            self._thread.start()
+        self._dropped_steps = 0
+        self._full_queue_count = 0
+        self._tracker.reset(initial_log_variables)
+        self._ready = True
+
+    def close(self) -> None:
+        self._ready = False
+        self._flush()
+        if self._thread is not None:
+            with self._condition:
+                self._stop = True
+                self._condition.notify_all()
+            self._thread.join()
+            self._thread = None
+        error, self._error = self._error, None
+        self._tracker.close()
+        if error is not None:
+            raise error
+
+    def _track(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or self._stop)
+                if not self._queue:
+                    return
+                log_variables, step_index = self._queue.popleft()
+                self._condition.notify_all()
+            try:
+                self._tracker.step(log_variables, step_index)
+            except Exception as e:
+                # discard all queued steps, the error is raised in the calling thread.
+                with self._condition:
+                    self._error = e
+                    self._queue.clear()
+                    self._pending = 0
+                    self._condition.notify_all()
+                continue
+            with self._condition:
+                self._pending -= 1
+                self._condition.notify_all()
+
+    def _flush(self) -> None:
+        with self._condition:
+            if self._thread is not None:
+                self._condition.wait_for(lambda: self._pending == 0)
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("The decorated experiment tracker failed.") from error
+
+
+class AggregatingTracker(AbstractExperimentTracker):
+    """
+    Decorator that passes streaming summaries instead of the raw steps to another tracker.
+
+    For every variable of the aggregated categories, online statistics are kept: count, mean, variance, min, max and
+    the configured quantiles, or the number and rate of violations for constraint checks. Their memory does not
+    grow with the number of steps. The statistics cover the whole episode. They are passed to the decorated tracker
+    every 'summary_interval' steps and at the end of the episode, i.e. on the next reset and on close. A summary
+    interval of 0 only emits the episode summary.
+
+    Summaries are logged in the category "<category>-Summary" with the names "<name>/<statistic>". The summary of the
+    initial log variables is passed to the reset of the decorated tracker.
+    """
+
+    def __init__(self, tracker: AbstractExperimentTracker, summary_interval: int = 100,
+                 quantiles: list[float] | None = None, categories: list[str] | None = None):
+        if summary_interval < 0:
+            raise ValueError("The summary interval must not be negative.")
+        self._tracker: AbstractExperimentTracker = tracker
+        self._summary_interval: int = summary_interval
+        self._quantiles: list[float] = list(quantiles) if quantiles is not None else [0.05, 0.5, 0.95]
+        self._categories: list[str] | None = list(categories) if categories is not None else None
+        self._statistics: dict[str, dict[str, VariableStatistics]] = dict()
+        self._step_index: int = 0
+        self._steps_since_summary: int = 0
+        self._ready: bool = False
+
+    @property
+    def config(self) -> DictConfig:
+        return self._tracker.config
+
+    @config.setter
+    def config(self, c):
+        self._tracker.config = c
+
+    @property
+    def tracker(self) -> AbstractExperimentTracker:
+        return self._tracker
+
+    def step(self, log_variables: dict[str, dict[str, float]], step_index: int) -> None:
+        if not self._ready:
+            raise RuntimeError("Cannot call step() before calling reset().")
+        self._update(log_variables)
+        self._step_index = step_index
+        self._steps_since_summary += 1
+        if self._summary_interval and self._steps_since_summary >= self._summary_interval:
+            self._emit_summary()
+
+    def reset(self, initial_log_variables: dict[str, dict[str, float]]) -> None:
+        if self._ready and self._steps_since_summary:
+            self._emit_summary()
+        self._statistics = dict()
+        self._step_index = 0
+        self._steps_since_summary = 0
+        self._update(initial_log_variables)
+        self._tracker.reset(self._summary())
+        self._ready = True
+
+    def close(self) -> None:
+        try:
+            if self._ready and self._steps_since_summary:
+                self._emit_summary()
+        finally:
+            self._ready = False
+            self._statistics = dict()
+            self._tracker.close()
+
+    def _update(self, log_variables: dict[str, dict[str, float]]) -> None:
+        for category, variables in log_variables.items():
+            if self._categories is not None and category not in self._categories:
+                continue
+            statistics = self._statistics.get(category)
+            if statistics is None:
+                statistics = self._statistics[category] = dict()
+            for name, value in variables.items():
+                variable_statistics = statistics.get(name)
+                if variable_statistics is None:
+                    is_constraint = category.endswith(CONSTRAINT_SUFFIX) or name.endswith(CONSTRAINT_SUFFIX)
+                    variable_statistics = statistics[name] = VariableStatistics(self._quantiles, is_constraint)
+                variable_statistics.update(value)
+
+    def _summary(self) -> dict[str, dict[str, float]]:
+        summary = dict()
+        for category, statistics in self._statistics.items():
+            category_summary = summary[f"{category}{SUMMARY_SUFFIX}"] = dict()
+            for name, variable_statistics in statistics.items():
+                for statistic, value in variable_statistics.summary().items():
+                    category_summary[f"{name}/{statistic}"] = value
+        return summary
+
+    def _emit_summary(self) -> None:
+        self._tracker.step(self._summary(), self._step_index)
+        self._steps_since_summary = 0
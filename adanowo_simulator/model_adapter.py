@@ -4,6 +4,7 @@ from typing import OrderedDict
 import numpy as np
 import pandas as pd
 import torch
+import gpytorch
 from gpytorch.likelihoods import Likelihood
 from gpytorch.models import ExactGP
 from sklearn.base import BaseEstimator, TransformerMixin
@@ -13,6 +14,8 @@ from sklearn.preprocessing import RobustScaler
 
 from adanowo_simulator.abstract_base_classes.model_adapter import AbstractModelAdapter
 
+MEAN_BATCH_SIZE = 1024  # test points per evaluation of the mean of a GP
+
 
 class IdentityTransformer(BaseEstimator, TransformerMixin):
     """
@@ -45,6 +48,7 @@ class AdapterGpytorch(AbstractModelAdapter):
 
         # load the internal data transformation pipeline
         x_numpy = data[self._properties["training_inputs"]].to_numpy()
+        self._warm_up_input: np.array = x_numpy[:1]
         y_numpy = data[self._properties["training_target"]].to_numpy().reshape(-1, 1)
         list_transform = []
         if self._properties["X_is_scaled"]:
@@ -120,6 +124,44 @@ class AdapterGpytorch(AbstractModelAdapter):
         y_pred, var = self._rescaler_y(y_pred, var)
         return y_pred, var
 
+    def _predict_mean_internal(self, X: np.array) -> np.array:
+        # the posterior variances are skipped. The joint kernel of training and test points is still evaluated, so its
+        # cost grows quadratically with the number of test points and large batches are split.
+        x_tensor = self._numpy_to_model_input(X)
+        with torch.no_grad(), gpytorch.settings.skip_posterior_variances():
+            y_pred = np.concatenate([self._model(x_tensor[start:start + MEAN_BATCH_SIZE]).mean.cpu().numpy()
+                                     for start in range(0, len(x_tensor), MEAN_BATCH_SIZE)]).reshape(-1, 1)
+        y_pred, _ = self._rescaler_y(y_pred, np.zeros_like(y_pred))
+        return y_pred
+
+    def _transform_tensor(self, x: torch.Tensor) -> torch.Tensor:
+        """Applies the fitted pipeline with torch operations, so that autograd can differentiate it."""
+        for _, transformer in self._pipe.steps:
+            if isinstance(transformer, RobustScaler):
+                if transformer.center_ is not None:
+                    x = x - torch.as_tensor(transformer.center_, dtype=x.dtype, device=x.device)
+                if transformer.scale_ is not None:
+                    x = x / torch.as_tensor(transformer.scale_, dtype=x.dtype, device=x.device)
+            elif isinstance(transformer, PCA):
+                x = (x - torch.as_tensor(transformer.mean_, dtype=x.dtype, device=x.device)) @ \
+                    torch.as_tensor(transformer.components_.T, dtype=x.dtype, device=x.device)
+                if transformer.whiten:
+                    x = x / torch.as_tensor(np.sqrt(transformer.explained_variance_), dtype=x.dtype, device=x.device)
+        return x
+
+    def predict_mean_differentiable(self, X: dict[str, torch.Tensor]) -> torch.Tensor:
+        x_tensor = self._unpack_func(X, self._properties["training_inputs"])
+        if not torch.is_tensor(x_tensor):
+            raise TypeError("The unpack function of the model does not support torch tensors, so it cannot be "
+                            "differentiated.")
+        train_inputs = self._model.train_inputs[0]
+        x_tensor = self._transform_tensor(x_tensor.to(device=train_inputs.device, dtype=torch.float64))
+        with gpytorch.settings.skip_posterior_variances():
+            y_pred = self._model(x_tensor.to(train_inputs.dtype)).mean.to(torch.float64).cpu()
+        if self._scaler_y is not None and self._rescale_y:
+            y_pred = y_pred * self._scaler_y.scale_[0] + self._scaler_y.center_[0]
+        return y_pred
+
     def predict_f(self, X: dict[str, float]) -> np.array:
         X = self._unpack_func(X, self._properties["training_inputs"])
         y_pred, var = self._predict_f_internal(X)
@@ -127,13 +169,23 @@ class AdapterGpytorch(AbstractModelAdapter):
 
     def predict_y(self, X: dict[str, float], **kwargs) -> np.array:
         X = self._unpack_func(X, self._properties["training_inputs"])
-        y_pred, var = self._predict_y_internal(X)
-        if "observation_noise_only" in kwargs:
-            if kwargs["observation_noise_only"]:
-                var_scalar = copy(self._noise_variance)
-                var = np.ones_like(y_pred) * var_scalar
+        if kwargs.get("observation_noise_only", False):
+            # the mean of the likelihood equals the mean of the latent function.
+            y_pred = self._predict_mean_internal(X)
+            var_scalar = copy(self._noise_variance)
+            var = np.ones_like(y_pred) * var_scalar
+        else:
+            y_pred, var = self._predict_y_internal(X)
         return y_pred, var
 
+    def share_memory(self) -> None:
+        # a first prediction computes the caches of the GP, so forked workers share them instead of building copies.
+        self._predict_y_internal(self._warm_up_input)
+        self._model.share_memory()
+        self._likelihood.share_memory()
+        for tensor in (*self._model.train_inputs, self._model.train_targets):
+            tensor.share_memory_()
+
     def close(self):
         self._Tensor = None
         self._model = None
@@ -158,5 +210,11 @@ class AdapterPyScript(AbstractModelAdapter):
         f_pred, var = self._model(X)
         return f_pred, var
 
+    def predict_mean_differentiable(self, X: dict[str, torch.Tensor]) -> torch.Tensor:
+        f_pred, _ = self._model(X)
+        if not torch.is_tensor(f_pred):
+            raise TypeError("The model does not support torch tensors, so it cannot be differentiated.")
+        return f_pred.reshape(-1)
+
     def close(self):
         pass
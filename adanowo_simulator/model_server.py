@@ -0,0 +1,360 @@
+import os
+import stat
+import logging
+import queue
+import threading
+import time
+import traceback
+import tempfile
+import multiprocessing
+import pathlib as pl
+from concurrent.futures import Future
+from typing import TYPE_CHECKING
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client, Connection
+
+import numpy as np
+from omegaconf import DictConfig
+
+from adanowo_simulator.abstract_base_classes.model_adapter import AbstractModelAdapter
+from adanowo_simulator.output_manager import SequentialOutputManager, load_models, get_path_to_output_models
+from adanowo_simulator.stage_timer import StageTimer
+
+if TYPE_CHECKING:
+    import torch
+
+logger = logging.getLogger(__name__)
+CONNECT_TIMEOUT = 60  # seconds
+CONNECT_RETRY_INTERVAL = 0.05  # seconds
+SOCKET_NAME = "adanowo_model_server.sock"
+AUTHKEY_VARIABLE = "ADANOWO_MODEL_SERVER_AUTHKEY"  # hex key of the server, exported by ModelServer.start()
+
+
+def default_address() -> str:
+    """
+    Socket in a directory that only the current user can access: $XDG_RUNTIME_DIR or a directory of the user in the
+    temporary directory, which is created if necessary.
+    """
+    runtime_directory = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_directory:
+        return str(pl.Path(runtime_directory) / SOCKET_NAME)
+    directory = pl.Path(tempfile.gettempdir()) / f"adanowo-{os.getuid()}"
+    directory.mkdir(mode=0o700, exist_ok=True)
+    status = directory.lstat()
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid() or stat.S_IMODE(status.st_mode) & 0o077:
+        raise PermissionError(f"{directory} is not a directory that only the current user can access.")
+    return str(directory / SOCKET_NAME)
+
+
+def resolve_authkey(authkey: str | bytes | None = None) -> bytes:
+    """Key as bytes from bytes or hex, taken from the environment variable ADANOWO_MODEL_SERVER_AUTHKEY if empty."""
+    authkey = authkey or os.environ.get(AUTHKEY_VARIABLE)
+    if not authkey:
+        raise ValueError(f"The model server needs an authentication key. Set output_setup.model_server.authkey or "
+                         f"{AUTHKEY_VARIABLE} to ModelServer.authkey.")
+    return bytes.fromhex(authkey) if isinstance(authkey, str) else bytes(authkey)
+
+
+class ModelServer:
+    """
+    Local server process that hosts every output model once for all environments of a host.
+
+    Environments connect via a Unix socket (see :py:class:'ModelServerClient' and :py:class:'ServerOutputManager'),
+    by default in a directory of the current user (see :py:func:'default_address'). Connections are authenticated
+    with 'authkey', a random key by default. :py:meth:'start' exports it as ADANOWO_MODEL_SERVER_AUTHKEY, so
+    environments that are created by the same process or its children find it, others need it in their config.
+    Prediction requests for the same model are coalesced into dynamic batches: A batch is evaluated as soon as
+    'max_batch_size' requests are waiting or the first request has waited 'max_latency' seconds. Models are loaded on
+    the first request of an environment that uses them.
+    """
+
+    def __init__(self, address: str | None = None, path_to_output_models: str | None = None, max_batch_size: int = 32,
+                 max_latency: float = 0.002, authkey: bytes | None = None):
+        if max_batch_size < 1:
+            raise ValueError("The maximum batch size must be at least 1.")
+        self._address: str = address or default_address()
+        self._authkey: bytes = authkey or os.urandom(32)
+        self._path_to_output_models: str | None = path_to_output_models
+        self._max_batch_size: int = max_batch_size
+        self._max_latency: float = max_latency
+        self._process: multiprocessing.Process | None = None
+
+    @property
+    def address(self) -> str:
+        return self._address
+
+    @property
+    def authkey(self) -> bytes:
+        return self._authkey
+
+    @property
+    def pid(self) -> int | None:
+        return self._process.pid if self._process is not None else None
+
+    def start(self) -> None:
+        if self._process is not None and self._process.is_alive():
+            return
+        try:
+            Client(self._address, family="AF_UNIX").close()
+        except (FileNotFoundError, ConnectionRefusedError):
+            pl.Path(self._address).unlink(missing_ok=True)  # left over from a server that has not been stopped.
+        else:
+            raise RuntimeError(f"Another model server is listening on {self._address}.")
+        self._process = multiprocessing.Process(
+            target=_serve, args=(self._address, self._authkey, self._path_to_output_models, self._max_batch_size,
+                                 self._max_latency), name="model-server", daemon=True)
+        self._process.start()
+        # returns once the server accepts connections.
+        client = ModelServerClient(self._address, self._authkey, process=self._process)
+        client.close()
+        os.environ[AUTHKEY_VARIABLE] = self._authkey.hex()
+        logger.info(f"Model server is listening on {self._address}.")
+
+    def stop(self) -> None:
+        if self._process is None:
+            return
+        if self._process.is_alive():
+            client = ModelServerClient(self._address, self._authkey, process=self._process)
+            try:
+                client.request("shutdown")
+            finally:
+                client.close()
+        self._process.join()
+        self._process = None
+        logger.info("Model server has been stopped.")
+
+    def __enter__(self) -> "ModelServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+class ModelServerClient:
+    """
+    Connection of one environment to a :py:class:'ModelServer'. Not thread safe, use one client per thread. See
+    :py:func:'resolve_authkey' for 'authkey'.
+    """
+
+    def __init__(self, address: str | None = None, authkey: str | bytes | None = None,
+                 process: multiprocessing.Process | None = None):
+        address = address or default_address()
+        authkey = resolve_authkey(authkey)
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while True:
+            try:
+                self._connection: Connection = Client(address, family="AF_UNIX", authkey=authkey)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if process is not None and not process.is_alive():
+                    raise RuntimeError("Model server process has died.")
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Model server at {address} is not reachable.")
+                time.sleep(CONNECT_RETRY_INTERVAL)
+
+    def request(self, command: str, *args):
+        self._connection.send((command, args))
+        status, result = self._connection.recv()
+        if status == "error":
+            raise RuntimeError(f"Model server request {command} failed:\n{result}")
+        return result
+
+    def load(self, model_names: list[str]) -> None:
+        self.request("load", list(model_names))
+
+    def predict(self, output_models: dict[str, str], X: dict[str, float]) \
+            -> tuple[dict[str, np.array], dict[str, np.array]]:
+        """Predicts all outputs with observation noise only. The keys of 'output_models' are the output names."""
+        return self.request("predict", dict(output_models), X)
+
+    def statistics(self) -> dict[str, float]:
+        """Number of requests, number of batches and mean batch size of the server."""
+        return self.request("statistics")
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class ServerOutputManager(SequentialOutputManager):
+    """
+    Output manager that evaluates the models in a shared :py:class:'ModelServer' instead of loading them itself.
+    The server has to be started beforehand, e.g. by the script that starts the environments.
+    """
+
+    def __init__(self, config: DictConfig, stage_timer: StageTimer | None = None):
+        super().__init__(config, stage_timer)
+        self._client: ModelServerClient | None = None
+
+    def close(self) -> None:
+        self._discard_all_prefetched()
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        self._ready = False
+
+    def predict_differentiable(self, X: dict[str, "torch.Tensor"]) -> dict[str, "torch.Tensor"]:
+        raise NotImplementedError(f"{type(self).__name__} evaluates the models in the model server, so they cannot be "
+                                  f"differentiated.")
+
+    def _connect(self) -> ModelServerClient:
+        return ModelServerClient(self._config.model_server.get("address"), self._config.model_server.get("authkey"))
+
+    def _load_model(self, model_name: str) -> None:
+        # runs in the prefetch thread, which needs its own connection.
+        client = self._connect()
+        try:
+            client.load([model_name])
+        finally:
+            client.close()
+
+    def _swap_in(self, output_name: str, model_name: str, prefetched: Future) -> None:
+        # the server evaluates the models by name, so it only has to have loaded the new one.
+        prefetched.result()
+
+    def _allocate_models(self, output_models: dict[str, str]) -> None:
+        if self._client is None:
+            self._client = self._connect()
+        self._client.load(list(output_models.values()))
+        for output_name, model_name in output_models.items():
+            logger.info(f"Allocated model {model_name} of the model server to output {output_name}.")
+
+    def _call_models(self, X: dict[str, float]) -> (dict[str, np.array], dict[str, np.array]):
+        with self._stage_timer.span("Outputs/Model-Server"):
+            return self._client.predict(self._model_config, X)
+
+    def _call_other_models(self, X: dict[str, float], output_models: dict[str, str]) \
+            -> (dict[str, np.array], dict[str, np.array]):
+        # the server evaluates the models by name and keeps those it has loaded, the allocation is not changed.
+        missing = [model_name for output_name, model_name in output_models.items()
+                   if self._model_config.get(output_name) != model_name]
+        if missing:
+            self._client.load(missing)
+        with self._stage_timer.span("Outputs/Model-Server"):
+            return self._client.predict(output_models, X)
+
+
+class _ModelServerState:
+    """State of the server process: models, their batching queues and statistics."""
+
+    def __init__(self, path_to_output_models: str | None, max_batch_size: int, max_latency: float):
+        self.path_to_output_models: pl.Path = get_path_to_output_models(path_to_output_models)
+        self.max_batch_size: int = max_batch_size
+        self.max_latency: float = max_latency
+        self.models: dict[str, AbstractModelAdapter] = dict()
+        self.queues: dict[str, queue.Queue] = dict()
+        self.lock = threading.Lock()
+        self.request_count: int = 0
+        self.batch_count: int = 0
+
+    def load(self, model_names: list[str]) -> None:
+        with self.lock:
+            missing = {name: name for name in model_names if name not in self.models}
+            for model_name, mdl in load_models(missing, self.path_to_output_models).items():
+                self.models[model_name] = mdl
+                self.queues[model_name] = queue.Queue()
+                threading.Thread(target=self.batch_loop, args=(model_name,), name=f"batcher-{model_name}",
+                                 daemon=True).start()
+                logger.info(f"Model server has loaded model {model_name}.")
+
+    def submit(self, model_name: str, X: dict[str, float | np.ndarray]) -> Future:
+        future = Future()
+        self.queues[model_name].put((X, future))
+        return future
+
+    def batch_loop(self, model_name: str) -> None:
+        requests = self.queues[model_name]
+        while True:
+            batch = [requests.get()]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self.evaluate(model_name, batch)
+
+    def evaluate(self, model_name: str, batch: list[tuple[dict[str, float], Future]]) -> None:
+        # requests can only be stacked if they have the same input variables.
+        groups: dict[tuple[str, ...], list[tuple[dict[str, float], Future]]] = dict()
+        for request in batch:
+            groups.setdefault(tuple(request[0].keys()), []).append(request)
+        for keys, group in groups.items():
+            try:
+                # a request holds one state (scalars) or several ones (arrays, e.g. of a rollout).
+                offsets = np.cumsum([0] + [np.size(inputs[keys[0]]) for inputs, _ in group])
+                X = {key: np.concatenate([np.atleast_1d(inputs[key]) for inputs, _ in group]) for key in keys}
+                mean_pred, var_pred = self.models[model_name].predict_y(X, observation_noise_only=True)
+                mean_pred = np.asarray(mean_pred).reshape(offsets[-1], -1)
+                var_pred = np.asarray(var_pred).reshape(offsets[-1], -1)
+            except Exception as e:
+                for _, future in group:
+                    future.set_exception(e)
+                continue
+            for index, (_, future) in enumerate(group):
+                future.set_result((mean_pred[offsets[index]:offsets[index + 1]],
+                                   var_pred[offsets[index]:offsets[index + 1]]))
+        with self.lock:
+            self.request_count += len(batch)
+            self.batch_count += len(groups)
+
+    def statistics(self) -> dict[str, float]:
+        with self.lock:
+            return {"requests": self.request_count, "batches": self.batch_count,
+                    "mean_batch_size": self.request_count / self.batch_count if self.batch_count else 0.0}
+
+
+def _serve(address: str, authkey: bytes, path_to_output_models: str | None, max_batch_size: int,
+           max_latency: float) -> None:
+    state = _ModelServerState(path_to_output_models, max_batch_size, max_latency)
+    listener = Listener(address, family="AF_UNIX", authkey=authkey)
+    shutdown = threading.Event()
+
+    def handle(connection: Connection) -> None:
+        with connection:
+            while True:
+                try:
+                    command, args = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if command == "load":
+                        result = state.load(*args)
+                    elif command == "predict":
+                        output_models, X = args
+                        futures = {name: state.submit(model_name, X) for name, model_name in output_models.items()}
+                        mean_pred, var_pred = dict(), dict()
+                        for output_name, future in futures.items():
+                            mean_pred[output_name], var_pred[output_name] = future.result()
+                        result = (mean_pred, var_pred)
+                    elif command == "statistics":
+                        result = state.statistics()
+                    elif command == "shutdown":
+                        shutdown.set()
+                        connection.send(("ok", None))
+                        # unblock accept() of the main thread.
+                        Client(address, family="AF_UNIX", authkey=authkey).close()
+                        return
+                    else:
+                        raise ValueError(f"Unknown command {command}.")
+                except Exception:
+                    connection.send(("error", traceback.format_exc()))
+                    continue
+                connection.send(("ok", result))
+
+    try:
+        while not shutdown.is_set():
+            try:
+                connection = listener.accept()
+            except (AuthenticationError, EOFError, ConnectionError) as e:
+                logger.warning(f"Model server has rejected a connection: {e!r}")
+                continue
+            if shutdown.is_set():
+                connection.close()
+                break
+            threading.Thread(target=handle, args=(connection,), name="model-server-connection", daemon=True).start()
+    finally:
+        listener.close()
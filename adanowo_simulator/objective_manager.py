@@ -1,7 +1,14 @@
-from typing import Callable
-from omegaconf import DictConfig
+from __future__ import annotations
+
+from typing import Callable, TYPE_CHECKING
+import numpy as np
+from omegaconf import DictConfig, OmegaConf
 
 from adanowo_simulator.abstract_base_classes.objective_manager import AbstractObjectiveManager
+from adanowo_simulator.snapshot import restore_config_values
+
+if TYPE_CHECKING:
+    import torch
 
 
 class ObjectiveManager(AbstractObjectiveManager):
@@ -46,9 +53,58 @@ class ObjectiveManager(AbstractObjectiveManager):
             dependent_variables_okay_initially)
         return reward, output_constraints_met
 
+    def evaluate_samples(self, state: dict[str, float], outputs: dict[str, np.ndarray], setpoints_okay: bool,
+                         dependent_variables_okay: bool, output_bounds: dict[str, dict[str, float | None]]) \
+            -> tuple[np.ndarray, np.ndarray]:
+        if not self._ready:
+            raise RuntimeError("Cannot call evaluate_samples() before calling reset().")
+        sample_count = len(next(iter(outputs.values())))
+        outputs_okay = np.ones(sample_count, dtype=bool)
+        for output_name, boundaries in output_bounds.items():
+            if output_name not in outputs:
+                raise KeyError("There has been a mismatch between outputs and constraints. Please check the config.")
+            output = outputs[output_name]
+            lower, upper = boundaries.get("lower"), boundaries.get("upper")
+            if lower is not None:
+                outputs_okay &= ~(output < lower)
+            if upper is not None:
+                outputs_okay &= ~(output > upper)
+        # the objective functions are plain arithmetic, so they evaluate all samples at once.
+        reward = self._get_reward(state, outputs)
+        if setpoints_okay and dependent_variables_okay:
+            penalty = self._get_penalty(state, outputs)
+            objective_values = np.where(outputs_okay, reward, penalty)
+        else:
+            objective_values = self._get_penalty(state, outputs)
+        return np.broadcast_to(np.asarray(objective_values, dtype=np.float64), (sample_count,)), outputs_okay
+
+    def evaluate_differentiable(self, state: dict[str, torch.Tensor], outputs: dict[str, torch.Tensor],
+                                output_bounds: dict[str, dict[str, float | None]]) \
+            -> tuple[torch.Tensor, dict[str, torch.Tensor]]:
+        if not self._ready:
+            raise RuntimeError("Cannot call evaluate_differentiable() before calling reset().")
+        output_margins = dict()
+        for output_name, boundaries in output_bounds.items():
+            if output_name not in outputs:
+                raise KeyError("There has been a mismatch between outputs and constraints. Please check the config.")
+            lower, upper = boundaries.get("lower"), boundaries.get("upper")
+            if lower is not None:
+                output_margins[f"{output_name}.lower"] = outputs[output_name] - lower
+            if upper is not None:
+                output_margins[f"{output_name}.upper"] = upper - outputs[output_name]
+        # the penalty replaces the objective where a bound is violated, which is not differentiable, so the margins
+        # are returned instead.
+        return self._get_reward(state, outputs), output_margins
+
     def close(self) -> None:
         self._ready = False
 
+    def snapshot(self) -> dict:
+        return {"output_bounds": OmegaConf.to_container(self._config.output_bounds)}
+
+    def restore(self, snapshot: dict) -> None:
+        restore_config_values(self._config.output_bounds, snapshot["output_bounds"])
+
     def _get_reward(self, state: dict[str, float], outputs: dict[str, float]) -> float:
         reward = self._reward_function(state, outputs, self._config.reward_parameters)
         return reward
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import threading
+import random
+import time
+from itertools import cycle
+
+from omegaconf import DictConfig, OmegaConf
+from asyncua import Server, ua
+
+from adanowo_simulator.action_manager import ActionManager
+from adanowo_simulator.disturbance_manager import DisturbanceManager
+from adanowo_simulator.output_manager import SequentialOutputManager
+
+logger = logging.getLogger(__name__)
+# Setpoints that the OpcuaOutputManager writes as integers instead of doubles.
+INTEGER_SETPOINTS = ("Cross-lapperLayersCount",)
+DECISIONS = ("ACCEPTED", "REJECTED")
+SERVER_START_TIMEOUT = 30  # seconds
+
+
+class ScriptedOperator:
+    """
+    Simulated machine operator that answers the recommendations of the agent.
+
+    The decisions are taken from a fixed script which is cycled through. Every decision is made after a configurable
+    delay, optionally with some uniformly distributed jitter to mimic the reaction time of a human.
+    """
+
+    def __init__(self, config: DictConfig):
+        self._config: DictConfig = config.copy()
+        decisions = [decision.upper() for decision in self._config.decisions]
+        for decision in decisions:
+            if decision not in DECISIONS:
+                raise ValueError(f"Unknown operator decision {decision}. Use one of {DECISIONS}.")
+        self._decisions = cycle(decisions)
+        self._random = random.Random(self._config.seed)
+
+    @property
+    def config(self) -> DictConfig:
+        return self._config
+
+    def next_decision(self) -> tuple[str, float]:
+        delay = self._config.decision_delay + self._random.uniform(0.0, self._config.decision_delay_jitter)
+        return next(self._decisions), delay
+
+
+class OpcuaStandInServer:
+    """
+    Local OPC UA server that stands in for the physical plant.
+
+    The server mirrors the node layout expected by the
+    :py:class:'~adanowo_simulator.output_manager_opcua.OpcuaOutputManager' (control state node, agent input node and
+    agent output node as configured in the connection config). The recommendations written by the agent are answered
+    by a :py:class:'ScriptedOperator'. If the operator accepts, the recommended setpoints are applied to a simulated
+    plant and the outputs of the simulated output models are served as measurements.
+
+    The server runs its own event loop in a background thread, so it can be used from synchronous test and benchmark
+    code. It can be restarted to test the reconnect behaviour of clients.
+    """
+
+    def __init__(self, connection_config: DictConfig, stand_in_config: DictConfig, action_config: DictConfig,
+                 disturbance_config: DictConfig):
+        self._connection_config: DictConfig = connection_config.copy()
+        self._config: DictConfig = stand_in_config.copy()
+        self._state_values: dict[str, int] = {
+            "INVALID": self._connection_config.agent_state_values["invalid"],
+            "VALID": self._connection_config.agent_state_values["valid"],
+            "ACCEPTED": self._connection_config.agent_state_values["accepted"],
+            "REJECTED": self._connection_config.agent_state_values["rejected"]
+        }
+        self._operator = ScriptedOperator(self._config.operator)
+
+        # simulated plant. Recommendations of the agent are always absolute setpoints.
+        action_config = OmegaConf.merge(action_config, {"actions_are_relative": False})
+        self._action_manager = ActionManager(action_config, actions_are_relative=False)
+        self._disturbance_manager = DisturbanceManager(disturbance_config)
+        self._output_manager = SequentialOutputManager(self._config.simulation)
+        self._state: dict[str, float] = dict()
+        self._outputs: dict[str, float] = dict()
+
+        self._thread: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stop_event: asyncio.Event | None = None
+        self._started = threading.Event()
+        self._startup_error: Exception | None = None
+        self._decision_count: dict[str, int] = {decision: 0 for decision in DECISIONS}
+
+    @property
+    def config(self) -> DictConfig:
+        return self._config
+
+    @property
+    def state(self) -> dict[str, float]:
+        return self._state
+
+    @property
+    def outputs(self) -> dict[str, float]:
+        return self._outputs
+
+    @property
+    def decision_count(self) -> dict[str, int]:
+        return self._decision_count
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if not self._state:
+            self._initialize_plant()
+        self._started.clear()
+        self._startup_error = None
+        self._thread = threading.Thread(target=self._run_loop, name="opcua-stand-in", daemon=True)
+        self._thread.start()
+        if not self._started.wait(SERVER_START_TIMEOUT):
+            raise TimeoutError("OPC UA stand-in server did not start in time.")
+        if self._startup_error is not None:
+            raise self._startup_error
+        logger.info(f"OPC UA stand-in server is listening on {self._connection_config.server_url}.")
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+        self._thread.join()
+        self._thread = None
+        logger.info("OPC UA stand-in server has been stopped.")
+
+    def restart(self, downtime: float = 0.0) -> None:
+        """Stops the server and starts it again after 'downtime' seconds. The plant state is kept."""
+        self.stop()
+        time.sleep(downtime)
+        self.start()
+
+    def close(self) -> None:
+        self.stop()
+        self._output_manager.close()
+        self._action_manager.close()
+        self._disturbance_manager.close()
+
+    def _initialize_plant(self) -> None:
+        disturbances = self._disturbance_manager.reset()
+        setpoints, dependent_variables, _, _ = self._action_manager.reset(disturbances)
+        self._state = disturbances | setpoints | dependent_variables
+        self._outputs = self._output_manager.reset(self._state)
+
+    def _apply_recommendation(self, recommendation: dict[str, float]) -> None:
+        disturbances = self._disturbance_manager.step()
+        actions = self._action_manager.config.initial_setpoints.keys()
+        recommendation = {name: recommendation.get(name, self._state[name]) for name in actions}
+        setpoints, dependent_variables, _, _ = self._action_manager.step(recommendation, disturbances)
+        self._state = disturbances | setpoints | dependent_variables
+        self._outputs = self._output_manager.step(self._state)
+
+    def _run_loop(self) -> None:
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            self._startup_error = e
+            self._started.set()
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        server = Server()
+        await server.init()
+        server.set_endpoint(self._connection_config.server_url)
+        server.set_server_name("adanowo_simulator OPC UA stand-in")
+        namespace_index = await server.register_namespace(self._config.namespace_uri)
+        for node_id in (self._connection_config.control_state_node_id, self._connection_config.agent_input_node,
+                        self._connection_config.agent_output_node):
+            if node_id["namespace_index"] != namespace_index:
+                raise ValueError(f"The stand-in can only serve nodes in namespace {namespace_index}.")
+
+        objects = server.nodes.objects
+        control_state_node = await objects.add_variable(
+            self._node_id(self._connection_config.control_state_node_id), "AgentControlState",
+            ua.Variant(self._state_values["INVALID"], ua.VariantType.Int64))
+        await control_state_node.set_writable()
+        input_parent_node = await objects.add_object(
+            self._node_id(self._connection_config.agent_input_node), "AgentInputs")
+        output_parent_node = await objects.add_object(
+            self._node_id(self._connection_config.agent_output_node), "AgentOutputs")
+
+        input_nodes = dict()
+        for name, value in self._served_inputs().items():
+            input_nodes[name] = await input_parent_node.add_variable(
+                namespace_index, name, ua.Variant(value, ua.VariantType.Double))
+        output_nodes = dict()
+        for name in self._action_manager.config.initial_setpoints.keys():
+            if name in INTEGER_SETPOINTS:
+                variant = ua.Variant(int(round(self._state[name])), ua.VariantType.Int64)
+            else:
+                variant = ua.Variant(float(self._state[name]), ua.VariantType.Double)
+            output_nodes[name] = await output_parent_node.add_variable(namespace_index, name, variant)
+            await output_nodes[name].set_writable()
+
+        async with server:
+            self._started.set()
+            operator_task = asyncio.create_task(
+                self._operate(control_state_node, input_nodes, output_nodes))
+            await self._stop_event.wait()
+            operator_task.cancel()
+            try:
+                await operator_task
+            except asyncio.CancelledError:
+                pass
+
+    async def _operate(self, control_state_node, input_nodes: dict, output_nodes: dict) -> None:
+        while True:
+            control_state = await control_state_node.read_value()
+            if control_state == self._state_values["VALID"]:
+                decision, delay = self._operator.next_decision()
+                await asyncio.sleep(delay)
+                if decision == "ACCEPTED":
+                    recommendation = {name: float(await node.read_value()) for name, node in output_nodes.items()}
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, self._apply_recommendation, recommendation)
+                    for name, value in self._served_inputs().items():
+                        await input_nodes[name].write_value(ua.Variant(value, ua.VariantType.Double))
+                await control_state_node.write_value(
+                    ua.Variant(self._state_values[decision], ua.VariantType.Int64))
+                self._decision_count[decision] += 1
+                logger.debug(f"Operator decision: {decision} after {delay:.3f} s.")
+            await asyncio.sleep(self._config.operator.polling_interval)
+
+    def _served_inputs(self) -> dict[str, float]:
+        served_inputs = {name: float(value) for name, value in self._state.items()}
+        for name in self._connection_config.output_models:
+            served_inputs[name] = float(self._outputs.get(name, 0.0))
+        return served_inputs
+
+    @staticmethod
+    def _node_id(node_id: dict[str, int]) -> ua.NodeId:
+        return ua.NodeId(node_id["identifier"], node_id["namespace_index"])
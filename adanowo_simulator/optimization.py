@@ -0,0 +1,403 @@
+import os
+import time
+import logging
+import pathlib as pl
+
+import numpy as np
+import pandas as pd
+from omegaconf import DictConfig, OmegaConf
+
+from adanowo_simulator.snapshot import serialize_snapshot, deserialize_snapshot
+from adanowo_simulator.sweep import SweepEvaluator, sweep_bounds
+from adanowo_simulator.worker_pool import fork_context, initialize_worker, call_in_worker
+
+logger = logging.getLogger(__name__)
+
+MAX_CONDITION_NUMBER = 1e14  # of the covariance matrix, CMA-ES stops if it is exceeded
+
+
+class CMAES:
+    """
+    Covariance matrix adaptation evolution strategy with weighted recombination, rank-one and rank-mu updates of the
+    covariance matrix and cumulative step-size adaptation (Hansen, The CMA Evolution Strategy: A Tutorial, 2016). It
+    minimizes: candidates are sampled with :py:meth:'ask' and their values are passed to :py:meth:'tell'.
+
+    The complete state, including the random generator, is a dict of plain Python objects and NumPy arrays (see
+    :py:attr:'state' and :py:meth:'from_state'), so runs can be checkpointed and resumed with identical results.
+    """
+
+    def __init__(self, mean: np.ndarray, sigma: float, population_size: int | None = None, seed: int = 0):
+        mean = np.asarray(mean, dtype=np.float64)
+        if mean.ndim != 1 or len(mean) < 1 or sigma <= 0:
+            raise ValueError("CMA-ES needs a mean vector with at least one entry and a positive step size.")
+        dimension = len(mean)
+        population_size = int(population_size or 4 + int(3 * np.log(dimension)))
+        if population_size < 2:
+            raise ValueError("The population size of CMA-ES must be at least 2.")
+        self._mean: np.ndarray = mean
+        self._sigma: float = float(sigma)
+        self._covariance: np.ndarray = np.eye(dimension)
+        self._path_covariance: np.ndarray = np.zeros(dimension)
+        self._path_sigma: np.ndarray = np.zeros(dimension)
+        self._generation: int = 0
+        # best values of the recent generations and values of the last one for the stop criterion on the values.
+        self._recent_best_values: list[float] = []
+        self._last_values: np.ndarray = np.empty(0)
+        self._generator: np.random.Generator = np.random.default_rng(seed)
+        self._set_parameters(dimension, population_size)
+
+    @classmethod
+    def from_state(cls, state: dict) -> "CMAES":
+        strategy = cls(state["mean"], state["sigma"], state["population_size"])
+        strategy._covariance = np.array(state["covariance"])
+        strategy._path_covariance = np.array(state["path_covariance"])
+        strategy._path_sigma = np.array(state["path_sigma"])
+        strategy._generation = state["generation"]
+        strategy._recent_best_values = list(state["recent_best_values"])
+        strategy._last_values = np.array(state["last_values"])
+        strategy._generator.bit_generator.state = state["generator_state"]
+        return strategy
+
+    @property
+    def state(self) -> dict:
+        return {
+            "mean": self._mean.copy(),
+            "sigma": self._sigma,
+            "population_size": self._population_size,
+            "covariance": self._covariance.copy(),
+            "path_covariance": self._path_covariance.copy(),
+            "path_sigma": self._path_sigma.copy(),
+            "generation": self._generation,
+            "recent_best_values": list(self._recent_best_values),
+            "last_values": self._last_values.copy(),
+            "generator_state": self._generator.bit_generator.state
+        }
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self._mean.copy()
+
+    @property
+    def sigma(self) -> float:
+        return self._sigma
+
+    @property
+    def population_size(self) -> int:
+        return self._population_size
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def ask(self) -> np.ndarray:
+        """Samples a population of candidates (population size, dimension)."""
+        eigenvalues, eigenvectors = self._eigen_decomposition()
+        standard_normal = self._generator.standard_normal((self._population_size, len(self._mean)))
+        return self._mean + self._sigma * (standard_normal * np.sqrt(eigenvalues)) @ eigenvectors.T
+
+    def tell(self, candidates: np.ndarray, values: np.ndarray) -> None:
+        """Updates the distribution with the values of the candidates of :py:meth:'ask', lower values are better."""
+        candidates, values = np.asarray(candidates, dtype=np.float64), np.asarray(values, dtype=np.float64)
+        if candidates.shape != (self._population_size, len(self._mean)) or values.shape != (self._population_size,):
+            raise ValueError("The candidates and values do not match the population of CMA-ES.")
+        dimension = len(self._mean)
+        eigenvalues, eigenvectors = self._eigen_decomposition()
+        order = np.argsort(values, kind="stable")
+        steps = (candidates[order[:len(self._weights)]] - self._mean) / self._sigma
+        weighted_step = self._weights @ steps
+        self._mean = self._mean + self._sigma * weighted_step
+
+        inverse_square_root = (eigenvectors / np.sqrt(eigenvalues)) @ eigenvectors.T
+        self._path_sigma = (1 - self._c_sigma) * self._path_sigma + \
+            np.sqrt(self._c_sigma * (2 - self._c_sigma) * self._mu_eff) * inverse_square_root @ weighted_step
+        path_sigma_norm = np.linalg.norm(self._path_sigma)
+        # stalls the update of the covariance path while the step size grows fast.
+        h_sigma = path_sigma_norm / np.sqrt(1 - (1 - self._c_sigma) ** (2 * (self._generation + 1))) < \
+            (1.4 + 2 / (dimension + 1)) * self._chi_n
+        self._path_covariance = (1 - self._c_c) * self._path_covariance + \
+            h_sigma * np.sqrt(self._c_c * (2 - self._c_c) * self._mu_eff) * weighted_step
+        rank_one = np.outer(self._path_covariance, self._path_covariance) + \
+            (1 - h_sigma) * self._c_c * (2 - self._c_c) * self._covariance
+        rank_mu = (steps.T * self._weights) @ steps
+        self._covariance = (1 - self._c_1 - self._c_mu) * self._covariance + self._c_1 * rank_one + \
+            self._c_mu * rank_mu
+        self._covariance = (self._covariance + self._covariance.T) / 2
+        self._sigma *= float(np.exp(self._c_sigma / self._d_sigma * (path_sigma_norm / self._chi_n - 1)))
+
+        self._generation += 1
+        self._recent_best_values = (self._recent_best_values + [float(values[order[0]])])[-self._tolfun_window:]
+        self._last_values = values
+
+    def stop(self, tolfun: float = 1e-12, tolx: float = 1e-12) -> str | None:
+        """Reason to stop ("tolfun", "tolx" or "condition") or None if the search should continue."""
+        if len(self._recent_best_values) == self._tolfun_window:
+            values = np.concatenate([self._recent_best_values, self._last_values])
+            if values.max() - values.min() < tolfun:
+                return "tolfun"
+        if self._sigma * np.sqrt(np.max(np.diag(self._covariance))) < tolx and \
+                np.all(self._sigma * np.abs(self._path_covariance) < tolx):
+            return "tolx"
+        eigenvalues, _ = self._eigen_decomposition()
+        if eigenvalues.max() > MAX_CONDITION_NUMBER * eigenvalues.min():
+            return "condition"
+        return None
+
+    def _set_parameters(self, dimension: int, population_size: int) -> None:
+        self._population_size: int = population_size
+        parent_count = population_size // 2
+        weights = np.log(parent_count + 0.5) - np.log(np.arange(1, parent_count + 1))
+        self._weights: np.ndarray = weights / weights.sum()
+        self._mu_eff: float = 1 / np.sum(self._weights ** 2)
+        self._c_c: float = (4 + self._mu_eff / dimension) / (dimension + 4 + 2 * self._mu_eff / dimension)
+        self._c_sigma: float = (self._mu_eff + 2) / (dimension + self._mu_eff + 5)
+        self._c_1: float = 2 / ((dimension + 1.3) ** 2 + self._mu_eff)
+        self._c_mu: float = min(1 - self._c_1, 2 * (self._mu_eff - 2 + 1 / self._mu_eff) /
+                                ((dimension + 2) ** 2 + self._mu_eff))
+        self._d_sigma: float = 1 + 2 * max(0.0, np.sqrt((self._mu_eff - 1) / (dimension + 1)) - 1) + self._c_sigma
+        # expected norm of a standard normal vector.
+        self._chi_n: float = np.sqrt(dimension) * (1 - 1 / (4 * dimension) + 1 / (21 * dimension ** 2))
+        self._tolfun_window: int = 10 + int(np.ceil(30 * dimension / population_size))
+
+    def _eigen_decomposition(self) -> tuple[np.ndarray, np.ndarray]:
+        eigenvalues, eigenvectors = np.linalg.eigh(self._covariance)
+        return np.maximum(eigenvalues, np.finfo(np.float64).tiny), eigenvectors
+
+
+class PopulationEvaluator:
+    """
+    Evaluates populations of setpoints without side effects through the batched path of a
+    :py:class:'~adanowo_simulator.sweep.SweepEvaluator'. With 'num_workers' > 1, each population is split into shards
+    that are evaluated by a pool of forked worker processes, each with its own copy of the models.
+    """
+
+    def __init__(self, config: DictConfig, num_workers: int = 1):
+        if num_workers < 1:
+            raise ValueError("The number of workers must be at least 1.")
+        self._evaluator: SweepEvaluator | None = None
+        self._pool = None
+        if num_workers == 1:
+            self._evaluator = SweepEvaluator(config)
+        else:
+            self._pool = fork_context().Pool(num_workers, initializer=initialize_worker,
+                                             initargs=(SweepEvaluator, config, None))
+        self._num_workers: int = num_workers
+
+    def evaluate(self, points: dict[str, np.ndarray], disturbances: dict[str, float] | None = None,
+                 output_bounds: dict | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """See :py:meth:'~adanowo_simulator.sweep.SweepEvaluator.evaluate_objective'."""
+        if self._evaluator is not None:
+            return self._evaluator.evaluate_objective(points, disturbances, output_bounds)
+        point_count = len(next(iter(points.values())))
+        shards = [(start, stop) for start, stop in zip(*_shard_bounds(point_count, self._num_workers))
+                  if stop > start]
+        results = self._pool.map(call_in_worker, [
+            ("evaluate_objective", {name: values[start:stop] for name, values in points.items()}, disturbances,
+             output_bounds) for start, stop in shards])
+        return np.concatenate([values for values, _ in results]), \
+            np.concatenate([violations for _, violations in results])
+
+    def close(self) -> None:
+        if self._evaluator is not None:
+            self._evaluator.close()
+            self._evaluator = None
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+def _shard_bounds(point_count: int, shard_count: int) -> tuple[np.ndarray, np.ndarray]:
+    edges = np.linspace(0, point_count, shard_count + 1).round().astype(int)
+    return edges[:-1], edges[1:]
+
+
+def constrained_fitness(values: np.ndarray, violations: np.ndarray) -> np.ndarray:
+    """
+    Fitness to minimize for objective values to maximize: points without violation are ranked by their objective
+    value and all others behind them by their violation.
+    """
+    feasible = violations == 0
+    fitness = -np.asarray(values, dtype=np.float64)
+    worst_feasible = fitness[feasible].max() if feasible.any() else 0.0
+    return np.where(feasible, fitness, worst_feasible + 1 + violations)
+
+
+class SetpointOptimizer:
+    """
+    Optimizes setpoints with :py:class:'CMAES' for the objective value of the mean outputs, e.g. in closed loop for the
+    current disturbances and output bounds of a running process.
+
+    The search runs in coordinates that are normalized by the setpoint bounds. Every generation is evaluated at once
+    by a :py:class:'PopulationEvaluator', so the environment of the caller is not changed. Candidates outside the
+    setpoint bounds are evaluated at the nearest point within them and ranked by :py:func:'constrained_fitness', with
+    their distance to the bounds added to the violation, so infeasible points never outrank feasible ones. When a
+    stop criterion is met, the search restarts from a random point with twice the population size (IPOP) until the
+    restarts are used up. The state of the optimizer is checkpointed after every generation if a checkpoint path is set
+    and :py:meth:'run' can resume from it. Each generation is logged with its durations and kept in
+    :py:attr:'history'. The settings are taken from the optimization_settings of the config.
+
+    The evaluator, i.e. its environment or pool of workers, is created by the first :py:meth:'run' and kept for the
+    following ones, e.g. of a closed loop, until :py:meth:'close' is called or the optimizer is used as a context
+    manager.
+    """
+
+    def __init__(self, config: DictConfig):
+        self._config: DictConfig = config.copy()
+        self._settings: DictConfig = self._config.optimization_settings
+        if self._settings.num_workers < 1 or self._settings.max_generations < 1 or self._settings.restarts < 0:
+            raise ValueError("The number of workers and of generations must be at least 1, the restarts at least 0.")
+        if self._settings.sigma <= 0:
+            raise ValueError("The initial step size must be positive.")
+        setpoints = self._settings.get("setpoints") or list(self._config.env_setup.used_setpoints)
+        self._bounds: dict[str, tuple[float, float]] = sweep_bounds(self._config.action_setup, setpoints)
+        self._lower: np.ndarray = np.array([lower for lower, _ in self._bounds.values()])
+        self._range: np.ndarray = np.array([upper - lower for lower, upper in self._bounds.values()])
+        self._history: list[dict] = []
+        self._evaluator: PopulationEvaluator | None = None
+
+    def __enter__(self) -> "SetpointOptimizer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def bounds(self) -> dict[str, tuple[float, float]]:
+        return dict(self._bounds)
+
+    @property
+    def history(self) -> pd.DataFrame:
+        """One row per generation with its best and mean objective value, the step size and the durations."""
+        return pd.DataFrame(self._history)
+
+    def run(self, disturbances: dict[str, float] | None = None, output_bounds: dict | None = None,
+            initial_setpoints: dict[str, float] | None = None, resume: bool = False) -> dict:
+        """
+        Searches setpoints from 'initial_setpoints' (the initial setpoints of the config by default) for the
+        'disturbances' and 'output_bounds' (the initial ones by default). With 'resume', the search continues from the
+        checkpoint if it exists.
+
+        Returns
+        -------
+        dict
+            "Setpoints": best setpoints by name,
+            "Objective-Value": their objective value,
+            "Constraints-Met": whether they satisfy all bounds,
+            "Generations", "Evaluations", "Restarts": counts of the whole search,
+            "Stop-Reason": stop criterion of the last restart ("max_generations", "tolfun", "tolx" or "condition"),
+            "Duration": in seconds.
+        """
+        start_time = time.perf_counter()
+        settings = self._settings
+        checkpoint_path = pl.Path(settings.checkpoint_path) if settings.get("checkpoint_path") else None
+        output_bounds = OmegaConf.to_container(output_bounds) if isinstance(output_bounds, DictConfig) \
+            else output_bounds
+        seed = int(settings.get("seed") or 0)
+
+        if resume and checkpoint_path is not None and checkpoint_path.is_file():
+            checkpoint = deserialize_snapshot(checkpoint_path.read_bytes())
+            if checkpoint["setpoints"] != list(self._bounds):
+                raise ValueError(f"The checkpoint {checkpoint_path} optimizes other setpoints.")
+            strategy = CMAES.from_state(checkpoint["optimizer"])
+            restart, evaluations = checkpoint["restart"], checkpoint["evaluations"]
+            best_unit, best_value, best_okay = checkpoint["best_unit"], checkpoint["best_value"], \
+                checkpoint["best_okay"]
+            self._history = list(checkpoint["history"])
+            logger.info(f"Resuming the optimization from generation {len(self._history)} of {checkpoint_path}.")
+        else:
+            initial_setpoints = initial_setpoints if initial_setpoints is not None else \
+                OmegaConf.to_container(self._config.action_setup.initial_setpoints, resolve=True)
+            initial_unit = (np.array([initial_setpoints[name] for name in self._bounds]) - self._lower) / self._range
+            strategy = CMAES(initial_unit, float(settings.sigma), settings.get("population_size"), seed)
+            restart, evaluations = 0, 0
+            best_unit, best_value, best_okay = initial_unit, -np.inf, False
+            self._history = []
+
+        if self._evaluator is None:
+            self._evaluator = PopulationEvaluator(self._config, int(settings.num_workers))
+        evaluator = self._evaluator
+        try:
+            while True:
+                stop_reason = "max_generations" if strategy.generation >= settings.max_generations else \
+                    strategy.stop(float(settings.tolfun), float(settings.tolx))
+                if stop_reason is not None:
+                    logger.info(f"Restart {restart} stopped after {strategy.generation} generations ({stop_reason}).")
+                    if restart >= settings.restarts:
+                        break
+                    restart += 1
+                    generator = np.random.default_rng([seed, restart])
+                    strategy = CMAES(generator.random(len(self._bounds)), float(settings.sigma),
+                                     2 * strategy.population_size, int(generator.integers(np.iinfo(np.int64).max)))
+                    continue
+
+                ask_start = time.perf_counter()
+                candidates = strategy.ask()
+                evaluation_start = time.perf_counter()
+                repaired = np.clip(candidates, 0, 1)
+                values, violations = evaluator.evaluate(self._to_setpoints(repaired), disturbances, output_bounds)
+                tell_start = time.perf_counter()
+                okay = violations == 0
+                violations = violations + np.abs(candidates - repaired).sum(axis=1)
+                strategy.tell(candidates, constrained_fitness(values, violations))
+                tell_stop = time.perf_counter()
+
+                evaluations += len(values)
+                # the best point satisfies all bounds if possible.
+                best = int(np.argmax(np.where(okay, values, -np.inf))) if okay.any() else int(np.argmin(violations))
+                if (okay[best], values[best]) > (best_okay, best_value):
+                    best_unit, best_value, best_okay = repaired[best], float(values[best]), bool(okay[best])
+                self._history.append({
+                    "Restart": restart,
+                    "Generation": strategy.generation,
+                    "Evaluations": evaluations,
+                    "Best-Objective-Value": float(values[best]),
+                    "Mean-Objective-Value": float(values.mean()),
+                    "Feasible-Share": float(okay.mean()),
+                    "Sigma": strategy.sigma,
+                    "Evaluation-Duration": tell_start - evaluation_start,
+                    "Update-Duration": (evaluation_start - ask_start) + (tell_stop - tell_start)
+                })
+                logger.info(f"Restart {restart}, generation {strategy.generation}: best {values[best]:.4g}, "
+                            f"mean {values.mean():.4g}, sigma {strategy.sigma:.3g}, evaluation "
+                            f"{tell_start - evaluation_start:.3f} s, update "
+                            f"{(evaluation_start - ask_start) + (tell_stop - tell_start):.4f} s.")
+                if checkpoint_path is not None:
+                    self._write_checkpoint(checkpoint_path, {
+                        "setpoints": list(self._bounds), "optimizer": strategy.state, "restart": restart,
+                        "evaluations": evaluations, "best_unit": best_unit, "best_value": best_value,
+                        "best_okay": best_okay, "history": self._history})
+        except Exception as e:
+            # the state of the workers is unknown after an error, the next run creates a new evaluator.
+            self.close()
+            raise e
+
+        best_setpoints = {name: float(value) for name, value in
+                          zip(self._bounds, self._lower + np.asarray(best_unit) * self._range)}
+        return {
+            "Setpoints": best_setpoints,
+            "Objective-Value": best_value,
+            "Constraints-Met": best_okay,
+            "Generations": len(self._history),
+            "Evaluations": evaluations,
+            "Restarts": restart,
+            "Stop-Reason": stop_reason,
+            "Duration": time.perf_counter() - start_time
+        }
+
+    def close(self) -> None:
+        """Closes the evaluator, the next :py:meth:'run' creates a new one."""
+        if self._evaluator is not None:
+            self._evaluator.close()
+            self._evaluator = None
+
+    def _to_setpoints(self, candidates: np.ndarray) -> dict[str, np.ndarray]:
+        setpoints = self._lower + candidates * self._range
+        return {name: setpoints[:, column] for column, name in enumerate(self._bounds)}
+
+    @staticmethod
+    def _write_checkpoint(path: pl.Path, checkpoint: dict) -> None:
+        # replaces the previous checkpoint only when the new one is complete.
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_name(path.name + ".tmp")
+        temporary_path.write_bytes(serialize_snapshot(checkpoint))
+        os.replace(temporary_path, path)
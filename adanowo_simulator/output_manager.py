@@ -1,22 +1,37 @@
+import os
 import importlib
 import pathlib as pl
 import logging
 import sys
+import traceback
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import TYPE_CHECKING
 from multiprocessing import Process, Pipe
 import yaml
 from omegaconf import DictConfig, OmegaConf
 import numpy as np
-import pandas as pd
-import torch
 
 from adanowo_simulator.abstract_base_classes.model_adapter import AbstractModelAdapter
 from adanowo_simulator.abstract_base_classes.output_manager import AbstractOutputManager
-from adanowo_simulator import model_adapter
+from adanowo_simulator.stage_timer import StageTimer
+from adanowo_simulator.snapshot import restore_config_values
+
+if TYPE_CHECKING:
+    import torch
 
 logger = logging.getLogger(__name__)
 RECEIVE = 0
 SEND = 1
 DEFAULT_RELATIVE_PATH = "output_models"
+WORKER_POLLING_INTERVAL = 0.1  # seconds
+WORKER_START_MODES = ("load", "preload")
+NUMA_NODE_PATH = pl.Path("/sys/devices/system/node")
+# PyTables must not be used by several threads at once.
+hdf5_lock = threading.Lock()
+# Models loaded by preload_models, by path and model name. Forked processes inherit them.
+_preloaded_models: dict[tuple[str, str], AbstractModelAdapter] = dict()
 
 
 def model_loader(model_name: str, path_to_output_models: pl.Path) -> AbstractModelAdapter:
@@ -25,14 +40,19 @@ def model_loader(model_name: str, path_to_output_models: pl.Path) -> AbstractMod
 
     model_class = properties["model_class"]
 
+    # the model backends (torch, gpytorch, sklearn, pandas) are imported when the first model is loaded.
+    from adanowo_simulator import model_adapter
     if model_class == "Gpytorch":
+        import pandas as pd
+        import torch
         if "keep_y_scaled" in properties:
             rescale_y_temp = not bool(properties["keep_y_scaled"])
         else:
             rescale_y_temp = True
-        data_load = pd.read_hdf(
-           path_to_output_models / (model_name + ".hdf5")
-        )
+        with hdf5_lock:
+            data_load = pd.read_hdf(
+               path_to_output_models / (model_name + ".hdf5")
+            )
         if torch.cuda.is_available():
             map_location = None
         else:
@@ -57,43 +77,214 @@ def model_loader(model_name: str, path_to_output_models: pl.Path) -> AbstractMod
     return mdl
 
 
-def model_executor(mdl: AbstractModelAdapter, input_pipe: Pipe, output_pipe: Pipe, latent_uncertainty_only: bool):
+def load_models(output_models: dict[str, str], path_to_output_models: pl.Path) -> dict[str, AbstractModelAdapter]:
+    """
+    Loads the models of several outputs concurrently and returns them once all of them are loaded.
+    The keys of 'output_models' are the output names, the values the model names.
+    If a model cannot be loaded, a RuntimeError naming the model is raised after all loads have finished.
+    """
+    # import the backends once before the threads use them.
+    from adanowo_simulator import model_adapter  # noqa: F401
+    if not output_models:
+        return dict()
+    with ThreadPoolExecutor(max_workers=len(output_models), thread_name_prefix="model-loader") as executor:
+        futures = {output_name: executor.submit(model_loader, model_name, path_to_output_models)
+                   for output_name, model_name in output_models.items()}
+    models = dict()
+    failure = None
+    for output_name, future in futures.items():
+        try:
+            models[output_name] = future.result()
+        except Exception as e:
+            failure = failure or (output_name, e)
+    if failure is not None:
+        for mdl in models.values():
+            mdl.close()
+        output_name, error = failure
+        raise RuntimeError(f"Loading model {output_models[output_name]} for output {output_name} failed.") from error
+    return models
+
+
+def preload_models(model_names: list[str], path_to_output_models: pl.Path) -> dict[str, AbstractModelAdapter]:
+    """
+    Loads models once per process and prepares them for sharing with forked processes (see
+    :py:meth:'~adanowo_simulator.abstract_base_classes.model_adapter.AbstractModelAdapter.share_memory').
+
+    Worker processes of a ParallelOutputManager with worker_start "preload" use the preloaded models instead of
+    loading their own copies. Preloading before forking several environments (e.g. the workers of a sweep) lets all
+    of them share one copy of each model. Returns the preloaded models by model name.
+    """
+    missing = {model_name: model_name for model_name in model_names
+               if (str(path_to_output_models), model_name) not in _preloaded_models}
+    for model_name, mdl in load_models(missing, path_to_output_models).items():
+        mdl.share_memory()
+        _preloaded_models[(str(path_to_output_models), model_name)] = mdl
+        logger.info(f"Preloaded model {model_name}.")
+    return {model_name: _preloaded_models[(str(path_to_output_models), model_name)] for model_name in model_names}
+
+
+def get_path_to_output_models(custom_path: str | None) -> pl.Path:
+    """
+    Returns the custom output model path if given, otherwise the path of the bundled output models.
+    The path is added to sys.path so that the models can be imported.
+    """
+    # use default path
+    main_script_path = pl.Path(__file__).resolve().parent
+    path_to_output_models = main_script_path / DEFAULT_RELATIVE_PATH
+
+    if custom_path is not None:
+        temp_path = pl.Path(custom_path)
+        if temp_path.is_dir():
+            logger.info(f"Using custom output model path {temp_path}.")
+            path_to_output_models = temp_path
+        else:
+            raise FileNotFoundError(
+                f"Custom output model path {temp_path} is not valid.")
+
+    # Add model path to sys.path so that the models can be imported.
+    if str(path_to_output_models) not in sys.path:
+        sys.path.append(str(path_to_output_models))
+    return path_to_output_models
+
+
+def parse_cpu_list(cpu_list: str) -> list[int]:
+    """Parses a Linux CPU list like "0-3,8,10-11"."""
+    cpus = []
+    for part in cpu_list.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def format_cpu_list(cpus: list[int]) -> str:
+    """Formats CPUs as a compact Linux CPU list like "0-3,8"."""
+    ranges = []
+    for cpu in sorted(set(cpus)):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def numa_node_cpus(node: int) -> list[int]:
+    """CPUs of a NUMA node as reported by the kernel."""
+    path = NUMA_NODE_PATH / f"node{node}" / "cpulist"
+    if not path.is_file():
+        raise ValueError(f"NUMA node {node} does not exist on this machine.")
+    return parse_cpu_list(path.read_text())
+
+
+def plan_worker_cpus(worker_resources: DictConfig | dict | None, worker_count: int) -> list[list[int] | None]:
+    """
+    Assigns CPUs to the workers of an output manager according to output_setup.worker_resources.
+
+    The workers may use the CPUs in 'cpus' (default: all CPUs the process may use), restricted to the CPUs of the NUMA
+    node 'numa_node_cpus' if given. Only the CPUs are restricted, memory is not bound to the node, but the kernel
+    allocates the memory a worker touches first on its node by default. With 'cpus_per_worker', worker i of the
+    environment with 'environment_index' k is pinned to the block k * worker_count + i of that many CPUs (wrapping
+    around if there are more workers than blocks), so environments with the same settings and different indices use
+    different CPUs. Otherwise all workers share all of the CPUs. None means that a worker is not pinned.
+    """
+    worker_resources = worker_resources or dict()
+    cpus = worker_resources.get("cpus")
+    numa_node = worker_resources.get("numa_node_cpus")
+    cpus_per_worker = worker_resources.get("cpus_per_worker")
+    environment_index = worker_resources.get("environment_index") or 0
+    if environment_index < 0:
+        raise ValueError("The environment index must not be negative.")
+    if cpus is None and numa_node is None and cpus_per_worker is None:
+        return [None] * worker_count
+
+    if cpus is None:
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    cpus = list(cpus)
+    if numa_node is not None:
+        node_cpus = set(numa_node_cpus(numa_node))
+        cpus = [cpu for cpu in cpus if cpu in node_cpus]
+    if not cpus:
+        raise ValueError("No CPUs are left for the model workers. Check output_setup.worker_resources.")
+    if cpus_per_worker is None:
+        return [cpus] * worker_count
+    if not 1 <= cpus_per_worker <= len(cpus):
+        raise ValueError(f"cpus_per_worker must be between 1 and the number of available CPUs ({len(cpus)}).")
+    first_block = environment_index * worker_count
+    return [sorted(cpus[((first_block + worker) * cpus_per_worker + i) % len(cpus)] for i in range(cpus_per_worker))
+            for worker in range(worker_count)]
+
+
+def _apply_worker_resources(cpus: list[int] | None, torch_threads: int | None) -> None:
+    if cpus is not None:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+        else:
+            logger.warning("CPU affinity is not supported on this platform. Model workers are not pinned.")
+    if torch_threads is not None:
+        import torch
+        torch.set_num_threads(torch_threads)
+
+
+def _worker_settings() -> dict[str, str | int]:
+    """CPUs and intra-op threads of torch the calling process actually uses."""
+    settings = dict()
+    if hasattr(os, "sched_getaffinity"):
+        settings["CPUs"] = format_cpu_list(list(os.sched_getaffinity(0)))
+    if "torch" in sys.modules:
+        settings["Torch-Threads"] = sys.modules["torch"].get_num_threads()
+    return settings
+
+
+def model_executor(model_name: str, path_to_output_models: pl.Path, input_pipe: Pipe, output_pipe: Pipe,
+                   latent_uncertainty_only: bool, cpus: list[int] | None = None, torch_threads: int | None = None):
+    """
+    Pins the worker process to its CPUs and limits the threads of torch, loads the model (unless it has been preloaded
+    before forking), reports readiness with the applied settings (or the error) and then answers predictions.
+    """
+    try:
+        # before loading, so that the thread pools of torch are created with the limit.
+        _apply_worker_resources(cpus, torch_threads)
+        mdl = _preloaded_models.get((str(path_to_output_models), model_name))
+        if mdl is None:
+            mdl = model_loader(model_name, path_to_output_models)
+    except Exception:
+        output_pipe.send(("error", traceback.format_exc()))
+        return
+    output_pipe.send(("ready", _worker_settings()))
     while True:
-        if input_pipe.poll():
-            input_recv = input_pipe.recv()
-            if input_recv is None:
+        # blocks without using the CPU until the next input arrives.
+        input_recv = input_pipe.recv()
+        if input_recv is None:
+            if (str(path_to_output_models), model_name) not in _preloaded_models:
                 mdl.close()
-                break
-            if latent_uncertainty_only:
-                mean_pred, var_pred = mdl.predict_f(input_recv)
-            else:
-                mean_pred, var_pred = mdl.predict_y(input_recv, observation_noise_only=True)
-            output_pipe.send((mean_pred, var_pred))
+            break
+        if latent_uncertainty_only:
+            mean_pred, var_pred = mdl.predict_f(input_recv)
+        else:
+            mean_pred, var_pred = mdl.predict_y(input_recv, observation_noise_only=True)
+        output_pipe.send((mean_pred, var_pred))
 
 
 class SequentialOutputManager(AbstractOutputManager):
+    """
+    Output manager that evaluates the models one after another in the main process.
 
-    def __init__(self, config: DictConfig):
-        # use default path
-        main_script_path = pl.Path(__file__).resolve().parent
-        self._path_to_output_models = main_script_path / DEFAULT_RELATIVE_PATH
-
-        if config.path_to_output_models is not None:
-            temp_path = pl.Path(config.path_to_models)
-            if self._path_to_output_models.is_dir():
-                logger.info(f"Using custom output model path {self._path_to_output_models}.")
-                self._path_to_output_models = temp_path
-            else:
-                raise FileNotFoundError(
-                    f"Custom output model path {self._path_to_output_models} is not valid.")
-
-        # Add model path to sys.path so that the models can be imported.
-        sys.path.append(str(self._path_to_output_models))
+    Models announced with :py:meth:'prefetch_models' are loaded in the background and swapped in when the scenario
+    switches to them. Each switch is timed as "Outputs/<output name>/Swap".
+    """
 
+    def __init__(self, config: DictConfig, stage_timer: StageTimer | None = None):
+        # each model call is timed as "Outputs/<output name>".
+        self._stage_timer: StageTimer = stage_timer if stage_timer is not None else StageTimer()
+        self._path_to_output_models = get_path_to_output_models(config.path_to_output_models)
         self._initial_config: DictConfig = config.copy()
         self._config: DictConfig = self._initial_config.copy()
         self._output_models: dict[str, AbstractModelAdapter] = dict()
         self._model_config: DictConfig = OmegaConf.create()
+        # models that are loaded in advance, by output name: (model name, handle of the background load).
+        self._prefetched: dict[str, tuple[str, object]] = dict()
+        self._prefetch_executor: ThreadPoolExecutor | None = None
         self._ready = False
 
     @property
@@ -116,40 +307,148 @@ class SequentialOutputManager(AbstractOutputManager):
             raise e
         return outputs
 
+    def predict(self, X: dict[str, np.ndarray], output_models: dict[str, str] | None = None) \
+            -> tuple[dict[str, np.ndarray], dict[str, np.ndarray]]:
+        if not self._ready:
+            raise RuntimeError("Cannot call predict() before calling reset().")
+        if output_models is None:
+            self._update_model_allocation()
+        try:
+            mean_pred, var_pred = self._call_models(X) if output_models is None else \
+                self._call_other_models(X, dict(output_models))
+        except Exception as e:
+            self.close()
+            raise e
+        return ({output_name: np.asarray(mean, dtype=np.float64).reshape(-1) for output_name, mean in
+                 mean_pred.items()},
+                {output_name: np.asarray(var, dtype=np.float64).reshape(-1) for output_name, var in var_pred.items()})
+
+    def predict_differentiable(self, X: dict[str, "torch.Tensor"]) -> dict[str, "torch.Tensor"]:
+        if not self._ready:
+            raise RuntimeError("Cannot call predict_differentiable() before calling reset().")
+        self._update_model_allocation()
+        # unlike step(), a failure leaves the models usable, e.g. if a model script does not support tensors.
+        return {output_name: mdl.predict_mean_differentiable(X) for output_name, mdl in self._output_models.items()}
+
     def reset(self, state: dict[str, float]) -> dict[str, float]:
         self.close()
         self._config = self._initial_config.copy()
         self._model_config = self._config.output_models.copy()
-        for output_name, model_name in self._config.output_models.items():
-            try:
-                self._allocate_model_to_output(output_name, model_name)
-            except Exception as e:
-                self.close()
-                raise e
+        try:
+            self._allocate_models(dict(self._config.output_models))
+        except Exception as e:
+            self.close()
+            raise e
         self._ready = True
         outputs = self.step(state)
         return outputs
 
     def close(self) -> None:
+        self._discard_all_prefetched()
         self._ready = False
 
+    def snapshot(self) -> dict:
+        return {"output_models": OmegaConf.to_container(self._config.output_models)}
+
+    def restore(self, snapshot: dict) -> None:
+        # models that differ from the allocated ones are swapped in at the next step.
+        restore_config_values(self._config.output_models, snapshot["output_models"])
+
+    def prefetch_models(self, output_models: dict[str, str]) -> None:
+        for output_name, model_name in output_models.items():
+            if self._model_config.get(output_name) == model_name:
+                continue
+            prefetched = self._prefetched.get(output_name)
+            if prefetched is not None:
+                if prefetched[0] == model_name:
+                    continue
+                self._discard_prefetched(self._prefetched.pop(output_name)[1])
+            self._prefetched[output_name] = (model_name, self._start_prefetch(output_name, model_name))
+            logger.info(f"Prefetching model {model_name} for output {output_name}.")
+
     def _update_model_allocation(self) -> None:
         for output_name, model_name in self._config.output_models.items():
             if self._model_config[output_name] != model_name:
-                self._model_config[output_name] = model_name
-                self._allocate_model_to_output(output_name, model_name)
+                with self._stage_timer.span(f"Outputs/{output_name}/Swap"):
+                    self._model_config[output_name] = model_name
+                    self._swap_model(output_name, model_name)
+
+    def _swap_model(self, output_name: str, model_name: str) -> None:
+        """Replaces the model of an output, with the prefetched one if available."""
+        prefetched = self._prefetched.pop(output_name, None)
+        if prefetched is not None and prefetched[0] == model_name:
+            self._release_model(output_name)
+            self._swap_in(output_name, model_name, prefetched[1])
+            logger.info(f"Swapped in prefetched model {model_name} for output {output_name}.")
+        else:
+            if prefetched is not None:
+                self._discard_prefetched(prefetched[1])
+            self._release_model(output_name)
+            self._allocate_models({output_name: model_name})
+
+    def _start_prefetch(self, output_name: str, model_name: str) -> object:
+        """Starts loading a model in the background and returns a handle for :py:meth:'_swap_in'."""
+        if self._prefetch_executor is None:
+            self._prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-prefetch")
+        return self._prefetch_executor.submit(self._load_model, model_name)
+
+    def _load_model(self, model_name: str) -> AbstractModelAdapter:
+        return model_loader(model_name, self._path_to_output_models)
+
+    def _swap_in(self, output_name: str, model_name: str, prefetched: Future) -> None:
+        # waits for the background load if it has not finished yet.
+        self._output_models[output_name] = prefetched.result()
+
+    def _discard_prefetched(self, prefetched: Future) -> None:
+        prefetched.cancel()
+
+    def _discard_all_prefetched(self) -> None:
+        for _, prefetched in self._prefetched.values():
+            self._discard_prefetched(prefetched)
+        self._prefetched = dict()
+        if self._prefetch_executor is not None:
+            self._prefetch_executor.shutdown(wait=False, cancel_futures=True)
+            self._prefetch_executor = None
+
+    def _release_model(self, output_name: str) -> None:
+        """Releases the current model of an output before it is replaced."""
+        pass
 
     def _call_models(self, X: dict[str, float]) -> (dict[str, np.array], dict[str, np.array]):
+        return self._call_adapters(X, self._output_models)
+
+    def _call_other_models(self, X: dict[str, float], output_models: dict[str, str]) \
+            -> (dict[str, np.array], dict[str, np.array]):
+        """
+        Calls the models 'output_models' by output name. Models that are not allocated are taken from a finished or
+        running prefetch, which is kept for the swap, or loaded only for this call.
+        """
+        adapters = dict()
+        missing = dict()
+        for output_name, model_name in output_models.items():
+            prefetched = self._prefetched.get(output_name)
+            if self._model_config.get(output_name) == model_name:
+                adapters[output_name] = self._output_models[output_name]
+            elif prefetched is not None and prefetched[0] == model_name:
+                adapters[output_name] = prefetched[1].result()
+            else:
+                missing[output_name] = model_name
+        adapters.update(load_models(missing, self._path_to_output_models))
+        return self._call_adapters(X, adapters)
+
+    def _call_adapters(self, X: dict[str, float], adapters: dict[str, AbstractModelAdapter]) \
+            -> (dict[str, np.array], dict[str, np.array]):
         mean_pred = dict()
         var_pred = dict()
         model_uncertainty_only = False
 
-        for output_name, mdl in self._output_models.items():
-            if model_uncertainty_only:
-                mean_pred[output_name], var_pred[output_name] = mdl.predict_f(X)
-            else:
-                mean_pred[output_name], var_pred[output_name] = mdl.predict_y(
-                    X, observation_noise_only=True)
+        for output_name, mdl in adapters.items():
+            with self._stage_timer.span(f"Outputs/{output_name}"):
+                if model_uncertainty_only:
+                    mean_pred[output_name], var_pred[output_name] = mdl.predict_f(X)
+                else:
+                    mean_pred[output_name], var_pred[output_name] = mdl.predict_y(
+                        X, observation_noise_only=True)
 
         return mean_pred, var_pred
 
@@ -161,23 +460,102 @@ class SequentialOutputManager(AbstractOutputManager):
                                          flatten()[0])
         return outputs
 
-    def _allocate_model_to_output(self, output_name: str, model_name: str) -> None:
-        # load model properties dict from .yaml file
-        mdl = model_loader(model_name, self._path_to_output_models)
+    def _allocate_models(self, output_models: dict[str, str]) -> None:
+        """Loads the models of the outputs concurrently and allocates them."""
+        self._output_models.update(load_models(output_models, self._path_to_output_models))
+        for output_name, model_name in output_models.items():
+            logger.info(f"Allocated model {model_name} to output {output_name}.")
 
-        self._output_models[output_name] = mdl
-        logger.info(f"Allocated model {model_name} to output {output_name}.")
 
+class ThreadedOutputManager(SequentialOutputManager):
+    """
+    Output manager that evaluates the models concurrently on a thread pool of the main process.
 
-class ParallelOutputManager(SequentialOutputManager):
+    Torch and NumPy release the GIL inside their kernels, so the models run in parallel without inter-process
+    communication and without copies of the models. The number of intra-op threads of torch can only be limited for the
+    whole process, set thread_pool.torch_threads to about the number of cores divided by the number of models.
+    """
+
+    def __init__(self, config: DictConfig, stage_timer: StageTimer | None = None):
+        super().__init__(config, stage_timer)
+        self._executor: ThreadPoolExecutor | None = None
 
-    def __init__(self, config: DictConfig):
-        super().__init__(config)
+    def reset(self, state: dict[str, float]) -> dict[str, float]:
+        torch_threads = self._initial_config.get("thread_pool", dict()).get("torch_threads")
+        if torch_threads is not None:
+            import torch
+            torch.set_num_threads(torch_threads)
+        return super().reset(state)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        super().close()
+
+    def _call_adapters(self, X: dict[str, float], adapters: dict[str, AbstractModelAdapter]) \
+            -> (dict[str, np.array], dict[str, np.array]):
+        if self._executor is None:
+            max_workers = self._config.get("thread_pool", dict()).get("max_workers")
+            self._executor = ThreadPoolExecutor(max_workers=max_workers or max(len(self._output_models), 1),
+                                                thread_name_prefix="output-model")
+        futures = {output_name: self._executor.submit(self._call_model, output_name, mdl, X)
+                   for output_name, mdl in adapters.items()}
+        mean_pred = dict()
+        var_pred = dict()
+        for output_name, future in futures.items():
+            mean_pred[output_name], var_pred[output_name] = future.result()
+        return mean_pred, var_pred
+
+    def _call_model(self, output_name: str, mdl: AbstractModelAdapter, X: dict[str, float]) \
+            -> (np.array, np.array):
+        with self._stage_timer.span(f"Outputs/{output_name}"):
+            return mdl.predict_y(X, observation_noise_only=True)
+
+
+class ParallelOutputManager(SequentialOutputManager):
+    """
+    Output manager that evaluates each model in its own worker process.
+
+    With worker_start "load" (default), each worker loads its own model. With "preload", the models are loaded once
+    per process with :py:func:'preload_models' and the workers are forked, so they share the memory of the models
+    with the parent and with the workers of all other environments of the process.
+
+    output_setup.worker_resources limits the intra-op threads of torch per worker and pins the workers to CPUs (see
+    :py:func:'plan_worker_cpus'), so that several environments can be packed onto one node without oversubscribing
+    its cores. The applied settings of each worker are attached to its "Outputs/<output name>/IPC-Wait" stage timing.
+    """
+
+    def __init__(self, config: DictConfig, stage_timer: StageTimer | None = None):
+        # sending the inputs is timed as "Outputs/IPC-Send", waiting for a model as "Outputs/<output name>/IPC-Wait".
+        super().__init__(config, stage_timer)
+        self._worker_start: str = self._initial_config.get("worker_start", "load")
+        if self._worker_start not in WORKER_START_MODES:
+            raise ValueError(f"Unknown worker start {self._worker_start}. Use one of {WORKER_START_MODES}.")
+        self._process_context = multiprocessing.get_context()
+        if self._worker_start == "preload":
+            if "fork" in multiprocessing.get_all_start_methods():
+                self._process_context = multiprocessing.get_context("fork")
+            else:
+                logger.warning("Preloaded models can only be shared with forked workers. Workers load their models.")
+                self._worker_start = "load"
+        self._worker_resources: DictConfig | dict = self._initial_config.get("worker_resources") or dict()
+        # replaced workers exit in the background and are joined later.
+        self._retiring_processes: list[Process] = []
         self._model_processes: dict[str, Process] = dict()
         self._input_pipes: dict[str, Pipe] = dict()
         self._output_pipes: dict[str, Pipe] = dict()
 
+    @property
+    def worker_pids(self) -> dict[str, int]:
+        """Process ids of the model workers by output name."""
+        return {output_name: process.pid for output_name, process in self._model_processes.items()}
+
     def close(self) -> None:
+        self._discard_all_prefetched()
+        for process in self._retiring_processes:
+            process.join()
+        self._retiring_processes = []
         if self._model_processes:
             for output_name in self._model_processes.keys():
                 if self._model_processes[output_name].is_alive():
@@ -189,37 +567,117 @@ class ParallelOutputManager(SequentialOutputManager):
             self._output_pipes = dict()
             self._ready = False
 
+    def predict_differentiable(self, X: dict[str, "torch.Tensor"]) -> dict[str, "torch.Tensor"]:
+        raise NotImplementedError(f"{type(self).__name__} evaluates the models in worker processes, so they cannot be "
+                                  f"differentiated.")
+
     def _update_model_allocation(self) -> None:
-        for output_name, model_name in self._config.output_models.items():
-            if self._model_config[output_name] != model_name:
-                try:
-                    self._input_pipes[output_name][SEND].send(None)
-                    self._model_processes[output_name].join()
-                    self._input_pipes[output_name][SEND].close()
-                    self._model_config[output_name] = model_name
-                    self._allocate_model_to_output(output_name, model_name)
-                except Exception as e:
-                    self.close()
-                    raise e
+        try:
+            super()._update_model_allocation()
+        except Exception as e:
+            self.close()
+            raise e
+
+    def _start_prefetch(self, output_name: str, model_name: str) -> tuple[Process, Pipe, Pipe]:
+        # the worker loads its model while the current worker of the output keeps answering.
+        return self._start_worker(output_name, model_name)
+
+    def _swap_in(self, output_name: str, model_name: str, prefetched: tuple[Process, Pipe, Pipe]) -> None:
+        self._model_processes[output_name], self._input_pipes[output_name], self._output_pipes[output_name] = \
+            prefetched
+        self._wait_for_worker(output_name, model_name, prefetched)
+
+    def _discard_prefetched(self, prefetched: tuple[Process, Pipe, Pipe]) -> None:
+        process, input_pipe, _ = prefetched
+        # the worker exits as soon as its model is loaded.
+        input_pipe[SEND].send(None)
+        self._retiring_processes.append(process)
+
+    def _release_model(self, output_name: str) -> None:
+        if output_name not in self._model_processes:
+            return
+        self._input_pipes[output_name][SEND].send(None)
+        self._input_pipes[output_name][SEND].close()
+        self._retiring_processes.append(self._model_processes.pop(output_name))
+        # is_alive() also reaps workers that have exited.
+        self._retiring_processes = [process for process in self._retiring_processes if process.is_alive()]
 
     def _call_models(self, X: dict[str, float]) -> (dict[str, np.array], dict[str, np.array]):
+        return self._call_workers(X, {output_name: self._worker(output_name) for output_name in self._model_processes})
+
+    def _call_other_models(self, X: dict[str, float], output_models: dict[str, str]) \
+            -> (dict[str, np.array], dict[str, np.array]):
+        """
+        Calls the models 'output_models' by output name. Models that are not allocated are loaded by temporary workers,
+        prefetching workers are kept for the swap.
+        """
+        workers = {output_name: self._worker(output_name) for output_name, model_name in output_models.items()
+                   if self._model_config.get(output_name) == model_name}
+        temporary_workers = dict()
+        try:
+            for output_name, model_name in output_models.items():
+                if output_name not in workers:
+                    temporary_workers[output_name] = self._start_worker(output_name, model_name)
+            for output_name, worker in temporary_workers.items():
+                self._wait_for_worker(output_name, output_models[output_name], worker)
+            return self._call_workers(X, workers | temporary_workers)
+        finally:
+            for process, input_pipe, _ in temporary_workers.values():
+                input_pipe[SEND].send(None)
+                input_pipe[SEND].close()
+                self._retiring_processes.append(process)
+
+    def _call_workers(self, X: dict[str, float], workers: dict[str, tuple[Process, Pipe, Pipe]]) \
+            -> (dict[str, np.array], dict[str, np.array]):
         mean_pred = dict()
         var_pred = dict()
 
-        for output_name in self._model_processes.keys():
-            self._input_pipes[output_name][SEND].send(X)
-        for output_name in self._model_processes.keys():
-            mean_pred[output_name], var_pred[output_name] = self._output_pipes[output_name][RECEIVE].recv()
+        with self._stage_timer.span("Outputs/IPC-Send"):
+            for output_name, (_, input_pipe, _) in workers.items():
+                input_pipe[SEND].send(X)
+        for output_name, (_, _, output_pipe) in workers.items():
+            with self._stage_timer.span(f"Outputs/{output_name}/IPC-Wait"):
+                mean_pred[output_name], var_pred[output_name] = output_pipe[RECEIVE].recv()
         return mean_pred, var_pred
 
-    def _allocate_model_to_output(self, output_name: str, model_name: str) -> None:
-        mdl = model_loader(model_name, self._path_to_output_models)
-
-        new_input_pipe = Pipe()
-        new_output_pipe = Pipe()
-        self._input_pipes[output_name] = new_input_pipe
-        self._output_pipes[output_name] = new_output_pipe
-        self._model_processes[output_name] = \
-            Process(target=model_executor, args=(mdl, new_input_pipe[RECEIVE], new_output_pipe[SEND], False))
-        self._model_processes[output_name].start()
-        logger.info(f"Allocated model {model_name} to output {output_name}.")
+    def _worker(self, output_name: str) -> tuple[Process, Pipe, Pipe]:
+        return self._model_processes[output_name], self._input_pipes[output_name], self._output_pipes[output_name]
+
+    def _allocate_models(self, output_models: dict[str, str]) -> None:
+        """Starts one worker process per output. The workers load their models concurrently."""
+        # import the backends before forking, so the workers do not import them again.
+        from adanowo_simulator import model_adapter  # noqa: F401
+        if self._worker_start == "preload":
+            preload_models(list(output_models.values()), self._path_to_output_models)
+        for output_name, model_name in output_models.items():
+            self._model_processes[output_name], self._input_pipes[output_name], self._output_pipes[output_name] = \
+                self._start_worker(output_name, model_name)
+        for output_name, model_name in output_models.items():
+            self._wait_for_worker(output_name, model_name, self._worker(output_name))
+            logger.info(f"Allocated model {model_name} to output {output_name}.")
+
+    def _start_worker(self, output_name: str, model_name: str) -> tuple[Process, Pipe, Pipe]:
+        # the CPUs of a worker depend on the position of its output, so that replacing a model keeps them.
+        output_names = list(self._config.output_models.keys())
+        cpus = plan_worker_cpus(self._worker_resources, len(output_names))[output_names.index(output_name)]
+        input_pipe = Pipe()
+        output_pipe = Pipe()
+        process = self._process_context.Process(
+            target=model_executor,
+            args=(model_name, self._path_to_output_models, input_pipe[RECEIVE], output_pipe[SEND], False,
+                  cpus, self._worker_resources.get("torch_threads")))
+        process.start()
+        return process, input_pipe, output_pipe
+
+    def _wait_for_worker(self, output_name: str, model_name: str, worker: tuple[Process, Pipe, Pipe]) -> None:
+        process, _, output_pipe = worker
+        output_pipe = output_pipe[RECEIVE]
+        while not output_pipe.poll(WORKER_POLLING_INTERVAL):
+            if not process.is_alive():
+                raise RuntimeError(f"Worker process of model {model_name} for output {output_name} has died.")
+        status, message = output_pipe.recv()
+        if status == "error":
+            process.join()
+            raise RuntimeError(f"Loading model {model_name} for output {output_name} failed in its worker process:\n"
+                               f"{message}")
+        self._stage_timer.annotate(f"Outputs/{output_name}/IPC-Wait", message)
@@ -1,15 +1,19 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor, Future
 from enum import Enum
 from typing import Type
 import functools
 import time
 import math
 
+import numpy as np
 from omegaconf import DictConfig, OmegaConf
 from asyncua.sync import Client, ua, SyncNode, ThreadLoop
 from asyncua.client.ua_client import UASocketProtocol
 
 from adanowo_simulator.abstract_base_classes.output_manager import AbstractOutputManager
+from adanowo_simulator.abstract_base_classes.model_adapter import AbstractModelAdapter
+from adanowo_simulator.output_manager import load_models, get_path_to_output_models
 
 logger = logging.getLogger(__name__)
 DIFFERENCE_THRESHOLD = 0.1
@@ -23,6 +27,11 @@ class OpcuaOutputManager(AbstractOutputManager):
     Note: This implementation is designed to only use blocking, synchronous operations. This is because the environment
     is slow and the nature of the communication is linear.
     This does not require any concurrency, so we can stay in our happy synchronous world.
+
+    The only exception is the optional shadow simulation: While the operator decides on a recommendation, the simulated
+    output models are evaluated on the recommended state in a background thread. When the operator accepts, the
+    predictions are recorded together with the measurements (see :py:attr:'shadow_records'). The predictions are never
+    waited for, so the shadow simulation does not add any latency to a step.
     """
 
     def __init__(self, config: DictConfig):
@@ -37,6 +46,11 @@ class OpcuaOutputManager(AbstractOutputManager):
         self._output_nodes: list[SyncNode] | None = None
         self._input_nodes: list[SyncNode] | None = None
         self._agentControlStates = self._create_agent_control_state_enum()
+        # shadow simulation
+        self._shadow_executor: ThreadPoolExecutor | None = None
+        self._shadow_models: dict[str, AbstractModelAdapter] = dict()
+        self._shadow_records: list[dict[str, float]] = []
+        self._shadow_step_index: int = 0
 
     @property
     def config(self) -> DictConfig:
@@ -46,6 +60,15 @@ class OpcuaOutputManager(AbstractOutputManager):
     def config(self, c):
         self._config = c
 
+    @property
+    def shadow_records(self) -> list[dict[str, float]]:
+        """
+        Predicted-vs-measured outputs of all accepted recommendations since the last reset. Each record contains the
+        step index and the predicted mean, predicted variance and measurement of every shadow-simulated output.
+        Records are appended as soon as both prediction and measurement are available.
+        """
+        return self._shadow_records
+
     def step(self, state: dict[str, float]) -> dict[str, float]:
         if not self._ready:
             raise RuntimeError("Cannot call step() before calling reset().")
@@ -54,6 +77,8 @@ class OpcuaOutputManager(AbstractOutputManager):
             self._write_recommendation_to_output_nodes(state)
             # indicate that the current recommendation is up to date.
             self._set_agent_control_state("VALID")
+            # simulate the recommended state while the user decides.
+            shadow_prediction = self._submit_shadow_prediction(state)
             # wait for user decision. Can take much time.
             user_decision = self._await_user_decision()  # in architecture, move "await dead time" to GUI
             #  read process state first after receiving user feedback.
@@ -73,6 +98,10 @@ class OpcuaOutputManager(AbstractOutputManager):
                 only_plausible_process_outputs = self._check_state_plausibility(process_outputs_from_server)
                 outputs = self._update_process_outputs(outputs, only_plausible_process_outputs)
                 outputs[self._config.user_feedback_key] = float(self._agentControlStates["ACCEPTED"].value)
+                self._record_shadow_prediction(shadow_prediction, only_plausible_process_outputs)
+            elif shadow_prediction is not None:
+                shadow_prediction.cancel()
+            self._shadow_step_index += 1
         except Exception as e:
             self.close()
             raise e
@@ -82,6 +111,7 @@ class OpcuaOutputManager(AbstractOutputManager):
     def reset(self, state: dict[str, float]) -> dict[str, float]:
         self.close()
         self._config = self._initial_config.copy()
+        self._setup_shadow_simulation()
         self._setup_client()
 
         try:
@@ -102,11 +132,71 @@ class OpcuaOutputManager(AbstractOutputManager):
                 self._client.disconnect()
         if self._thread_loop.is_alive():
             self._thread_loop.stop()
+        if self._shadow_executor is not None:
+            self._shadow_executor.shutdown(wait=True, cancel_futures=True)
+            self._shadow_executor = None
+        for mdl in self._shadow_models.values():
+            mdl.close()
+        self._shadow_models = dict()
         self._client = None
         self._ready = False
 
+    def _setup_shadow_simulation(self) -> None:
+        self._shadow_records = []
+        self._shadow_step_index = 0
+        if not self._config.shadow_simulation.enabled:
+            return
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-simulation")
+        # models are loaded in the background as well. Predictions are queued behind the loading.
+        self._shadow_executor.submit(self._load_shadow_models)
+
+    def _load_shadow_models(self) -> None:
+        path_to_output_models = get_path_to_output_models(self._config.shadow_simulation.path_to_output_models)
+        output_models = dict(self._config.shadow_simulation.output_models)
+        self._shadow_models = load_models(output_models, path_to_output_models)
+        for output_name, model_name in output_models.items():
+            logger.info(f"Allocated shadow model {model_name} to output {output_name}.")
+
+    def _submit_shadow_prediction(self, state: dict[str, float]) -> Future | None:
+        if self._shadow_executor is None:
+            return None
+        return self._shadow_executor.submit(self._predict_shadow_outputs, dict(state))
+
+    def _predict_shadow_outputs(self, state: dict[str, float]) -> dict[str, tuple[float, float]]:
+        predictions = dict()
+        for output_name, mdl in self._shadow_models.items():
+            mean_pred, var_pred = mdl.predict_y(state, observation_noise_only=True)
+            predictions[output_name] = (float(np.array(mean_pred).flatten()[0]),
+                                        float(np.array(var_pred).flatten()[0]))
+        return predictions
+
+    def _record_shadow_prediction(self, shadow_prediction: Future | None, measurements: dict[str, float]) -> None:
+        """Records the prediction as soon as it is done. Never blocks, since the prediction is not needed for the step."""
+        if shadow_prediction is None:
+            return
+        step_index = self._shadow_step_index
+        measurements = dict(measurements)
+
+        def record(finished_prediction: Future) -> None:
+            if finished_prediction.cancelled():
+                return
+            if finished_prediction.exception() is not None:
+                logger.warning(f"Shadow simulation failed: {finished_prediction.exception()}")
+                return
+            shadow_record = {"Step": step_index}
+            for output_name, (mean_pred, var_pred) in finished_prediction.result().items():
+                shadow_record[f"{output_name}/Predicted-Mean"] = mean_pred
+                shadow_record[f"{output_name}/Predicted-Variance"] = var_pred
+                shadow_record[f"{output_name}/Measured"] = measurements.get(output_name)
+            self._shadow_records.append(shadow_record)
+
+        shadow_prediction.add_done_callback(record)
+
     def _setup_client(self) -> None:
-        self._thread_loop.start()
+        if not self._thread_loop.is_alive():
+            # a stopped thread loop cannot be started again, so a new one is needed after close().
+            self._thread_loop = ThreadLoop()
+            self._thread_loop.start()
         self._client = Client(self._config.server_url, tloop=self._thread_loop)
         self._agent_control_state_node = self._get_node_autoconnect(self._config.control_state_node_id)
         output_parent_node = self._get_node_autoconnect(self._config.agent_output_node)
@@ -10,8 +10,9 @@ def prcnt_to_mult(prcnt: float) -> float:
 
 def model(X: dict) -> [np.array, np.array]:
     X = X.copy()
+    # arrays and torch tensors are kept, so that the model can be differentiated with autograd.
     for key in X.keys():
-        X[key] = np.array(X[key]).reshape(-1, 1)
+        X[key] = X[key].reshape(-1, 1) if hasattr(X[key], "reshape") else np.array(X[key]).reshape(-1, 1)
 
     weight_per_area_theoretical = \
         X["CardDeliveryWeightPerArea"] * \
@@ -22,7 +23,7 @@ def model(X: dict) -> [np.array, np.array]:
         prcnt_to_mult(X["DrawFrameDraftRatio"]) - \
         X["SmileEffectStrength"]
 
-    var = VARIANCE_AT_100_GSM * np.power(weight_per_area_theoretical / GSM_100, 2)
-    var = np.array(var).reshape(-1, 1)
+    var = VARIANCE_AT_100_GSM * (weight_per_area_theoretical / GSM_100) ** 2
+    var = var.reshape(-1, 1)
 
     return weight_per_area_theoretical, var
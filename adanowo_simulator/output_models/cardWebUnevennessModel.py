@@ -1,5 +1,6 @@
 import gpytorch
 import numpy as np
+import torch
 from gpytorch.constraints import GreaterThan
 from gpytorch.kernels import PolynomialKernel, RBFKernel, ScaleKernel
 
@@ -9,27 +10,30 @@ SCALE_THROUGHPUT = 0.022
 
 def unpack_dict(X: dict, training_features: list[str]) -> np.array:
     X = X.copy()
+    # arrays and torch tensors are kept, so that the model can be differentiated with autograd.
     for key in X.keys():
-        X[key] = np.array(X[key]).reshape(-1, 1)
+        X[key] = X[key].reshape(-1, 1) if hasattr(X[key], "reshape") else np.array(X[key]).reshape(-1, 1)
     X_unpacked = []
     for f in training_features:
         if f == "FG_soll":
             X_unpacked.append(X["CardDeliveryWeightPerArea"] * SCALE_AREA_WEIGHT)
         elif f == "mean_mass_cylinders":
-            velocities = np.concatenate(
-                (
-                    X["v_PreRoll"],
-                    X["v_MainCylinder"],
-                    X["v_WorkerMain"],
-                    X["v_StripperMain"],
-                    X["v_WorkerPre"],
-                    X["v_StripperPre"]
-                ), axis=1
+            velocities = (
+                X["v_PreRoll"],
+                X["v_MainCylinder"],
+                X["v_WorkerMain"],
+                X["v_StripperMain"],
+                X["v_WorkerPre"],
+                X["v_StripperPre"]
             )
-            mean_masses = np.divide(X["MassThroughput"] * SCALE_THROUGHPUT, velocities)
-            X_unpacked.append(np.mean(mean_masses, axis=1).reshape(-1, 1))
+            velocities = torch.cat(velocities, dim=1) if torch.is_tensor(velocities[0]) else \
+                np.concatenate(velocities, axis=1)
+            mean_masses = X["MassThroughput"] * SCALE_THROUGHPUT / velocities
+            X_unpacked.append(mean_masses.mean(axis=1).reshape(-1, 1))
         elif f == "Diff_ArbeiterZuWender":
             X_unpacked.append(X["v_WorkerMain"] - X["v_StripperMain"])
+    if torch.is_tensor(X_unpacked[0]):
+        return torch.cat(X_unpacked, dim=1)
     return np.concatenate(X_unpacked, axis=1)
 
 
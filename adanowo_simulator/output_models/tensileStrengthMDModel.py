@@ -1,13 +1,15 @@
 import gpytorch
 import numpy as np
+import torch
 from gpytorch.constraints import GreaterThan, Interval
 from gpytorch.kernels import PolynomialKernel, RBFKernel, ScaleKernel
 
 
 def unpack_dict(X: dict, training_inputs: list[str]) -> np.array:
     X = X.copy()
+    # arrays and torch tensors are kept, so that the model can be differentiated with autograd.
     for key in X.keys():
-        X[key] = np.array(X[key]).reshape(-1, 1)
+        X[key] = X[key].reshape(-1, 1) if hasattr(X[key], "reshape") else np.array(X[key]).reshape(-1, 1)
     X_unpacked = []
     for f in training_inputs:
         if f == "CL01_LayersCalculatorLayers":
@@ -26,6 +28,8 @@ def unpack_dict(X: dict, training_inputs: list[str]) -> np.array:
             X_unpacked.append(X["FibreA"])
         elif f == "Fibre_D":
             X_unpacked.append(X["FibreD"])
+    if torch.is_tensor(X_unpacked[0]):
+        return torch.cat(X_unpacked, dim=1)
     return np.concatenate(X_unpacked, axis=1)
 
 
@@ -1,4 +1,6 @@
-from omegaconf import ListConfig, DictConfig
+import heapq
+
+from omegaconf import ListConfig, DictConfig, OmegaConf
 import numpy as np
 
 from adanowo_simulator.abstract_base_classes.scenario_manager import AbstractScenarioManager
@@ -6,12 +8,209 @@ from adanowo_simulator.abstract_base_classes.output_manager import AbstractOutpu
 from adanowo_simulator.abstract_base_classes.objective_manager import AbstractObjectiveManager
 from adanowo_simulator.abstract_base_classes.disturbance_manager import AbstractDisturbanceManager
 
+RANDOM_BLOCK_SIZE = 1024  # values that are sampled at once for each random scenario
+# a target is (category, name, field): field is the bound type of output bounds and None otherwise.
+Target = tuple[str, str, str | None]
+
+
+class ScenarioTimeline:
+    """
+    Scenarios of a scenario config compiled into a timeline of updates.
+
+    Deterministic scenarios become events (step index, target, value) that are sorted by step index and consumed with a
+    cursor. Random scenarios are kept in a heap by their next trigger step and their values are sampled in blocks of
+    RANDOM_BLOCK_SIZE from a generator per scenario, which is seeded from the global NumPy generator. Recorded
+    trajectories in the 'sources' of the config are streamed from their files (see
+    :py:class:'~adanowo_simulator.scenario_source.StreamingScenarioSource'). Thus, :py:meth:'due' only costs time for
+    the updates that are due. Events before 'first_step' are skipped.
+
+    The position in the timeline can be saved with :py:meth:'snapshot' and restored with :py:meth:'restore'.
+    """
+
+    def __init__(self, config: DictConfig, first_step: int = 1):
+        events: list[tuple[int, Target, float | str]] = []
+        random_scenarios: list[tuple[Target, int, float, float]] = []
+        for target, scenario in _iterate_scenarios(config):
+            if isinstance(scenario, ListConfig):  # deterministic scenario
+                events.extend((int(step_index), target, value)
+                              for step_index, value in OmegaConf.to_container(scenario, resolve=True))
+            else:  # random scenario
+                random_scenarios.append((target, int(scenario.trigger_interval), scenario.mean - scenario.range,
+                                         scenario.mean + scenario.range))
+        events.sort(key=lambda event: event[0])  # stable, so events of the same step keep the config order.
+
+        self._steps: np.ndarray = np.array([event[0] for event in events], dtype=np.int64)
+        self._targets: list[Target] = [event[1] for event in events]
+        self._values: list[float | str] = [event[2] for event in events]
+        self._cursor: int = int(np.searchsorted(self._steps, first_step))
+        self._next_step: int = first_step
+
+        # index of the next event of the same target, to know the upcoming model of each output.
+        self._next_event_of_target: list[int | None] = [None] * len(events)
+        next_event: dict[Target, int] = dict()
+        for index in range(len(events) - 1, -1, -1):
+            self._next_event_of_target[index] = next_event.get(self._targets[index])
+            next_event[self._targets[index]] = index
+        self._upcoming_model_events: dict[str, int] = dict()
+        for index in range(len(events) - 1, self._cursor - 1, -1):
+            if self._targets[index][0] == "output_models":
+                self._upcoming_model_events[self._targets[index][1]] = index
+        self._upcoming_models_changed: bool = bool(self._upcoming_model_events)
+
+        self._random_scenarios: list[tuple[Target, int, float, float]] = random_scenarios
+        seeds = np.random.randint(np.iinfo(np.int64).max, size=len(random_scenarios))
+        self._random_generators: list[np.random.Generator] = [np.random.default_rng(seed) for seed in seeds]
+        self._random_values: list[np.ndarray] = [np.empty(0)] * len(random_scenarios)
+        self._random_positions: list[int] = [0] * len(random_scenarios)
+        # number of sampled blocks and the generator state before the current block, to restore snapshots.
+        self._random_blocks: list[int] = [0] * len(random_scenarios)
+        self._random_block_states: list[dict] = [generator.bit_generator.state
+                                                 for generator in self._random_generators]
+        # (next trigger step, scenario index), triggers are the multiples of the trigger interval.
+        self._random_triggers: list[tuple[int, int]] = [
+            (-(-first_step // trigger_interval) * trigger_interval, index)
+            for index, (_, trigger_interval, _, _) in enumerate(random_scenarios)]
+        heapq.heapify(self._random_triggers)
+
+        self._sources = []
+        source_configs = config.get("sources") or []
+        if source_configs:
+            from adanowo_simulator.scenario_source import StreamingScenarioSource
+            try:
+                for source_config in source_configs:
+                    self._sources.append(StreamingScenarioSource.from_config(source_config, first_step))
+            except Exception as e:
+                self.close()
+                raise e
+
+    def due(self, step_index: int) -> list[tuple[Target, float | str]]:
+        """Updates that are due at 'step_index', deterministic ones first. Past updates that were missed are skipped."""
+        updates = []
+        self._next_step = step_index + 1
+        steps = self._steps
+        while self._cursor < len(steps) and steps[self._cursor] <= step_index:
+            index = self._cursor
+            self._cursor += 1
+            if steps[index] == step_index:
+                updates.append((self._targets[index], self._values[index]))
+            if self._targets[index][0] == "output_models":
+                self._advance_upcoming_model(index)
+
+        triggers = self._random_triggers
+        while triggers and triggers[0][0] <= step_index:
+            trigger_step, index = triggers[0]
+            target, trigger_interval, _, _ = self._random_scenarios[index]
+            if trigger_step == step_index:
+                updates.append((target, self._sample(index)))
+            next_trigger_step = trigger_step + trigger_interval
+            if next_trigger_step <= step_index:
+                next_trigger_step = -(-(step_index + 1) // trigger_interval) * trigger_interval
+            heapq.heapreplace(triggers, (next_trigger_step, index))
+
+        for source in self._sources:
+            updates.extend(source.due(step_index))
+        return updates
+
+    def upcoming_output_models(self) -> dict[str, str] | None:
+        """Next scheduled model of each output, or None if it has not changed since the last call."""
+        if not self._upcoming_models_changed:
+            return None
+        self._upcoming_models_changed = False
+        return {output_name: self._values[index] for output_name, index in self._upcoming_model_events.items()}
+
+    def snapshot(self) -> dict:
+        return {
+            "next_step": self._next_step,
+            "cursor": self._cursor,
+            "upcoming_model_events": dict(self._upcoming_model_events),
+            "random_triggers": list(self._random_triggers),
+            "random_blocks": list(self._random_blocks),
+            "random_block_states": list(self._random_block_states),
+            "random_positions": list(self._random_positions)
+        }
+
+    def restore(self, snapshot: dict) -> None:
+        if len(snapshot["random_blocks"]) != len(self._random_scenarios):
+            raise ValueError("The snapshot does not match the scenarios of the timeline.")
+        self._next_step = snapshot["next_step"]
+        self._cursor = snapshot["cursor"]
+        self._upcoming_model_events = dict(snapshot["upcoming_model_events"])
+        self._upcoming_models_changed = True
+        self._random_triggers = list(snapshot["random_triggers"])
+        for index, block in enumerate(snapshot["random_blocks"]):
+            state = snapshot["random_block_states"][index]
+            # the values of the current block are only kept if they come from the same generator state, timelines
+            # that are compiled again (e.g. after a reset) are seeded anew.
+            if block != self._random_blocks[index] or state != self._random_block_states[index]:
+                # samples the block of the snapshot again.
+                self._random_generators[index].bit_generator.state = state
+                self._random_block_states[index] = state
+                self._random_blocks[index] = block
+                if block:
+                    _, _, low, high = self._random_scenarios[index]
+                    self._random_values[index] = self._random_generators[index].uniform(low, high, RANDOM_BLOCK_SIZE)
+                else:
+                    self._random_values[index] = np.empty(0)
+            self._random_positions[index] = snapshot["random_positions"][index]
+        for source in self._sources:
+            source.seek(self._next_step)
+
+    def close(self) -> None:
+        """Stops the readers of the streamed sources."""
+        for source in self._sources:
+            source.close()
+
+    def _advance_upcoming_model(self, index: int) -> None:
+        output_name = self._targets[index][1]
+        if self._upcoming_model_events.get(output_name) != index:
+            return
+        next_index = self._next_event_of_target[index]
+        if next_index is None:
+            del self._upcoming_model_events[output_name]
+        else:
+            self._upcoming_model_events[output_name] = next_index
+        self._upcoming_models_changed = True
+
+    def _sample(self, index: int) -> float:
+        position = self._random_positions[index]
+        if position == len(self._random_values[index]):
+            _, _, low, high = self._random_scenarios[index]
+            generator = self._random_generators[index]
+            self._random_block_states[index] = generator.bit_generator.state
+            self._random_blocks[index] += 1
+            self._random_values[index] = generator.uniform(low, high, RANDOM_BLOCK_SIZE)
+            position = 0
+        self._random_positions[index] = position + 1
+        return float(self._random_values[index][position])
+
+
+def _iterate_scenarios(config: DictConfig):
+    """Yields the target and the scenario of every configured scenario."""
+    for disturbance_name, scenario in (config.disturbances or dict()).items():
+        yield ("disturbances", disturbance_name, None), scenario
+    for output_name, scenarios in (config.output_bounds or dict()).items():
+        for boundary_type in ["lower", "upper"]:
+            scenario = scenarios.get(boundary_type)
+            if scenario is not None:
+                yield ("output_bounds", output_name, boundary_type), scenario
+    for output_name, scenario in (config.output_models or dict()).items():
+        yield ("output_models", output_name, None), scenario
+
 
 class ScenarioManager(AbstractScenarioManager):
+    """
+    Scenario manager that changes disturbances, output bounds and output models according to the scenario config.
+
+    The scenarios are compiled into a :py:class:'ScenarioTimeline' at reset and whenever the config is replaced, so a
+    step only writes the updates that are due into the configs of the other managers. These configs are the runtime
+    state of the managers, which read them at every step and snapshot them, so the updates stay visible through the
+    public config of each manager.
+    """
 
     def __init__(self, config: DictConfig):
         self._initial_config: DictConfig = config.copy()
         self._config: DictConfig = self._initial_config.copy()
+        self._timeline: ScenarioTimeline | None = None
         self._ready: bool = False
 
     @property
@@ -21,56 +220,54 @@ class ScenarioManager(AbstractScenarioManager):
     @config.setter
     def config(self, c):
         self._config = c
+        # compiled again at the next step.
+        self._close_timeline()
 
     def step(self, step_index: int, disturbance_manager: AbstractDisturbanceManager,
-             output_manager: AbstractOutputManager, objective_manager: AbstractObjectiveManager):
-        if self._ready:
-            self._update_disturbances(step_index, disturbance_manager.config.disturbances)
-            self._update_output_bounds(step_index, objective_manager.config.output_bounds)
-            self._update_output_model_allocation(step_index, output_manager.config.output_models)
-        else:
+             output_manager: AbstractOutputManager, objective_manager: AbstractObjectiveManager,
+             prefetch: bool = True):
+        if not self._ready:
             raise RuntimeError("Cannot call step() before calling reset().")
+        if self._timeline is None:
+            self._timeline = ScenarioTimeline(self._config, step_index)
+        # only the updates that are due are written, through the public configs that the managers read at each step.
+        for (category, name, field), value in self._timeline.due(step_index):
+            if category == "disturbances":
+                disturbance_manager.config.disturbances[name] = value
+            elif category == "output_bounds":
+                objective_manager.config.output_bounds[name][field] = value
+            else:
+                output_manager.config.output_models[name] = value
+        if not prefetch:
+            # changes of the upcoming models are announced by the next step with prefetching.
+            return
+        upcoming_output_models = self._timeline.upcoming_output_models()
+        if upcoming_output_models:
+            output_manager.prefetch_models(upcoming_output_models)
 
     def reset(self) -> None:
+        self._close_timeline()
         self._config = self._initial_config.copy()
+        # the environment steps the scenario from step index 1 on.
+        self._timeline = ScenarioTimeline(self._config, first_step=1)
         self._ready = True
 
     def close(self) -> None:
+        self._close_timeline()
         self._ready = False
 
-    def _update_output_model_allocation(self, step_index: int, output_models_config: DictConfig):
-        if self._config.output_models is None:
-            return
-        for output_name, scenario in self._config.output_models.items():
-            self._update_target(step_index, output_models_config, output_name, scenario)
+    def snapshot(self) -> dict:
+        return {"timeline": self._timeline.snapshot() if self._timeline is not None else None}
 
-    def _update_output_bounds(self, step_index: int, output_bounds_config: DictConfig) -> None:
-        if self._config.output_bounds is None:
-            return
-        for output_name, scenarios in self._config.output_bounds.items():
-            for boundary_type in ["lower", "upper"]:
-                scenario_value = scenarios.get(boundary_type)
-                if scenario_value is None:
-                    continue
-                self._update_target(step_index, output_bounds_config[output_name], boundary_type, scenario_value)
-
-    def _update_disturbances(self, step_index: int, disturbance_config: DictConfig) -> None:
-        if self._config.disturbances is None:
+    def restore(self, snapshot: dict) -> None:
+        if snapshot["timeline"] is None:
+            self._close_timeline()
             return
-        for disturbance_name, scenario in self._config.disturbances.items():
-            self._update_target(step_index, disturbance_config, disturbance_name, scenario)
-
-    @staticmethod
-    def _update_target(step_index: int, target_config: DictConfig, target_field: str,
-                       scenario: ListConfig | DictConfig) -> None:
-        if isinstance(scenario, ListConfig):  # deterministic scenario
-            if scenario and scenario[0][0] == step_index:
-                target_config[target_field] = scenario[0][1]
-                scenario.pop(0)
-        else:  # random scenario
-            if step_index % scenario.trigger_interval == 0:
-                target_config[target_field] = np.random.uniform(
-                    scenario.mean - scenario.range,
-                    scenario.mean + scenario.range
-                )
-        return
+        if self._timeline is None:
+            self._timeline = ScenarioTimeline(self._config, snapshot["timeline"]["next_step"])
+        self._timeline.restore(snapshot["timeline"])
+
+    def _close_timeline(self) -> None:
+        if self._timeline is not None:
+            self._timeline.close()
+            self._timeline = None
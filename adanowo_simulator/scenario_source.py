@@ -0,0 +1,226 @@
+import queue
+import threading
+from bisect import bisect_left
+import pathlib as pl
+
+import numpy as np
+import pandas as pd
+from omegaconf import DictConfig, OmegaConf
+
+from adanowo_simulator.columnar_storage import HDF5_KEY
+from adanowo_simulator.output_manager import hdf5_lock
+
+FILE_FORMATS = {".csv": "csv", ".parquet": "parquet", ".h5": "hdf5", ".hdf5": "hdf5", ".hdf": "hdf5"}
+QUEUE_POLLING_INTERVAL = 0.1  # seconds
+# a target is (category, name, field): field is the bound type of output bounds and None otherwise.
+Target = tuple[str, str, str | None]
+
+
+def parse_target(target: str) -> Target:
+    """Parses a target like "disturbances/ProductWidth" or "output_bounds/AreaWeightLane1/lower"."""
+    parts = target.split("/")
+    if parts[0] == "disturbances" and len(parts) == 2:
+        return parts[0], parts[1], None
+    if parts[0] == "output_bounds" and len(parts) == 3 and parts[2] in ("lower", "upper"):
+        return parts[0], parts[1], parts[2]
+    raise ValueError(f"Invalid scenario target {target}. Use disturbances/<disturbance name> or "
+                     f"output_bounds/<output name>/<lower or upper>.")
+
+
+class StreamingScenarioSource:
+    """
+    Scenario that replays recorded trajectories of disturbances and output bounds from a CSV, Parquet or HDF5 file.
+
+    Each row holds a step index and the values of the targets at that step, rows have to be sorted by step index.
+    Empty (NaN) values leave their target unchanged, so sparse trajectories can share a file. Columns are mapped to
+    targets with 'targets' (column name -> target, see :py:func:'parse_target'), by default every column is a target
+    by its name. HDF5 files have to be written in table format, e.g. the logs of a
+    :py:class:'~adanowo_simulator.experiment_tracker.ColumnarTracker'.
+
+    Only the header is read when the source is created. A background thread reads the rows in chunks of 'chunk_size'
+    (memory-mapped for CSV and Parquet) and keeps up to 'lookahead' chunks ready, so replays of any length need constant
+    memory. Rows before 'first_step' are skipped. :py:meth:'seek' moves to another step, reading the file again only if
+    the step lies before the current chunk.
+    """
+
+    def __init__(self, path: str | pl.Path, targets: dict[str, str] | None = None, step_column: str = "Step",
+                 chunk_size: int = 10000, lookahead: int = 2, first_step: int = 1, hdf5_key: str = HDF5_KEY):
+        self._path = pl.Path(path)
+        if self._path.suffix not in FILE_FORMATS:
+            raise ValueError(f"Unknown scenario file format {self._path.suffix}. Use one of {list(FILE_FORMATS)}.")
+        if not self._path.is_file():
+            raise FileNotFoundError(f"Scenario file {self._path} does not exist.")
+        if chunk_size < 1 or lookahead < 1:
+            raise ValueError("The chunk size and the lookahead must be at least 1.")
+        self._file_format: str = FILE_FORMATS[self._path.suffix]
+        self._step_column: str = step_column
+        self._chunk_size: int = chunk_size
+        self._lookahead: int = lookahead
+        self._hdf5_key: str = hdf5_key
+        self._first_step: int = first_step
+
+        available_columns = self._read_column_names()
+        if step_column not in available_columns:
+            raise ValueError(f"Scenario file {self._path} has no step column {step_column}.")
+        if targets is None:
+            targets = {column: column for column in available_columns if column != step_column}
+        missing_columns = set(targets) - set(available_columns)
+        if missing_columns:
+            raise ValueError(f"Scenario file {self._path} has no columns {sorted(missing_columns)}.")
+        self._columns: list[str] = list(targets.keys())
+        self._targets: list[Target] = [parse_target(target) for target in targets.values()]
+
+        self._start_reader()
+
+    @classmethod
+    def from_config(cls, config: DictConfig | dict, first_step: int = 1) -> "StreamingScenarioSource":
+        """Creates a source from an entry of scenario_setup.sources."""
+        if isinstance(config, DictConfig):
+            config = OmegaConf.to_container(config, resolve=True)
+        settings = {key: value for key, value in config.items() if value is not None}
+        return cls(first_step=first_step, **settings)
+
+    @property
+    def path(self) -> pl.Path:
+        return self._path
+
+    def due(self, step_index: int) -> list[tuple[Target, float]]:
+        """Updates of the rows with 'step_index'. Rows before it are skipped."""
+        updates = []
+        while True:
+            if self._cursor == len(self._steps):
+                if not self._next_chunk():
+                    return updates
+                continue
+            step = self._steps[self._cursor]
+            if step > step_index:
+                return updates
+            if step == step_index:
+                updates.extend(self._updates[self._cursor])
+            self._cursor += 1
+
+    def seek(self, step_index: int) -> None:
+        """Moves to 'step_index', so that the next call of :py:meth:'due' may return its row."""
+        if step_index >= self._earliest_step:
+            self._cursor = bisect_left(self._steps, step_index)
+            return
+        self.close()
+        self._first_step = step_index
+        self._start_reader()
+
+    def close(self) -> None:
+        self._stop.set()
+        # unblocks the reader if it waits for space in the queue.
+        while self._reader.is_alive():
+            try:
+                self._chunks.get(timeout=QUEUE_POLLING_INTERVAL)
+            except queue.Empty:
+                pass
+        self._reader.join()
+        self._exhausted = True
+
+    def _start_reader(self) -> None:
+        # step indices and updates of the current chunk, prepared by the reader thread.
+        self._steps: list[int] = []
+        self._updates: list[list[tuple[Target, float]]] = []
+        self._cursor: int = 0
+        # the current chunk and the following ones hold all rows from this step on.
+        self._earliest_step: int = self._first_step
+        self._exhausted: bool = False
+        self._chunks: queue.Queue = queue.Queue(maxsize=self._lookahead)
+        self._stop = threading.Event()
+        self._reader = threading.Thread(target=self._read, name=f"scenario-source-{self._path.name}", daemon=True)
+        self._reader.start()
+
+    def _next_chunk(self) -> bool:
+        if self._exhausted:
+            return False
+        chunk = self._chunks.get()
+        if chunk is None:
+            self._exhausted = True
+            return False
+        if isinstance(chunk, Exception):
+            self._exhausted = True
+            raise RuntimeError(f"Reading scenario file {self._path} failed.") from chunk
+        if self._steps:
+            self._earliest_step = self._steps[-1] + 1
+        self._steps, self._updates = chunk
+        self._cursor = 0
+        return True
+
+    def _read(self) -> None:
+        last_step = None
+        chunks = self._iterate_chunks()
+        try:
+            for frame in chunks:
+                steps = frame[self._step_column].to_numpy(dtype=np.int64)
+                if len(steps) == 0:
+                    continue
+                if np.any(steps[1:] < steps[:-1]) or (last_step is not None and steps[0] < last_step):
+                    raise ValueError(f"Rows of scenario file {self._path} are not sorted by {self._step_column}.")
+                last_step = steps[-1]
+                keep = steps >= self._first_step
+                values = frame[self._columns].to_numpy(dtype=np.float64)[keep].tolist()
+                updates = [[(target, value) for target, value in zip(self._targets, row) if value == value]
+                           for row in values]
+                if not self._put((steps[keep].tolist(), updates)):
+                    return
+        except Exception as e:
+            self._put(e)
+            return
+        finally:
+            # closes the file if the source is closed before the end.
+            chunks.close()
+        self._put(None)
+
+    def _put(self, item) -> bool:
+        """Waits for space in the queue. Returns False if the source has been closed."""
+        while not self._stop.is_set():
+            try:
+                self._chunks.put(item, timeout=QUEUE_POLLING_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _read_column_names(self) -> list[str]:
+        if self._file_format == "csv":
+            return list(pd.read_csv(self._path, nrows=0).columns)
+        if self._file_format == "parquet":
+            return list(_import_parquet().read_schema(self._path).names)
+        with hdf5_lock, pd.HDFStore(self._path, mode="r") as store:
+            return list(store.select(self._hdf5_key, start=0, stop=0).columns)
+
+    def _iterate_chunks(self):
+        columns = [self._step_column] + self._columns
+        if self._file_format == "csv":
+            yield from pd.read_csv(self._path, usecols=columns, chunksize=self._chunk_size, memory_map=True)
+        elif self._file_format == "parquet":
+            parquet_file = _import_parquet().ParquetFile(self._path, memory_map=True)
+            for batch in parquet_file.iter_batches(batch_size=self._chunk_size, columns=columns):
+                yield batch.to_pandas()
+        else:
+            with hdf5_lock:
+                store = pd.HDFStore(self._path, mode="r")
+            try:
+                start = 0
+                while not self._stop.is_set():
+                    # PyTables must not be used by several threads at once, so the lock is held per chunk only.
+                    with hdf5_lock:
+                        frame = store.select(self._hdf5_key, columns=columns, start=start,
+                                             stop=start + self._chunk_size)
+                    if frame.empty:
+                        return
+                    start += self._chunk_size
+                    yield frame
+            finally:
+                with hdf5_lock:
+                    store.close()
+
+
+def _import_parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Reading Parquet files requires pyarrow. Install it or use CSV or HDF5 files.") from e
+    return pq
@@ -0,0 +1,221 @@
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+from omegaconf import DictConfig
+
+from adanowo_simulator.sweep import sweep_bounds, evaluate_chunks
+
+logger = logging.getLogger(__name__)
+
+METHODS = ("sobol", "morris")
+
+
+class SaltelliDesign:
+    """
+    Sample matrices of the Saltelli scheme for Sobol indices: the base matrices A and B of 'base_samples' points each
+    and, for every setpoint i, the matrix AB_i, i.e. A with column i taken from B. The points are enumerated as A, B,
+    AB_1, ..., AB_d, so the design has base_samples * (d + 2) points.
+
+    A and B are the two halves of a scrambled Sobol sequence in 2d dimensions (scipy.stats.qmc), so 'base_samples' has
+    to be a power of two.
+    """
+
+    def __init__(self, bounds: dict[str, tuple[float, float]], base_samples: int, seed: int = 0):
+        if base_samples < 2 or base_samples & (base_samples - 1):
+            raise ValueError("The number of base samples of a Saltelli design has to be a power of two.")
+        from scipy.stats import qmc
+        self._bounds: dict[str, tuple[float, float]] = dict(bounds)
+        self._base_samples: int = base_samples
+        dimension = len(bounds)
+        base = qmc.Sobol(2 * dimension, scramble=True, seed=seed).random_base2(int(np.log2(base_samples)))
+        self._a: np.ndarray = base[:, :dimension]
+        self._b: np.ndarray = base[:, dimension:]
+
+    @property
+    def base_samples(self) -> int:
+        return self._base_samples
+
+    def __len__(self) -> int:
+        return self._base_samples * (len(self._bounds) + 2)
+
+    def points(self, start: int, stop: int) -> dict[str, np.ndarray]:
+        unit = np.empty((stop - start, len(self._bounds)))
+        position = start
+        while position < stop:
+            matrix, row = divmod(position, self._base_samples)
+            rows = min(stop - position, self._base_samples - row)
+            target = unit[position - start:position - start + rows]
+            target[:] = self._b[row:row + rows] if matrix == 1 else self._a[row:row + rows]
+            if matrix >= 2:
+                target[:, matrix - 2] = self._b[row:row + rows, matrix - 2]
+            position += rows
+        return _scale(unit, self._bounds)
+
+
+class MorrisDesign:
+    """
+    One-at-a-time trajectories of the Morris method on a grid of 'num_levels' levels per setpoint. Each of the
+    'num_trajectories' trajectories starts at a random grid point and changes the setpoints in random order by
+    +-delta (delta = num_levels / (2 * (num_levels - 1)) in the unit cube), so it has d + 1 points.
+    """
+
+    def __init__(self, bounds: dict[str, tuple[float, float]], num_trajectories: int, num_levels: int = 4,
+                 seed: int = 0):
+        if num_trajectories < 2 or num_levels < 2 or num_levels % 2:
+            raise ValueError("The Morris method needs at least 2 trajectories and an even number of levels.")
+        self._bounds: dict[str, tuple[float, float]] = dict(bounds)
+        self._num_trajectories: int = num_trajectories
+        self._delta: float = num_levels / (2 * (num_levels - 1))
+        dimension = len(bounds)
+        generator = np.random.default_rng(seed)
+        # start levels from which a step of delta up stays within the grid.
+        start_levels = generator.integers(0, num_levels // 2, size=(num_trajectories, dimension))
+        starts = start_levels / (num_levels - 1)
+        directions = generator.choice([-1.0, 1.0], size=(num_trajectories, dimension))
+        # a negative direction starts delta higher and steps down.
+        starts = np.where(directions < 0, starts + self._delta, starts)
+        self._orders: np.ndarray = np.argsort(generator.random((num_trajectories, dimension)), axis=1)
+        self._directions: np.ndarray = directions
+        trajectories = np.repeat(starts[:, None, :], dimension + 1, axis=1)
+        for step in range(dimension):
+            changed = self._orders[:, step]
+            trajectories[np.arange(num_trajectories), step + 1:, changed] += \
+                (directions[np.arange(num_trajectories), changed] * self._delta)[:, None]
+        self._unit: np.ndarray = trajectories.reshape(-1, dimension)
+
+    @property
+    def num_trajectories(self) -> int:
+        return self._num_trajectories
+
+    def __len__(self) -> int:
+        return len(self._unit)
+
+    def points(self, start: int, stop: int) -> dict[str, np.ndarray]:
+        return _scale(self._unit[start:stop], self._bounds)
+
+    def elementary_effects(self, values: np.ndarray) -> np.ndarray:
+        """Elementary effects (trajectories, setpoints) in output units per unit of the normalized setpoint range."""
+        dimension = len(self._bounds)
+        values = values.reshape(self._num_trajectories, dimension + 1)
+        differences = np.diff(values, axis=1)
+        effects = np.empty((self._num_trajectories, dimension))
+        trajectory_indices = np.arange(self._num_trajectories)[:, None]
+        effects[trajectory_indices, self._orders] = differences
+        return effects / (self._directions * self._delta)
+
+
+def _scale(unit: np.ndarray, bounds: dict[str, tuple[float, float]]) -> dict[str, np.ndarray]:
+    return {setpoint_name: lower + unit[:, column] * (upper - lower)
+            for column, (setpoint_name, (lower, upper)) in enumerate(bounds.items())}
+
+
+def sobol_indices(values: np.ndarray, base_samples: int, dimension: int, num_resamples: int = 100,
+                  confidence_level: float = 0.95, seed: int = 0) -> dict[str, np.ndarray]:
+    """
+    First order (Saltelli 2010) and total (Jansen) Sobol indices of the values of a :py:class:'SaltelliDesign' with
+    percentile bootstrap intervals. Returns arrays of length 'dimension'.
+    """
+    # the estimators are less noisy for standardized values. Constant values have no sensitivity.
+    spread = np.std(values)
+    values = (values - np.mean(values)) / spread if spread > 0 else np.zeros_like(values)
+    matrices = values.reshape(dimension + 2, base_samples)
+    resamples = np.random.default_rng(seed).integers(0, base_samples, size=(num_resamples, base_samples))
+
+    def estimate(rows) -> tuple[np.ndarray, np.ndarray]:
+        f_a, f_b = matrices[0][rows], matrices[1][rows]
+        variance = np.var(np.concatenate([f_a, f_b], axis=-1), axis=-1)
+        variance = np.where(variance > 0, variance, np.inf)
+        first_order, total = [], []
+        for index in range(dimension):
+            f_ab = matrices[index + 2][rows]
+            first_order.append(np.mean(f_b * (f_ab - f_a), axis=-1) / variance)
+            total.append(0.5 * np.mean((f_a - f_ab) ** 2, axis=-1) / variance)
+        return np.array(first_order), np.array(total)
+
+    first_order, total = estimate(slice(None))
+    first_order_resampled, total_resampled = estimate(resamples)
+    tail = 50 * (1 - confidence_level)
+    return {
+        "First-Order": first_order,
+        "First-Order-Lower": np.percentile(first_order_resampled, tail, axis=1),
+        "First-Order-Upper": np.percentile(first_order_resampled, 100 - tail, axis=1),
+        "Total": total,
+        "Total-Lower": np.percentile(total_resampled, tail, axis=1),
+        "Total-Upper": np.percentile(total_resampled, 100 - tail, axis=1)
+    }
+
+
+def morris_indices(effects: np.ndarray, num_resamples: int = 100, confidence_level: float = 0.95,
+                   seed: int = 0) -> dict[str, np.ndarray]:
+    """Mean absolute (mu*), mean and standard deviation of the elementary effects with a bootstrap interval of mu*."""
+    resamples = np.random.default_rng(seed).integers(0, len(effects), size=(num_resamples, len(effects)))
+    mu_star_resampled = np.mean(np.abs(effects[resamples]), axis=1)
+    tail = 50 * (1 - confidence_level)
+    return {
+        "Mu-Star": np.mean(np.abs(effects), axis=0),
+        "Mu-Star-Lower": np.percentile(mu_star_resampled, tail, axis=0),
+        "Mu-Star-Upper": np.percentile(mu_star_resampled, 100 - tail, axis=0),
+        "Mu": np.mean(effects, axis=0),
+        "Sigma": np.std(effects, axis=0, ddof=1)
+    }
+
+
+class SensitivityAnalysis:
+    """
+    Global sensitivity analysis of the output models with respect to the setpoints within their bounds.
+
+    The "sobol" method estimates first order and total Sobol indices from a :py:class:'SaltelliDesign', the "morris"
+    method the statistics of elementary effects from a :py:class:'MorrisDesign'. The designs are evaluated in chunks
+    through the batched model path of a :py:class:'~adanowo_simulator.sweep.SweepEvaluator', optionally by several
+    worker processes. The mean outputs are analysed and every point in the setpoint bounds is evaluated, also if it
+    violates the bounds of the dependent variables, because the estimators need the complete design. The share of
+    feasible points is logged. The settings are taken from the sensitivity_settings of the config.
+    """
+
+    def __init__(self, config: DictConfig):
+        self._config: DictConfig = config.copy()
+        self._settings: DictConfig = self._config.sensitivity_settings
+        if self._settings.method not in METHODS:
+            raise ValueError(f"Unknown sensitivity method {self._settings.method}. Use one of {METHODS}.")
+        if self._settings.chunk_size < 1 or self._settings.num_workers < 1:
+            raise ValueError("The chunk size and the number of workers must be at least 1.")
+        self._bounds: dict[str, tuple[float, float]] = sweep_bounds(self._config.action_setup,
+                                                                    self._settings.get("setpoints"))
+        seed = int(self._settings.get("seed") or 0)
+        if self._settings.method == "sobol":
+            self._design = SaltelliDesign(self._bounds, int(self._settings.base_samples), seed)
+        else:
+            self._design = MorrisDesign(self._bounds, int(self._settings.num_trajectories),
+                                        int(self._settings.num_levels), seed)
+
+    @property
+    def design(self) -> SaltelliDesign | MorrisDesign:
+        return self._design
+
+    def run(self) -> pd.DataFrame:
+        """Returns one row per output and setpoint with the indices of the method and their confidence intervals."""
+        start_time = time.perf_counter()
+        chunks = list(evaluate_chunks(self._config, self._design, int(self._settings.chunk_size),
+                                      int(self._settings.num_workers), "evaluate_outputs"))
+        outputs = {output_name: np.concatenate([chunk_outputs[output_name] for chunk_outputs, _ in chunks])
+                   for output_name in chunks[0][0]}
+        feasible_share = np.concatenate([feasible for _, feasible in chunks]).mean()
+        logger.info(f"Evaluated {len(self._design)} points ({feasible_share:.1%} feasible) in "
+                    f"{time.perf_counter() - start_time:.1f} s.")
+
+        seed = int(self._settings.get("seed") or 0)
+        rows = []
+        for output_name, values in outputs.items():
+            if self._settings.method == "sobol":
+                indices = sobol_indices(values, self._design.base_samples, len(self._bounds),
+                                        int(self._settings.num_resamples), float(self._settings.confidence_level),
+                                        seed)
+            else:
+                indices = morris_indices(self._design.elementary_effects(values), int(self._settings.num_resamples),
+                                         float(self._settings.confidence_level), seed)
+            for column, setpoint_name in enumerate(self._bounds):
+                rows.append({"Output": output_name, "Setpoint": setpoint_name} |
+                            {name: float(estimates[column]) for name, estimates in indices.items()})
+        return pd.DataFrame(rows)
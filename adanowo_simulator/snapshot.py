@@ -0,0 +1,27 @@
+import pickle
+
+from omegaconf import DictConfig
+
+SNAPSHOT_VERSION = 1
+
+
+def serialize_snapshot(state: dict) -> bytes:
+    """Serializes the snapshot of an environment, which consists of plain Python objects and NumPy arrays."""
+    return pickle.dumps((SNAPSHOT_VERSION, state), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def deserialize_snapshot(snapshot: bytes) -> dict:
+    version, state = pickle.loads(snapshot)
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot version {version} is not supported, expected version {SNAPSHOT_VERSION}.")
+    return state
+
+
+def restore_config_values(config: DictConfig, values: dict) -> None:
+    """Writes snapshotted values back into a config. Only values that differ are written, nested dicts recursively."""
+    for key, value in values.items():
+        current = config[key]
+        if isinstance(value, dict) and isinstance(current, DictConfig):
+            restore_config_values(current, value)
+        elif current != value:
+            config[key] = value
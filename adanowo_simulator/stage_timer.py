@@ -0,0 +1,160 @@
+import math
+import time
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# Logarithmic histogram bins from 1 microsecond to 100 seconds with 10 bins per decade.
+BIN_EDGES = tuple(10.0 ** (exponent / 10) for exponent in range(-60, 21))
+QUANTILES = (0.5, 0.95, 0.99)
+_DISABLED_SPAN = nullcontext()
+
+
+class TimingHistogram:
+    """Histogram of durations in seconds with fixed logarithmic bins. Quantiles are estimated from the bins."""
+
+    def __init__(self):
+        # the first bin holds all durations below the first edge, the last one all durations above the last edge.
+        self._counts: list[int] = [0] * (len(BIN_EDGES) + 1)
+        self._count: int = 0
+        self._total: float = 0.0
+        self._max: float = 0.0
+
+    @property
+    def bin_edges(self) -> tuple[float, ...]:
+        return BIN_EDGES
+
+    @property
+    def counts(self) -> list[int]:
+        return self._counts
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def total(self) -> float:
+        return self._total
+
+    def add(self, duration: float) -> None:
+        self._counts[bisect_left(BIN_EDGES, duration)] += 1
+        self._count += 1
+        self._total += duration
+        if duration > self._max:
+            self._max = duration
+
+    def quantile(self, p: float) -> float:
+        """Geometric centre of the bin that contains the p-quantile, limited by the maximum duration."""
+        if not self._count:
+            return math.nan
+        rank = p * self._count
+        cumulative_count = 0
+        for index, count in enumerate(self._counts):
+            cumulative_count += count
+            if cumulative_count >= rank and count:
+                break
+        if index == 0:
+            return min(BIN_EDGES[0], self._max)
+        if index == len(BIN_EDGES):
+            return self._max
+        return min(math.sqrt(BIN_EDGES[index - 1] * BIN_EDGES[index]), self._max)
+
+    def summary(self) -> dict[str, float]:
+        summary = {
+            "Count": self._count,
+            "Total": self._total,
+            "Mean": self._total / self._count if self._count else math.nan,
+            "Max": self._max if self._count else math.nan
+        }
+        for p in QUANTILES:
+            summary[f"Quantile-{p:g}"] = self.quantile(p)
+        return summary
+
+
+class _Span:
+    __slots__ = ("_timer", "_name", "_start")
+
+    def __init__(self, timer: "StageTimer", name: str):
+        self._timer = timer
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._timer.record(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class StageTimer:
+    """
+    Collects the durations of named stages, e.g. the managers called in a step of the environment.
+
+    Stages are timed with ``with timer.span(name): ...``. The durations of each stage are aggregated in a
+    :py:class:'TimingHistogram' and the most recent one is kept in :py:attr:'last'. A disabled timer returns a shared
+    no-op context manager, so instrumented code pays almost nothing.
+
+    Settings that explain the durations of a stage (e.g. the cores and threads of a model worker) can be attached with
+    :py:meth:'annotate'. They are part of the summary of the stage.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self._enabled: bool = enabled
+        self._histograms: dict[str, TimingHistogram] = dict()
+        self._last: dict[str, float] = dict()
+        self._annotations: dict[str, dict] = dict()
+        self._lock = threading.Lock()  # spans may be recorded by several threads, e.g. of the ThreadedOutputManager.
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, e: bool):
+        self._enabled = e
+
+    @property
+    def histograms(self) -> dict[str, TimingHistogram]:
+        return self._histograms
+
+    @property
+    def last(self) -> dict[str, float]:
+        """Most recent duration of each stage in seconds."""
+        return self._last
+
+    @property
+    def annotations(self) -> dict[str, dict]:
+        """Settings attached to the stages with :py:meth:'annotate'."""
+        return self._annotations
+
+    def annotate(self, name: str, settings: dict) -> None:
+        """Attaches settings to a stage, replacing earlier settings with the same keys. Works when disabled, too."""
+        with self._lock:
+            self._annotations.setdefault(name, dict()).update(settings)
+
+    def span(self, name: str):
+        if not self._enabled:
+            return _DISABLED_SPAN
+        return _Span(self, name)
+
+    def record(self, name: str, duration: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = TimingHistogram()
+            histogram.add(duration)
+            self._last[name] = duration
+
+    def summary(self) -> dict[str, dict]:
+        """Count, total, mean, max and quantiles of the durations in seconds and the annotations per stage."""
+        summary = {name: dict(settings) for name, settings in self._annotations.items()}
+        for name, histogram in self._histograms.items():
+            summary.setdefault(name, dict()).update(histogram.summary())
+        return summary
+
+    def reset(self) -> None:
+        """Discards the recorded durations. Annotations are kept, they describe the setup rather than a run."""
+        self._histograms = dict()
+        self._last = dict()
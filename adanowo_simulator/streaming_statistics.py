@@ -0,0 +1,159 @@
+import math
+from bisect import bisect_right, insort
+
+
+class RunningMoments:
+    """Running count, mean, variance, minimum and maximum of a stream of values (Welford's algorithm)."""
+
+    def __init__(self):
+        self._count: int = 0
+        self._mean: float = 0.0
+        self._sum_of_squares: float = 0.0
+        self._min: float = math.inf
+        self._max: float = -math.inf
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self._count else math.nan
+
+    @property
+    def variance(self) -> float:
+        """Sample variance. NaN for less than two values."""
+        return self._sum_of_squares / (self._count - 1) if self._count > 1 else math.nan
+
+    @property
+    def min(self) -> float:
+        return self._min if self._count else math.nan
+
+    @property
+    def max(self) -> float:
+        return self._max if self._count else math.nan
+
+    def update(self, value: float) -> None:
+        self._count += 1
+        delta = value - self._mean
+        self._mean += delta / self._count
+        self._sum_of_squares += delta * (value - self._mean)
+        self._min = min(self._min, value)
+        self._max = max(self._max, value)
+
+
+class P2Quantile:
+    """
+    Streaming estimate of the p-quantile of a stream of values with constant memory (P-square algorithm of Jain and
+    Chlamtac). The estimate is exact for up to five values.
+    """
+
+    def __init__(self, p: float):
+        if not 0.0 < p < 1.0:
+            raise ValueError("The quantile must be between 0 and 1.")
+        self._p: float = p
+        self._heights: list[float] = []
+        self._positions: list[int] = [1, 2, 3, 4, 5]
+        self._desired_positions: list[float] = [1.0, 1.0 + 2.0 * p, 1.0 + 4.0 * p, 3.0 + 2.0 * p, 5.0]
+        self._increments: tuple[float, ...] = (0.0, p / 2.0, p, (1.0 + p) / 2.0, 1.0)
+
+    @property
+    def p(self) -> float:
+        return self._p
+
+    @property
+    def value(self) -> float:
+        heights = self._heights
+        if not heights:
+            return math.nan
+        if len(heights) == 5 and self._positions[4] > 5:
+            return heights[2]
+        # exact quantile with linear interpolation.
+        position = self._p * (len(heights) - 1)
+        lower = math.floor(position)
+        upper = min(lower + 1, len(heights) - 1)
+        return heights[lower] + (position - lower) * (heights[upper] - heights[lower])
+
+    def update(self, value: float) -> None:
+        heights = self._heights
+        positions = self._positions
+        if len(heights) < 5:
+            insort(heights, value)
+            return
+
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = bisect_right(heights, value) - 1
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self._desired_positions[i] += self._increments[i]
+
+        for i in range(1, 4):
+            offset = self._desired_positions[i] - positions[i]
+            if (offset >= 1.0 and positions[i + 1] - positions[i] > 1) or \
+                    (offset <= -1.0 and positions[i - 1] - positions[i] < -1):
+                direction = 1 if offset > 0 else -1
+                height = self._parabolic(i, direction)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self._linear(i, direction)
+                heights[i] = height
+                positions[i] += direction
+
+    def _parabolic(self, i: int, direction: int) -> float:
+        q, n = self._heights, self._positions
+        return q[i] + direction / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + direction) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - direction) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def _linear(self, i: int, direction: int) -> float:
+        q, n = self._heights, self._positions
+        return q[i] + direction * (q[i + direction] - q[i]) / (n[i + direction] - n[i])
+
+
+class VariableStatistics:
+    """
+    Online statistics of one logged variable. Values that are None or NaN (e.g. missing measurements) are skipped.
+
+    For constraint checks (values 1 for met and 0 for violated), the number and rate of violations are summarized
+    instead of moments and quantiles.
+    """
+
+    def __init__(self, quantiles: list[float], is_constraint: bool = False):
+        self._is_constraint: bool = is_constraint
+        self._moments = RunningMoments()
+        self._quantiles: list[P2Quantile] = [] if is_constraint else [P2Quantile(p) for p in quantiles]
+        self._violations: int = 0
+
+    def update(self, value: float | None) -> None:
+        if value is None or value != value:
+            return
+        self._moments.update(value)
+        if self._is_constraint:
+            self._violations += int(not value)
+        for quantile in self._quantiles:
+            quantile.update(value)
+
+    def summary(self) -> dict[str, float]:
+        count = self._moments.count
+        if self._is_constraint:
+            return {
+                "Count": count,
+                "Violations": self._violations,
+                "Violation-Rate": self._violations / count if count else math.nan
+            }
+        summary = {
+            "Count": count,
+            "Mean": self._moments.mean,
+            "Variance": self._moments.variance,
+            "Min": self._moments.min,
+            "Max": self._moments.max
+        }
+        for quantile in self._quantiles:
+            summary[f"Quantile-{quantile.p:g}"] = quantile.value
+        return summary
@@ -0,0 +1,295 @@
+import math
+import time
+import logging
+import pathlib as pl
+
+import numpy as np
+import pandas as pd
+from omegaconf import DictConfig, OmegaConf
+
+from adanowo_simulator.worker_pool import local_evaluation_config, fork_context, initialize_worker, call_in_worker
+
+logger = logging.getLogger(__name__)
+
+DESIGNS = ("full_factorial", "latin_hypercube")
+JITTER_BLOCK_SIZE = 65536  # points per block of latin hypercube jitter, independent of the evaluated chunks
+
+
+def sweep_bounds(action_config: DictConfig, setpoints: list[str] | None = None) -> dict[str, tuple[float, float]]:
+    """Lower and upper bound of the swept setpoints (all setpoints with bounds by default) from an action setup."""
+    if not setpoints:
+        setpoints = list(action_config.setpoint_bounds.keys())
+    bounds = dict()
+    for setpoint_name in setpoints:
+        if setpoint_name not in action_config.initial_setpoints:
+            raise ValueError(f"Unknown setpoint {setpoint_name}.")
+        boundaries = action_config.setpoint_bounds.get(setpoint_name) or dict()
+        lower, upper = boundaries.get("lower"), boundaries.get("upper")
+        if lower is None or upper is None:
+            raise ValueError(f"Setpoint {setpoint_name} needs a lower and an upper bound to be swept.")
+        bounds[setpoint_name] = (float(lower), float(upper))
+    return bounds
+
+
+class FullFactorialDesign:
+    """
+    Grid of 'levels' equidistant values between the bounds of each setpoint ('levels' per setpoint or for all).
+    Points are enumerated in C order, so :py:meth:'points' generates any range of the grid without building it.
+    """
+
+    def __init__(self, bounds: dict[str, tuple[float, float]], levels: int | dict[str, int]):
+        if not isinstance(levels, (dict, DictConfig)):
+            levels = {setpoint_name: levels for setpoint_name in bounds}
+        self._names: list[str] = list(bounds.keys())
+        self._grids: list[np.ndarray] = []
+        for setpoint_name, (lower, upper) in bounds.items():
+            if int(levels[setpoint_name]) < 1:
+                raise ValueError("A full factorial design needs at least 1 level per setpoint.")
+            self._grids.append(np.linspace(lower, upper, int(levels[setpoint_name])))
+        self._shape: tuple[int, ...] = tuple(len(grid) for grid in self._grids)
+
+    def __len__(self) -> int:
+        return math.prod(self._shape)
+
+    def points(self, start: int, stop: int) -> dict[str, np.ndarray]:
+        indices = np.unravel_index(np.arange(start, stop, dtype=np.int64), self._shape)
+        return {setpoint_name: grid[index] for setpoint_name, grid, index in zip(self._names, self._grids, indices)}
+
+
+class LatinHypercubeDesign:
+    """
+    Latin hypercube of 'num_points' points: the range of each setpoint is split into 'num_points' strata, every stratum
+    is used by exactly one point and points lie at a random position within their strata.
+
+    The strata are assigned by one random permutation per setpoint. The positions are sampled in blocks of
+    JITTER_BLOCK_SIZE points with a generator per block, so every range of points is reproducible from the seed, no
+    matter how the sweep is chunked.
+    """
+
+    def __init__(self, bounds: dict[str, tuple[float, float]], num_points: int, seed: int = 0):
+        if num_points < 1:
+            raise ValueError("A latin hypercube needs at least 1 point.")
+        self._bounds: dict[str, tuple[float, float]] = dict(bounds)
+        self._num_points: int = num_points
+        self._seed: int = seed
+        generator = np.random.default_rng(seed)
+        index_type = np.int32 if num_points < np.iinfo(np.int32).max else np.int64
+        self._strata: list[np.ndarray] = [generator.permutation(num_points).astype(index_type) for _ in bounds]
+
+    def __len__(self) -> int:
+        return self._num_points
+
+    def points(self, start: int, stop: int) -> dict[str, np.ndarray]:
+        jitter = np.empty((stop - start, len(self._bounds)))
+        for block in range(start // JITTER_BLOCK_SIZE, -(-stop // JITTER_BLOCK_SIZE)):
+            block_start = block * JITTER_BLOCK_SIZE
+            block_stop = min(block_start + JITTER_BLOCK_SIZE, self._num_points)
+            block_jitter = np.random.default_rng([self._seed, block]).random((block_stop - block_start,
+                                                                              len(self._bounds)))
+            first, last = max(start, block_start), min(stop, block_stop)
+            jitter[first - start:last - start] = block_jitter[first - block_start:last - block_start]
+        points = dict()
+        for column, ((setpoint_name, (lower, upper)), strata) in enumerate(zip(self._bounds.items(), self._strata)):
+            unit = (strata[start:stop] + jitter[:, column]) / self._num_points
+            points[setpoint_name] = lower + unit * (upper - lower)
+        return points
+
+
+Design = FullFactorialDesign | LatinHypercubeDesign
+
+
+def create_design(sweep_settings: DictConfig, action_config: DictConfig) -> Design:
+    bounds = sweep_bounds(action_config, sweep_settings.get("setpoints"))
+    if sweep_settings.design == "full_factorial":
+        levels = sweep_settings.levels
+        return FullFactorialDesign(bounds, OmegaConf.to_container(levels) if isinstance(levels, DictConfig) else levels)
+    if sweep_settings.design == "latin_hypercube":
+        return LatinHypercubeDesign(bounds, int(sweep_settings.num_points), int(sweep_settings.get("seed") or 0))
+    raise ValueError(f"Unknown design {sweep_settings.design}. Use one of {DESIGNS}.")
+
+
+class SweepEvaluator:
+    """
+    Evaluates chunks of design points with the managers of an environment: the dependent variables and bounds of the
+    setpoints are checked at once for the whole chunk, infeasible points are dropped and the remaining points are
+    passed through the output models and the objective as one batch.
+
+    Setpoints that are not swept keep their initial value and the disturbances their initial value, too. The objective
+    value and the output constraints are evaluated for the mean outputs. Any object with a length and a method
+    points(start, stop) that returns the swept setpoints can serve as 'design', by default it is created from the
+    sweep_settings when it is first needed. :py:meth:'evaluate_objective' evaluates explicit points instead.
+    """
+
+    def __init__(self, config: DictConfig, design: Design | None = None):
+        from adanowo_simulator.environment_factory import EnvironmentFactory
+        config = local_evaluation_config(config)
+        self._environment = EnvironmentFactory(config).create_environment()
+        self._environment.reset()
+        self._initial_setpoints: dict[str, float] = OmegaConf.to_container(config.action_setup.initial_setpoints,
+                                                                           resolve=True)
+        self._disturbances: dict[str, float] = self._environment.disturbance_manager.step()
+        self._output_bounds: dict = OmegaConf.to_container(self._environment.objective_manager.config.output_bounds)
+        self._config: DictConfig = config
+        self._design: Design | None = design
+
+    @property
+    def design(self) -> Design:
+        if self._design is None:
+            self._design = create_design(self._config.sweep_settings, self._config.action_setup)
+        return self._design
+
+    def evaluate(self, start: int, stop: int) -> pd.DataFrame:
+        """Columns "Point" (index in the design) and "<category>/<name>" of the feasible points in [start, stop)."""
+        disturbances, setpoints, dependent_variables, feasible = self._points(start, stop)
+        columns = {"Point": np.arange(start, stop, dtype=np.int64)[feasible]}
+        state = dict()
+        for category, variables in (("Disturbances", disturbances), ("Setpoints", setpoints),
+                                    ("Dependent-Variables", dependent_variables)):
+            for name, values in variables.items():
+                state[name] = columns[f"{category}/{name}"] = np.asarray(values)[feasible]
+        if not feasible.any():
+            return pd.DataFrame(columns)
+
+        mean_pred, var_pred = self._environment.output_manager.predict(state)
+        objective_values, output_constraints_met = self._environment.objective_manager.evaluate_samples(
+            state, mean_pred, True, True, self._output_bounds)
+        columns["Performance-Metrics/Objective-Value"] = objective_values
+        columns["Performance-Metrics/Output-Constraints-Met"] = output_constraints_met.astype(np.int8)
+        for output_name in mean_pred:
+            columns[f"Outputs/{output_name}"] = mean_pred[output_name]
+            columns[f"Output-Variances/{output_name}"] = var_pred[output_name]
+        return pd.DataFrame(columns)
+
+    def evaluate_outputs(self, start: int, stop: int) -> tuple[dict[str, np.ndarray], np.ndarray]:
+        """Mean outputs of the points in [start, stop), including infeasible ones, and whether each one is feasible."""
+        disturbances, setpoints, dependent_variables, feasible = self._points(start, stop)
+        mean_pred, _ = self._environment.output_manager.predict(disturbances | setpoints | dependent_variables)
+        return mean_pred, feasible
+
+    def evaluate_objective(self, points: dict[str, np.ndarray], disturbances: dict[str, float] | None = None,
+                           output_bounds: dict | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Objective values of explicit points (arrays of equal length by setpoint name) for the mean outputs, with the
+        penalty wherever a setpoint, dependent variable or output bound is violated as in a step of the environment.
+        Also returns the violation of each point, the sum of the violations of all bounds relative to the magnitude of
+        the bounds, which is zero if all bounds are satisfied. 'disturbances' (partial) and 'output_bounds' replace the
+        initial ones, e.g. to optimize for the current state of a running process.
+        """
+        disturbances, setpoints, dependent_variables, feasible = self._state(points, disturbances)
+        state = disturbances | setpoints | dependent_variables
+        mean_pred, _ = self._environment.output_manager.predict(state)
+        output_bounds = output_bounds if output_bounds is not None else self._output_bounds
+        objective_manager = self._environment.objective_manager
+        objective_values, _ = objective_manager.evaluate_samples(state, mean_pred, True, True, output_bounds)
+        if not feasible.all():
+            penalties, _ = objective_manager.evaluate_samples(state, mean_pred, False, False, output_bounds)
+            objective_values = np.where(feasible, objective_values, penalties)
+        action_config = self._environment.action_manager.config
+        violations = _bound_violations(setpoints, OmegaConf.to_container(action_config.setpoint_bounds)) + \
+            _bound_violations(dependent_variables, OmegaConf.to_container(action_config.dependent_variable_bounds)) + \
+            _bound_violations(mean_pred, output_bounds)
+        return objective_values, violations
+
+    def close(self) -> None:
+        self._environment.close()
+
+    def _points(self, start: int, stop: int) -> tuple[dict[str, np.ndarray], dict[str, np.ndarray],
+                                                      dict[str, np.ndarray], np.ndarray]:
+        return self._state(self.design.points(start, stop))
+
+    def _state(self, swept_setpoints: dict[str, np.ndarray], disturbances: dict[str, float] | None = None) -> \
+            tuple[dict[str, np.ndarray], dict[str, np.ndarray], dict[str, np.ndarray], np.ndarray]:
+        point_count = len(next(iter(swept_setpoints.values())))
+        setpoints = {setpoint_name: np.asarray(swept_setpoints.get(setpoint_name, np.full(point_count, value)),
+                                               dtype=np.float64)
+                     for setpoint_name, value in self._initial_setpoints.items()}
+        disturbances = {name: np.full(point_count, value) for name, value in (self._disturbances |
+                                                                                (disturbances or dict())).items()}
+        dependent_variables, setpoints_okay, dependent_variables_okay = \
+            self._environment.action_manager.evaluate_setpoints(setpoints, disturbances)
+        return disturbances, setpoints, dependent_variables, setpoints_okay & dependent_variables_okay
+
+
+def _bound_violations(variables: dict[str, np.ndarray], bounds: dict) -> np.ndarray:
+    """Sum of the violations of the bounds of the variables relative to the magnitude of the bounds (at least 1)."""
+    violations = np.zeros(len(next(iter(variables.values()))))
+    for name, boundaries in (bounds or dict()).items():
+        lower, upper = (boundaries or dict()).get("lower"), (boundaries or dict()).get("upper")
+        if lower is not None:
+            violations += np.maximum(lower - variables[name], 0) / max(abs(lower), 1.0)
+        if upper is not None:
+            violations += np.maximum(variables[name] - upper, 0) / max(abs(upper), 1.0)
+    return violations
+
+
+def chunk_ranges(point_count: int, chunk_size: int) -> list[tuple[int, int]]:
+    return [(start, min(start + chunk_size, point_count)) for start in range(0, point_count, chunk_size)]
+
+
+def evaluate_chunks(config: DictConfig, design: Design, chunk_size: int, num_workers: int = 1,
+                    method: str = "evaluate"):
+    """
+    Yields the results of a :py:class:'SweepEvaluator' method ("evaluate" or "evaluate_outputs") for the chunks of a
+    design in order. With 'num_workers' > 1, the chunks are evaluated by a pool of worker processes.
+    """
+    chunks = chunk_ranges(len(design), chunk_size)
+    num_workers = min(num_workers, len(chunks))
+    if num_workers <= 1:
+        evaluator = SweepEvaluator(config, design)
+        try:
+            for start, stop in chunks:
+                yield getattr(evaluator, method)(start, stop)
+        finally:
+            evaluator.close()
+        return
+    # forked workers inherit the design.
+    with fork_context().Pool(num_workers, initializer=initialize_worker,
+                             initargs=(SweepEvaluator, config, design)) as pool:
+        yield from pool.imap(call_in_worker, [(method, start, stop) for start, stop in chunks])
+
+
+class SetpointSweep:
+    """
+    Sweeps the setpoints over a full factorial or latin hypercube design within the setpoint bounds of the action
+    setup and writes the feasible points with their dependent variables, outputs and objective values into a columnar
+    file (see :py:class:'~adanowo_simulator.columnar_storage.ColumnarWriter').
+
+    The design is generated and evaluated in chunks of 'chunk_size' points by a :py:class:'SweepEvaluator', so memory
+    does not grow with the size of the sweep. With 'num_workers' > 1, the chunks are evaluated by a pool of worker
+    processes, each with its own copy of the models, and written in design order. The settings are taken from the
+    sweep_settings of the config.
+    """
+
+    def __init__(self, config: DictConfig):
+        self._config: DictConfig = config.copy()
+        self._sweep_settings: DictConfig = self._config.sweep_settings
+        if self._sweep_settings.chunk_size < 1 or self._sweep_settings.num_workers < 1:
+            raise ValueError("The chunk size and the number of workers must be at least 1.")
+        self._design = create_design(self._sweep_settings, self._config.action_setup)
+
+    @property
+    def design(self) -> Design:
+        return self._design
+
+    def chunks(self) -> list[tuple[int, int]]:
+        return chunk_ranges(len(self._design), int(self._sweep_settings.chunk_size))
+
+    def run(self, path: str | pl.Path | None = None) -> dict[str, float]:
+        """Evaluates the whole design and returns the number of points, feasible points and the duration in seconds."""
+        from adanowo_simulator.columnar_storage import ColumnarWriter
+        path = path if path is not None else self._sweep_settings.path
+        start_time = time.perf_counter()
+        writer = ColumnarWriter(path, self._sweep_settings.format, {"config": OmegaConf.to_yaml(self._config)})
+        feasible_point_count = 0
+        try:
+            for frame in evaluate_chunks(self._config, self._design, int(self._sweep_settings.chunk_size),
+                                         int(self._sweep_settings.num_workers)):
+                writer.append(frame)
+                feasible_point_count += len(frame)
+        finally:
+            writer.close()
+        summary = {"Points": len(self._design), "Feasible-Points": feasible_point_count,
+                   "Duration": time.perf_counter() - start_time}
+        logger.info(f"Swept {summary['Points']} points ({feasible_point_count} feasible) in "
+                    f"{summary['Duration']:.1f} s into {writer.path}.")
+        return summary
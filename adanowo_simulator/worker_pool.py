@@ -0,0 +1,40 @@
+import multiprocessing
+from typing import Callable
+
+from omegaconf import DictConfig
+
+# object of a worker process that the tasks of a pool are called on, e.g. the evaluator of a sweep.
+_worker_object = None
+
+
+def local_evaluation_config(config: DictConfig) -> DictConfig:
+    """
+    Copy of a config for an environment that evaluates batches of states in its own process without tracking, e.g.
+    for sweeps, optimization or datasets. Processes that evaluate together use one such environment each.
+    """
+    config = config.copy()
+    config.tracking_enabled = False
+    config.physical_execution = False
+    config.parallel_execution = False
+    if "threaded_execution" in config:
+        config.threaded_execution = False
+    return config
+
+
+def fork_context() -> multiprocessing.context.BaseContext:
+    """Forking context if the platform supports it, so workers inherit the imported backends, the default otherwise."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def initialize_worker(factory: Callable, *arguments) -> None:
+    """Initializer of a pool, creates the object of the worker process with factory(*arguments)."""
+    global _worker_object
+    _worker_object = factory(*arguments)
+
+
+def call_in_worker(task: tuple):
+    """Calls a method of the object of the worker process, the task is the name of the method and its arguments."""
+    method, *arguments = task
+    return getattr(_worker_object, method)(*arguments)
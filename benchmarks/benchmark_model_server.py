@@ -0,0 +1,89 @@
+"""
+Compares environments that load their own models with environments that share one model server.
+
+Starts several environment processes that step concurrently and reports the total throughput, the memory of all
+processes (PSS from /proc/<pid>/smaps_rollup, so it only runs on Linux) and the mean batch size of the server.
+
+Usage: python benchmarks/benchmark_model_server.py [--environments 8] [--steps 50]
+"""
+import os
+import time
+import logging
+import argparse
+import tempfile
+import multiprocessing
+
+from hydra import initialize, compose
+from omegaconf import OmegaConf
+
+from adanowo_simulator.environment_factory import EnvironmentFactory
+from adanowo_simulator.model_server import ModelServer, ModelServerClient
+from benchmark_worker_memory import memory_of_process
+
+
+def run_environment(config, steps: int, ready_queue, start_event, done_queue, stop_event) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    actions = OmegaConf.to_container(config.action_setup.initial_setpoints, resolve=True)
+    environment = EnvironmentFactory(config).create_environment()
+    environment.reset()
+    ready_queue.put(os.getpid())
+    start_event.wait()
+    for _ in range(steps):
+        environment.step(actions)
+    done_queue.put((os.getpid(), memory_of_process(os.getpid())["PSS"]))
+    stop_event.wait()  # keep the memory allocated until all environments are measured.
+    environment.close()
+
+
+def run(config, num_environments: int, steps: int, server: ModelServer | None = None) -> None:
+    start_event, stop_event = multiprocessing.Event(), multiprocessing.Event()
+    ready_queue, done_queue = multiprocessing.Queue(), multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=run_environment, args=(config, steps, ready_queue, start_event,
+                                                                       done_queue, stop_event))
+                 for _ in range(num_environments)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready_queue.get()  # all environments have been reset.
+    start = time.perf_counter()
+    start_event.set()
+    memory = [done_queue.get()[1] for _ in processes]
+    duration = time.perf_counter() - start
+    if server is not None:
+        memory.append(memory_of_process(server.pid)["PSS"])
+        client = ModelServerClient(server.address)
+        print(f"  mean batch size: {client.statistics()['mean_batch_size']:.2f}")
+        client.close()
+    stop_event.set()
+    for process in processes:
+        process.join()
+    print(f"  throughput: {num_environments * steps / duration:.1f} steps per s in total")
+    print(f"  memory (PSS): {sum(memory):.0f} MiB in total")
+
+
+def main(num_environments: int, steps: int) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        address = f"{directory}/server.sock"
+        with initialize(version_base=None, config_path="../config"):
+            config = compose(config_name="main", overrides=["tracking_enabled=false", "parallel_execution=false",
+                                                             f"output_setup.model_server.address={address}"])
+        config.action_setup.actions_are_relative = False
+
+        print(f"{num_environments} environments, each loading its own models:")
+        run(config, num_environments, steps)
+
+        config.output_setup.model_server.enabled = True
+        settings = config.output_setup.model_server
+        with ModelServer(address, config.output_setup.path_to_output_models, settings.max_batch_size,
+                         settings.max_latency) as server:
+            print(f"{num_environments} environments sharing one model server:")
+            run(config, num_environments, steps, server)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--environments", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=50)
+    args = parser.parse_args()
+    main(args.environments, args.steps)
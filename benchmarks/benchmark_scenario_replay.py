@@ -0,0 +1,90 @@
+"""
+Measures replays of recorded scenarios with the StreamingScenarioSource.
+
+Writes a recording with one row per step and two disturbance trajectories, then replays it and reports the startup
+time (creating the source), the replay time per step and the peak of the memory allocated during the replay. For
+comparison, the same numbers are reported for reading the whole file with pandas up front.
+
+Usage: python benchmarks/benchmark_scenario_replay.py [--steps 1000000] [--format parquet] [--chunk-size 10000]
+"""
+import time
+import argparse
+import tempfile
+import tracemalloc
+import pathlib as pl
+
+import numpy as np
+import pandas as pd
+
+from adanowo_simulator.scenario_source import StreamingScenarioSource
+
+SUFFIXES = {"csv": ".csv", "parquet": ".parquet", "hdf5": ".h5"}
+TARGETS = {"ProductWidth": "disturbances/ProductWidth", "CalenderTemperature": "disturbances/CalenderTemperature"}
+
+
+def write_recording(path: pl.Path, steps: int) -> None:
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({"Step": np.arange(1, steps + 1),
+                          "ProductWidth": 2.0 + rng.normal(0.0, 0.01, steps).cumsum(),
+                          "CalenderTemperature": 150.0 + rng.normal(0.0, 0.1, steps).cumsum()})
+    if path.suffix == ".csv":
+        frame.to_csv(path, index=False)
+    elif path.suffix == ".parquet":
+        frame.to_parquet(path)
+    else:
+        frame.to_hdf(path, key="table", format="table")
+
+
+def replay_streamed(path: pl.Path, steps: int, chunk_size: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    source = StreamingScenarioSource(path, TARGETS, chunk_size=chunk_size)
+    startup = time.perf_counter() - start
+    start = time.perf_counter()
+    for step_index in range(1, steps + 1):
+        source.due(step_index)
+    replay = time.perf_counter() - start
+    source.close()
+    return startup, replay
+
+
+def replay_eager(path: pl.Path, steps: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    if path.suffix == ".csv":
+        frame = pd.read_csv(path)
+    elif path.suffix == ".parquet":
+        frame = pd.read_parquet(path)
+    else:
+        frame = pd.read_hdf(path, "table")
+    startup = time.perf_counter() - start
+    start = time.perf_counter()
+    values = frame[list(TARGETS)].to_numpy()
+    for step_index in range(steps):
+        values[step_index]
+    replay = time.perf_counter() - start
+    return startup, replay
+
+
+def main(steps: int, file_format: str, chunk_size: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = pl.Path(directory) / f"recording{SUFFIXES[file_format]}"
+        write_recording(path, steps)
+        print(f"{steps} steps, {file_format} file of {path.stat().st_size / 2 ** 20:.1f} MiB")
+        for name, replay in (("streamed", lambda: replay_streamed(path, steps, chunk_size)),
+                             ("eager", lambda: replay_eager(path, steps))):
+            startup, duration = replay()
+            # tracing slows down allocations, so the memory is measured in a second replay.
+            tracemalloc.start()
+            replay()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{name:<10} startup {startup * 1e3:9.1f} ms   replay {duration / steps * 1e6:7.2f} us per step   "
+                  f"peak allocated memory {peak / 2 ** 20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=1000000)
+    parser.add_argument("--format", choices=list(SUFFIXES), default="parquet", dest="file_format")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+    main(args.steps, args.file_format, args.chunk_size)
@@ -0,0 +1,104 @@
+"""
+Measures the overhead of the experiment trackers per environment step.
+
+The legacy variant logs every variable with its own call, like WandBTracker did before batching.
+WandB runs in offline mode, so no network service is needed.
+
+Usage: python benchmarks/benchmark_tracker_overhead.py [--steps 1000]
+"""
+import os
+import argparse
+import tempfile
+import time
+
+from hydra import initialize, compose
+from omegaconf import OmegaConf
+
+from adanowo_simulator.environment import compile_log_variables
+from adanowo_simulator.experiment_tracker import WandBTracker, EmptyTracker, AsynchronousTracker, ColumnarTracker
+
+os.environ["WANDB_SILENT"] = "true"
+LOG_INTERVALS = (1, 10, 100)
+
+
+def example_log_variables(config) -> dict[str, dict[str, float]]:
+    def bound_checks(bounds) -> dict[str, bool]:
+        return {f"{name}.{boundary_type}": True for name, boundaries in bounds.items() for boundary_type in boundaries}
+
+    setpoints = OmegaConf.to_container(config.action_setup.initial_setpoints, resolve=True)
+    return compile_log_variables(
+        1000.0,
+        bound_checks(config.action_setup.setpoint_bounds),
+        bound_checks(config.action_setup.dependent_variable_bounds),
+        bound_checks(config.objective_setup.output_bounds),
+        setpoints,
+        {name: 1.0 for name in config.env_setup.used_outputs},
+        setpoints,
+        {name: 1.0 for name in config.env_setup.used_dependent_variable_setpoints},
+        OmegaConf.to_container(config.disturbance_setup.disturbances, resolve=True)
+    )
+
+
+def legacy_step(tracker: WandBTracker, log_variables: dict[str, dict[str, float]], step_index: int) -> None:
+    for category, variables in log_variables.items():
+        for name, value in variables.items():
+            tracker._run.log({f"{category}/{name}": value}, step_index)
+
+
+def time_steps(step_function, log_variables: dict[str, dict[str, float]], steps: int) -> float:
+    start = time.perf_counter()
+    for step_index in range(1, steps + 1):
+        step_function(log_variables, step_index)
+    return (time.perf_counter() - start) / steps
+
+
+def main(steps: int) -> None:
+    with initialize(version_base=None, config_path="../config"):
+        config = compose(config_name="main")
+    log_variables = example_log_variables(config)
+    variable_count = sum(len(variables) for variables in log_variables.values())
+    print(f"{variable_count} variables per step, {steps} steps.")
+
+    with tempfile.TemporaryDirectory() as wandb_dir:
+        wandb_settings = OmegaConf.create({"project": "adanowo-simulator-benchmark", "mode": "offline",
+                                           "dir": wandb_dir})
+        results = dict()
+
+        tracker = EmptyTracker(OmegaConf.create(), OmegaConf.create())
+        tracker.reset(log_variables)
+        results["EmptyTracker"] = time_steps(tracker.step, log_variables, steps)
+
+        tracker = WandBTracker(wandb_settings, config)
+        tracker.reset(log_variables)
+        results["WandBTracker (one call per variable)"] = time_steps(
+            lambda variables, index: legacy_step(tracker, variables, index), log_variables, steps)
+        tracker.close()
+
+        for log_interval in LOG_INTERVALS:
+            tracker = WandBTracker(wandb_settings, config, log_interval)
+            tracker.reset(log_variables)
+            results[f"WandBTracker (log_interval={log_interval})"] = time_steps(tracker.step, log_variables, steps)
+            tracker.close()
+
+        for file_format, suffix in (("hdf5", "h5"), ("parquet", "parquet")):
+            columnar_settings = OmegaConf.create({"path": f"{wandb_dir}/log.{suffix}", "format": file_format,
+                                                  "chunk_size": 1024})
+            tracker = ColumnarTracker(columnar_settings, config, config.env_setup)
+            tracker.reset(log_variables)
+            results[f"ColumnarTracker ({file_format})"] = time_steps(tracker.step, log_variables, steps)
+            tracker.close()
+
+        tracker = AsynchronousTracker(WandBTracker(wandb_settings, config), queue_size=steps)
+        tracker.reset(log_variables)
+        results["AsynchronousTracker(WandBTracker)"] = time_steps(tracker.step, log_variables, steps)
+        tracker.close()
+
+    for name, seconds_per_step in results.items():
+        print(f"{name:<45} {seconds_per_step * 1e6:10.1f} us per step")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.steps)
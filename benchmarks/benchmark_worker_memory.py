@@ -0,0 +1,67 @@
+"""
+Measures the memory of the model worker processes of the ParallelOutputManager.
+
+Compares worker_start "load" (every worker loads its own model) with "preload" (models are loaded once into shared
+memory and the workers are forked). Several environments are created to show the sharing between environments.
+Reports RSS, PSS (shared pages divided among the sharing processes) and USS (private pages) per worker from
+/proc/<pid>/smaps_rollup, so it only runs on Linux.
+
+Usage: python benchmarks/benchmark_worker_memory.py [--environments 2]
+"""
+import argparse
+import logging
+
+import numpy as np
+from hydra import initialize, compose
+from omegaconf import OmegaConf
+
+from adanowo_simulator.environment_factory import EnvironmentFactory
+
+WORKER_START_MODES = ("load", "preload")
+
+
+def memory_of_process(pid: int) -> dict[str, float]:
+    """RSS, PSS and USS of a process in MiB."""
+    values = dict()
+    with open(f"/proc/{pid}/smaps_rollup", "r") as stream:
+        for line in stream:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {"RSS": values["Rss"], "PSS": values["Pss"],
+            "USS": values["Private_Clean"] + values["Private_Dirty"]}
+
+
+def main(num_environments: int) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    for worker_start in WORKER_START_MODES:
+        with initialize(version_base=None, config_path="../config"):
+            config = compose(config_name="main", overrides=["tracking_enabled=false", "parallel_execution=true",
+                                                             f"output_setup.worker_start={worker_start}"])
+        config.action_setup.actions_are_relative = False
+        actions = OmegaConf.to_container(config.action_setup.initial_setpoints, resolve=True)
+
+        environments = [EnvironmentFactory(config).create_environment() for _ in range(num_environments)]
+        try:
+            memory = []
+            for environment in environments:
+                environment.reset()
+                environment.step(actions)
+            for environment in environments:
+                memory += [memory_of_process(pid) for pid in environment.output_manager.worker_pids.values()]
+        finally:
+            for environment in environments:
+                environment.close()
+
+        print(f"worker_start={worker_start}: {len(memory)} workers of {num_environments} environments")
+        for measure in ("RSS", "PSS", "USS"):
+            values = np.array([worker_memory[measure] for worker_memory in memory])
+            print(f"  {measure}: {values.mean():8.1f} MiB per worker (max {values.max():8.1f}), "
+                  f"{values.sum():8.1f} MiB in total")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--environments", type=int, default=2)
+    args = parser.parse_args()
+    main(args.environments)
@@ -0,0 +1,243 @@
+"""
+Benchmark suite for simulation throughput, latency and startup.
+
+Benchmarks:
+* import - time to import adanowo_simulator.environment_factory in a fresh interpreter
+* model_load - load time of every bundled output model
+* evaluation - single vs batched evaluation of every bundled output model
+* reset - cost of Environment.reset() with the sequential, threaded and parallel output manager
+* step - steps per second and step latency of the sequential, threaded and parallel output manager
+* tracker - overhead of the local experiment trackers per step
+
+All benchmarks run offline on the CPU with the bundled models and without WandB. The results are written as JSON
+together with the commit and the machine they were measured on. Pass the JSON file of an earlier run with --compare to
+print the relative change of every result.
+
+Usage: python benchmarks/run_benchmarks.py [--only step reset] [--steps 100] [--repeats 5]
+                                           [--output benchmark_results.json] [--compare old_results.json]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import pathlib as pl
+from datetime import datetime, timezone
+
+import numpy as np
+from hydra import initialize, compose
+from omegaconf import OmegaConf
+
+from adanowo_simulator.environment_factory import EnvironmentFactory
+from adanowo_simulator.experiment_tracker import EmptyTracker, ColumnarTracker, AsynchronousTracker, \
+    AggregatingTracker
+from adanowo_simulator.output_manager import model_loader, get_path_to_output_models
+from benchmark_tracker_overhead import example_log_variables, time_steps
+
+REPOSITORY_PATH = pl.Path(__file__).resolve().parent.parent
+BATCH_SIZE = 64
+OUTPUT_MANAGERS = ("sequential", "threaded", "parallel")
+REGRESSION_THRESHOLD = 0.1  # relative change that is flagged when comparing results
+
+
+class Results:
+    """Collects named results with their unit and whether higher values are better."""
+
+    def __init__(self):
+        self.values: dict[str, dict] = dict()
+
+    def add(self, name: str, value: float, unit: str, higher_is_better: bool = False) -> None:
+        self.values[name] = {"value": float(value), "unit": unit, "higher_is_better": higher_is_better}
+        print(f"{name:<55} {value:12.4f} {unit}")
+
+
+def load_config(output_manager: str = "sequential"):
+    with initialize(version_base=None, config_path="../config"):
+        config = compose(config_name="main", overrides=["tracking_enabled=false",
+                                                         f"parallel_execution={output_manager == 'parallel'}",
+                                                         f"threaded_execution={output_manager == 'threaded'}"])
+    config.action_setup.actions_are_relative = False
+    return config
+
+
+def benchmark_import(results: Results, repeats: int, **kwargs) -> None:
+    def run(statement: str) -> float:
+        code = f"import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=REPOSITORY_PATH)
+        return float(output.stdout.strip().splitlines()[-1])
+
+    results.add("import/environment_factory", statistics.median(
+        run("import adanowo_simulator.environment_factory") for _ in range(repeats)), "s")
+
+
+def benchmark_model_load(results: Results, repeats: int, **kwargs) -> None:
+    config = load_config()
+    path = get_path_to_output_models(config.output_setup.path_to_output_models)
+    for model_name in config.output_setup.output_models.values():
+        durations = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model = model_loader(model_name, path)
+            durations.append(time.perf_counter() - start)
+            model.close()
+        results.add(f"model_load/{model_name}", statistics.median(durations), "s")
+
+
+def benchmark_evaluation(results: Results, repeats: int, **kwargs) -> None:
+    config = load_config()
+    environment = EnvironmentFactory(config).create_environment()
+    _, state, _, _ = environment.reset()
+    environment.close()
+    batch = {name: np.full(BATCH_SIZE, value) for name, value in state.items()}
+
+    path = get_path_to_output_models(config.output_setup.path_to_output_models)
+    for model_name in config.output_setup.output_models.values():
+        model = model_loader(model_name, path)
+        model.predict_y(state, observation_noise_only=True)  # warm up
+        single, batched = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(BATCH_SIZE):
+                model.predict_y(state, observation_noise_only=True)
+            single.append((time.perf_counter() - start) / BATCH_SIZE)
+            start = time.perf_counter()
+            model.predict_y(batch, observation_noise_only=True)
+            batched.append((time.perf_counter() - start) / BATCH_SIZE)
+        model.close()
+        results.add(f"evaluation/{model_name}/single", statistics.median(single) * 1e6, "us per sample")
+        results.add(f"evaluation/{model_name}/batch_{BATCH_SIZE}", statistics.median(batched) * 1e6,
+                    "us per sample")
+
+
+def benchmark_reset(results: Results, repeats: int, **kwargs) -> None:
+    for name in OUTPUT_MANAGERS:
+        environment = EnvironmentFactory(load_config(name)).create_environment()
+        durations = []
+        for _ in range(repeats + 1):
+            start = time.perf_counter()
+            environment.reset()
+            durations.append(time.perf_counter() - start)
+        environment.close()
+        results.add(f"reset/{name}/first", durations[0], "s")
+        results.add(f"reset/{name}/repeated", statistics.median(durations[1:]), "s")
+
+
+def benchmark_step(results: Results, steps: int, **kwargs) -> None:
+    for name in OUTPUT_MANAGERS:
+        config = load_config(name)
+        actions = OmegaConf.to_container(config.action_setup.initial_setpoints, resolve=True)
+        environment = EnvironmentFactory(config).create_environment()
+        environment.reset()
+        environment.step(actions)  # warm up
+        durations = []
+        try:
+            for _ in range(steps):
+                start = time.perf_counter()
+                environment.step(actions)
+                durations.append(time.perf_counter() - start)
+        finally:
+            environment.close()
+        durations = np.array(durations)
+        results.add(f"step/{name}/throughput", len(durations) / durations.sum(), "steps per s", True)
+        results.add(f"step/{name}/latency_p50", np.percentile(durations, 50) * 1e3, "ms")
+        results.add(f"step/{name}/latency_p95", np.percentile(durations, 95) * 1e3, "ms")
+
+
+def benchmark_tracker(results: Results, steps: int, **kwargs) -> None:
+    config = load_config()
+    log_variables = example_log_variables(config)
+    steps = steps * 10  # tracker steps are cheap.
+    with tempfile.TemporaryDirectory() as directory:
+        columnar_settings = OmegaConf.create({"path": f"{directory}/log.h5", "format": "hdf5", "chunk_size": 1024})
+        trackers = {
+            "empty": EmptyTracker(OmegaConf.create(), OmegaConf.create()),
+            "columnar": ColumnarTracker(columnar_settings, config, config.env_setup),
+            "aggregating": AggregatingTracker(EmptyTracker(OmegaConf.create(), OmegaConf.create()),
+                                              config.tracking_settings.summary_interval,
+                                              config.tracking_settings.quantiles,
+                                              config.tracking_settings.aggregated_categories),
+            "asynchronous_columnar": AsynchronousTracker(
+                ColumnarTracker(columnar_settings, config, config.env_setup), queue_size=steps)
+        }
+        for name, tracker in trackers.items():
+            tracker.reset(log_variables)
+            results.add(f"tracker/{name}", time_steps(tracker.step, log_variables, steps) * 1e6, "us per step")
+            tracker.close()
+
+
+BENCHMARKS = {
+    "import": benchmark_import,
+    "model_load": benchmark_model_load,
+    "evaluation": benchmark_evaluation,
+    "reset": benchmark_reset,
+    "step": benchmark_step,
+    "tracker": benchmark_tracker
+}
+
+
+def metadata() -> dict:
+    def git(*args: str) -> str:
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, cwd=REPOSITORY_PATH).stdout.strip()
+        except OSError:
+            return ""
+
+    import torch
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads()
+    }
+
+
+def compare(results: dict[str, dict], reference_path: str) -> None:
+    with open(reference_path, "r") as stream:
+        reference = json.load(stream)
+    print(f"\nComparison with {reference['metadata']['commit'][:10]} ({reference_path}):")
+    for name, result in results.items():
+        if name not in reference["results"]:
+            continue
+        old, new = reference["results"][name]["value"], result["value"]
+        change = (new - old) / old if old else float("nan")
+        regression = -change if result["higher_is_better"] else change
+        flag = "  REGRESSION" if regression > REGRESSION_THRESHOLD else ""
+        print(f"{name:<55} {old:12.4f} -> {new:12.4f} {result['unit']:<14} {change:+8.1%}{flag}")
+
+
+def main(only: list[str], steps: int, repeats: int, output: str, reference_path: str | None) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    results = Results()
+    for name in only:
+        BENCHMARKS[name](results, steps=steps, repeats=repeats)
+
+    report = {"metadata": metadata(), "settings": {"steps": steps, "repeats": repeats, "batch_size": BATCH_SIZE},
+              "results": results.values}
+    output_path = pl.Path(output).resolve()
+    with open(output_path, "w") as stream:
+        json.dump(report, stream, indent=2)
+    print(f"Results have been written to {output_path}.")
+    if reference_path is not None:
+        compare(results.values, reference_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None, dest="reference_path")
+    args = parser.parse_args()
+    main(args.only, args.steps, args.repeats, args.output, args.reference_path)
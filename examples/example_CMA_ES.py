@@ -1,53 +1,36 @@
-from pathlib import Path
+import os
 
-from hydra import initialize, compose
-import cma  # requires https://github.com/CMA-ES/pycma
-import numpy as np
 import hydra
-from omegaconf import DictConfig, OmegaConf
+from omegaconf import DictConfig
 
 from adanowo_simulator.environment_factory import EnvironmentFactory
-from adanowo_simulator.gym_wrapper import GymWrapper
+from adanowo_simulator.optimization import SetpointOptimizer
 
-MAX_ITERATIONS = 100
-initial_std_dev = 0.06  # Adjust based on the variability of actions
+os.environ["WANDB_SILENT"] = "true"
 
 
 @hydra.main(version_base=None, config_path="../config", config_name="main")
 def main(config: DictConfig):
-    # initialise environment
-    factory = EnvironmentFactory(config)
-    environment = factory.create_environment()
-    environment_wrapped = GymWrapper(environment, config.gym_setup, config.action_setup, config.env_setup)
-
-    # define objective function
-    def objective_function(actions: np.array) -> float:
-        _, reward, _, _, _ = environment_wrapped.step(actions)
-        return - float(reward)
-
-    # reset environment
-    initial_setpoints, _ = environment_wrapped.reset()
-
-    # init cma-es
-    initial_mean = initial_setpoints
-
-    es = cma.CMAEvolutionStrategy(initial_mean, initial_std_dev)
-
-    # Loop over a defined number of iterations or until convergence
-    iteration = 0
-    while True:
-        if iteration >= MAX_ITERATIONS or es.stop():
-            print("Optimisation finished.")
-            break
-
-        solutions = es.ask()  # Get a batch of candidate solutions (actions)
-        rewards = [objective_function(action) for action in solutions]  # Evaluate each solution
-        es.tell(solutions, rewards)  # Update the optimizer with results
-        es.disp()
-
-        iteration += 1
-    # Make sure the environment gets closed properly!
-    environment_wrapped.close()
+    # Closed loop: before every step, CMA-ES searches the setpoints for the disturbances and output bounds of the
+    # current production context, see optimization_settings in the config. The populations are evaluated without
+    # stepping the environment, optionally on several worker processes, which are kept for all steps.
+    config.action_setup.actions_are_relative = False
+    config.optimization_settings.max_generations = 30
+    environment = EnvironmentFactory(config).create_environment()
+    optimizer = SetpointOptimizer(config)
+
+    _, state, _, output_bounds = environment.reset()
+    for _ in range(config.num_experiment_steps):
+        disturbances = {name: state[name] for name in config.env_setup.used_disturbances}
+        result = optimizer.run(disturbances, output_bounds,
+                               {name: state[name] for name in config.env_setup.used_setpoints})
+        objective_value, state, _, output_bounds = environment.step(
+            {name: result["Setpoints"].get(name, state[name]) for name in config.env_setup.used_setpoints})
+        print(f"Step {environment.step_index - 1}: objective value {objective_value:.4g} "
+              f"({result['Generations']} generations, {result['Duration']:.1f} s).")
+    # Make sure the environment and the optimizer get closed properly!
+    optimizer.close()
+    environment.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+import os
+import time
+import threading
+
+import numpy as np
+import hydra
+from omegaconf import DictConfig, OmegaConf
+
+from adanowo_simulator.environment_factory import EnvironmentFactory
+from adanowo_simulator.opcua_stand_in import OpcuaStandInServer
+
+os.environ["WANDB_SILENT"] = "true"
+RESTART_AT_STEP = 10  # restart the stand-in once to exercise the reconnect behaviour of the client
+RESTART_DOWNTIME = 1.0  # seconds
+
+
+@hydra.main(version_base=None, config_path="../config", config_name="opcua_stand_in")
+def main(config: DictConfig):
+    config.action_setup.actions_are_relative = False
+    stand_in = OpcuaStandInServer(config.output_setup, config.stand_in_setup, config.action_setup,
+                                  config.disturbance_setup)
+    stand_in.start()
+
+    factory = EnvironmentFactory(config)
+    environment = factory.create_environment()
+    initial_setpoints = OmegaConf.to_container(config.action_setup.initial_setpoints, resolve=True)
+
+    step_durations = []
+    shadow_records = []
+    try:
+        environment.reset()
+        for step_index in range(config.num_experiment_steps):
+            if step_index == RESTART_AT_STEP:
+                threading.Thread(target=stand_in.restart, args=(RESTART_DOWNTIME,)).start()
+            action = {key: value * np.random.uniform(0.98, 1.02) for key, value in initial_setpoints.items()}
+            start = time.perf_counter()
+            environment.step(action)
+            step_durations.append(time.perf_counter() - start)
+        shadow_records = list(environment.output_manager.shadow_records)
+    finally:
+        environment.close()
+        stand_in.close()
+
+    step_durations = np.array(step_durations)
+    operator_delay = config.stand_in_setup.operator.decision_delay
+    print(f"Steps: {len(step_durations)}, operator decisions: {stand_in.decision_count}")
+    print(f"Step latency [s]: mean {step_durations.mean():.3f}, p50 {np.percentile(step_durations, 50):.3f}, "
+          f"p95 {np.percentile(step_durations, 95):.3f}, max {step_durations.max():.3f}")
+    print(f"Communication overhead per step [s]: {step_durations.mean() - operator_delay:.3f}")
+    print(f"Throughput: {len(step_durations) / step_durations.sum():.2f} steps per second")
+    for output_name in config.output_setup.shadow_simulation.output_models or []:
+        errors = [record[f"{output_name}/Predicted-Mean"] - record[f"{output_name}/Measured"]
+                  for record in shadow_records if record[f"{output_name}/Measured"] is not None]
+        if errors:
+            print(f"Shadow simulation {output_name}: mean error {np.mean(errors):.3f}, "
+                  f"mean absolute error {np.mean(np.abs(errors)):.3f} ({len(errors)} records)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import os
+
+import hydra
+from omegaconf import DictConfig
+
+from adanowo_simulator.sensitivity import SensitivityAnalysis
+
+os.environ["WANDB_SILENT"] = "true"
+
+
+@hydra.main(version_base=None, config_path="../config", config_name="main")
+def main(config: DictConfig):
+    # Which setpoints matter for which output? See sensitivity_settings in the config.
+    results = SensitivityAnalysis(config).run()
+    main_index = "Total" if config.sensitivity_settings.method == "sobol" else "Mu-Star"
+    for output_name, indices in results.groupby("Output"):
+        print(f"\n{output_name}")
+        print(indices.drop(columns="Output").sort_values(main_index, ascending=False).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
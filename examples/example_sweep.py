@@ -0,0 +1,23 @@
+import os
+
+import hydra
+from omegaconf import DictConfig
+
+from adanowo_simulator.sweep import SetpointSweep
+
+os.environ["WANDB_SILENT"] = "true"
+
+
+@hydra.main(version_base=None, config_path="../config", config_name="paper")
+def main(config: DictConfig):
+    # Map the response surfaces of the output models over the setpoints of the paper experiments instead of stepping
+    # through them, see sweep_settings in the config.
+    config.sweep_settings.setpoints = ["ProductionSpeedSetpoint", "CardDeliveryWeightPerArea",
+                                       "Cross-lapperLayersCount"]
+    summary = SetpointSweep(config).run()
+    print(f"{summary['Feasible-Points']} of {summary['Points']} points are feasible, "
+          f"results have been written to {config.sweep_settings.path}.")
+
+
+if __name__ == "__main__":
+    main()
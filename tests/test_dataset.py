@@ -0,0 +1,46 @@
+import json
+
+import numpy as np
+import pytest
+from hydra import initialize, compose
+
+from adanowo_simulator.columnar_storage import memory_map_columns
+from adanowo_simulator.dataset import TransitionDatasetGenerator, read_dataset, MANIFEST_FILE
+
+
+@pytest.fixture(scope="function")
+def config():
+    with initialize(version_base=None, config_path="test_config"):
+        config = compose(config_name="main", overrides=[
+            "dataset_settings.num_episodes=3", "dataset_settings.episode_length=20", "dataset_settings.num_shards=2",
+            "dataset_settings.chunk_size=16", "dataset_settings.policy=random_walk"])
+        return config
+
+
+def test_transition_dataset(config, tmp_path):
+    summary = TransitionDatasetGenerator(config).run(tmp_path / "sequential")
+    manifest = json.loads((tmp_path / "sequential" / MANIFEST_FILE).read_text())
+    assert summary["Transitions"] == manifest["transitions"] == 60
+    assert [(shard["first_episode"], shard["episodes"]) for shard in manifest["shards"]] == [(0, 2), (2, 1)]
+
+    dataset = read_dataset(tmp_path / "sequential")
+    assert len(dataset) == 60 and dataset["Episode"].is_monotonic_increasing
+    state_names = [column.split("/", 1)[1] for column in dataset.columns if column.startswith("States/")]
+    for _, episode in dataset.groupby("Episode"):
+        assert list(episode["Step"]) == list(range(1, 21))
+        assert list(episode["Truncated"]) == [0] * 19 + [1]
+        assert np.array_equal(episode[[f"Next-States/{name}" for name in state_names]].to_numpy()[:-1],
+                              episode[[f"States/{name}" for name in state_names]].to_numpy()[1:]), \
+            "The next state of a transition is not the state of the next transition."
+    feasible = dataset["Performance-Metrics/Dependent-Variable-Constraints-Met"] == 1
+    assert np.allclose(dataset.loc[feasible, "Actions/ProductionSpeedSetpoint"],
+                       dataset.loc[feasible, "Next-States/ProductionSpeedSetpoint"])
+    columns = memory_map_columns(tmp_path / "sequential" / manifest["shards"][0]["path"], ["Outputs/AreaWeightLane1"])
+    assert isinstance(columns["Outputs/AreaWeightLane1"], np.memmap)
+    assert np.array_equal(columns["Outputs/AreaWeightLane1"], dataset["Outputs/AreaWeightLane1"][:40])
+
+    # episodes are seeded by their index, so the dataset does not depend on the workers and shards.
+    config.dataset_settings.num_workers = 2
+    config.dataset_settings.num_shards = 3
+    TransitionDatasetGenerator(config).run(tmp_path / "parallel")
+    assert read_dataset(tmp_path / "parallel").equals(dataset), "Parallel dataset differs from sequential dataset."
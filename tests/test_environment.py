@@ -1,4 +1,6 @@
+import logging
 import pytest
+import numpy as np
 
 from hydra import initialize, compose
 from omegaconf import OmegaConf
@@ -6,6 +8,7 @@ from omegaconf import OmegaConf
 from adanowo_simulator.environment_factory import EnvironmentFactory
 from adanowo_simulator.gym_wrapper import GymWrapper
 import adanowo_simulator.transformations as transformations
+from adanowo_simulator.environment import STAGES
 
 UNIT_STEP = 1
 CONFIG_DIR_RELATIVE = "test_config"
@@ -271,6 +274,221 @@ def test_step_parallel_processing(get_env, reference_values, step_values, config
     environment.close()
 
 
+def test_step_parallel_processing_with_preloaded_models(reference_values, step_values, config):
+    config.parallel_execution = True
+    config.output_setup.worker_start = "preload"
+    environment = EnvironmentFactory(config).create_environment()
+    environment.reset()
+    reward, state, outputs, _ = environment.step(step_values["unit_step"])
+    environment.close()
+
+    for key, value in reference_values["reference_setpoints"].items():
+        assert pytest.approx(value + UNIT_STEP) == state[key], f"Key '{key}' has wrong value after unit step."
+    assert set(outputs.keys()) == set(config.output_setup.output_models.keys())
+
+
+def test_step_threaded_processing(reference_values, step_values, config):
+    config.threaded_execution = True
+    config.profiling_settings.enabled = True
+    environment = EnvironmentFactory(config).create_environment()
+    environment.reset()
+    reward, state, outputs, _ = environment.step(step_values["unit_step"])
+    environment.close()
+
+    for key, value in reference_values["reference_setpoints"].items():
+        assert pytest.approx(value + UNIT_STEP) == state[key], f"Key '{key}' has wrong value after unit step."
+    assert set(outputs.keys()) == set(config.output_setup.output_models.keys())
+    summary = environment.stage_timer.summary()
+    for output_name in config.output_setup.output_models:
+        assert summary[f"Outputs/{output_name}"]["Count"] == 2, f"Model of '{output_name}' has not been timed."
+
+
+def test_parallel_worker_resources(config, step_values):
+    config.parallel_execution = True
+    config.profiling_settings.enabled = True
+    config.output_setup.worker_resources.torch_threads = 1
+    config.output_setup.worker_resources.cpus = [0]
+    config.output_setup.worker_resources.cpus_per_worker = 1
+    environment = EnvironmentFactory(config).create_environment()
+    environment.reset()
+    environment.step(step_values["unit_step"])
+    environment.close()
+
+    summary = environment.stage_timer.summary()
+    for output_name in config.output_setup.output_models:
+        worker_timings = summary[f"Outputs/{output_name}/IPC-Wait"]
+        assert worker_timings["CPUs"] == "0", f"Worker of '{output_name}' has not been pinned."
+        assert worker_timings["Torch-Threads"] == 1, f"Torch threads of '{output_name}' have not been limited."
+        assert worker_timings["Count"] == 2
+
+
+def test_snapshot_and_restore(get_env, step_values, config):
+    def run(environment, steps):
+        trajectory = []
+        for _ in range(steps):
+            reward, state, outputs, quality_bounds = environment.step(step_values["unit_step"])
+            trajectory.append((reward, state, outputs, OmegaConf.to_container(quality_bounds)))
+        return trajectory
+
+    run(get_env, 3)
+    snapshot = get_env.snapshot()
+    assert isinstance(snapshot, bytes)
+    # crosses the deterministic scenario changes at step 10 and several random ones.
+    first_branch = run(get_env, 12)
+    get_env.restore(snapshot)
+    assert get_env.step_index == 4
+    second_branch = run(get_env, 12)
+    assert first_branch == second_branch, "Restored environment does not reproduce the trajectory."
+
+    # the scenarios are compiled again after a reset and in another environment.
+    get_env.reset()
+    get_env.restore(snapshot)
+    assert run(get_env, 12) == first_branch, "Environment restored after a reset does not reproduce the trajectory."
+    other_environment = EnvironmentFactory(config).create_environment()
+    other_environment.reset()
+    other_environment.restore(snapshot)
+    other_branch = run(other_environment, 12)
+    other_environment.close()
+    assert other_branch == first_branch, "Other environment does not reproduce the trajectory."
+
+
+def test_rollout(get_env, step_values):
+    snapshot = get_env.snapshot()
+    # crosses the deterministic scenario changes at step 10 and several random ones.
+    action_sequence = [step_values["unit_step"]] * 12
+    rollout = get_env.rollout(action_sequence, num_samples=3)
+    assert rollout["Objective-Value"].shape == (3, 12)
+    assert rollout["Output-Constraints-Met"].shape == (3, 12)
+    assert all(samples.shape == (3, 12) for samples in rollout["Outputs"].values())
+    assert get_env.step_index == 1, "Rollout has changed the environment."
+    assert np.array_equal(get_env.rollout(action_sequence, num_samples=3)["Outputs"]["AreaWeightLane1"],
+                          rollout["Outputs"]["AreaWeightLane1"]), "Rollouts from the same state use different noise."
+
+    for t, actions in enumerate(action_sequence):
+        # the objective of a sample equals the one of a step with the same outputs and the bounds of this step.
+        rollout_state = {name: float(values[t]) for name, values in rollout["States"].items()}
+        outputs = {output_name: float(samples[0, t]) for output_name, samples in rollout["Outputs"].items()}
+        okay = {"all": bool(rollout["Setpoint-Constraints-Met"][t] and
+                            rollout["Dependent-Variable-Constraints-Met"][t])}
+        objective_value, output_constraints_met = get_env.objective_manager.step(rollout_state, outputs, okay, okay)
+        assert rollout["Objective-Value"][0, t] == pytest.approx(objective_value)
+        assert rollout["Output-Constraints-Met"][0, t] == all(output_constraints_met.values())
+
+        get_env.step(actions)
+        log_variables = get_env.log_vars
+        state = log_variables["Disturbances"] | log_variables["Setpoints"] | log_variables["Dependent-Variables"]
+        assert rollout_state == pytest.approx(state)
+        assert rollout["Setpoint-Constraints-Met"][t] == \
+            log_variables["Performance-Metrics"]["Setpoint-Constraints-Met"]
+
+    get_env.restore(snapshot)
+    rollout = get_env.rollout({name: [value] * 2 for name, value in step_values["zero_step"].items()})
+    assert rollout["Objective-Value"].shape == (1, 2)
+    with pytest.raises(ValueError, match="used setpoints"):
+        get_env.rollout([{}])
+
+
+def test_evaluate_gradient(get_env, reference_values):
+    snapshot = get_env.snapshot()
+    gradient = get_env.evaluate_gradient()
+    assert get_env.snapshot() == snapshot, "Evaluating the gradient has changed the environment."
+
+    # the values equal the ones of the mean outputs.
+    setpoints = reference_values["reference_setpoints"]
+    disturbances = get_env.disturbance_manager.step()
+    dependent_variables, _, _ = get_env.action_manager.evaluate_setpoints(
+        {name: np.array([value]) for name, value in setpoints.items()}, disturbances)
+    state = disturbances | setpoints | {name: float(values[0]) for name, values in dependent_variables.items()}
+    means, _ = get_env.output_manager.predict({name: np.array([value]) for name, value in state.items()})
+    outputs = {output_name: float(mean[0]) for output_name, mean in means.items()}
+    assert gradient["Outputs"] == pytest.approx(outputs, rel=1e-5)
+    assert all(margin >= 0 for margin in gradient["Output-Constraint-Margins"].values())
+    objective_value, _ = get_env.objective_manager.step(state, outputs, dict(), dict())
+    assert gradient["Objective-Value"] == pytest.approx(objective_value, rel=1e-5)
+    upper = get_env.action_manager.config.dependent_variable_bounds.MassThroughput.upper
+    assert gradient["Dependent-Variable-Constraint-Margins"]["MassThroughput.upper"] == \
+        pytest.approx(upper - state["MassThroughput"])
+    # the mass throughput is proportional to the production speed.
+    assert gradient["Constraint-Gradients"]["MassThroughput.upper"]["ProductionSpeedSetpoint"] == \
+        pytest.approx(-state["MassThroughput"] / setpoints["ProductionSpeedSetpoint"])
+
+    # central differences agree with the gradient, the GPs are evaluated in single precision.
+    for setpoint_name in ["ProductionSpeedSetpoint", "Needleloom1DraftRatio"]:
+        step = 0.03 * setpoints[setpoint_name]
+        difference = get_env.evaluate_gradient({setpoint_name: setpoints[setpoint_name] + step})["Objective-Value"] - \
+            get_env.evaluate_gradient({setpoint_name: setpoints[setpoint_name] - step})["Objective-Value"]
+        assert gradient["Objective-Gradient"][setpoint_name] == pytest.approx(difference / (2 * step), rel=0.02)
+    assert gradient["Objective-Gradient"]["Cross-lapperLayersCount"] == 0.0, "The layer count is rounded."
+    with pytest.raises(ValueError, match="Unknown setpoints"):
+        get_env.evaluate_gradient({"Missing": 1.0})
+
+
+def test_evaluate_gradient_unsupported(config, step_values):
+    config.parallel_execution = True
+    environment = EnvironmentFactory(config).create_environment()
+    environment.reset()
+    with pytest.raises(NotImplementedError):
+        environment.evaluate_gradient()
+    # the environment is still usable.
+    reward, _, _, _ = environment.step(step_values["unit_step"])
+    environment.close()
+    assert np.isfinite(reward)
+
+
+@pytest.mark.parametrize("parallel_execution", [False, True])
+def test_prefetched_model_swap(config, step_values, parallel_execution, caplog):
+    config.parallel_execution = parallel_execution
+    config.profiling_settings.enabled = True
+    config.scenario_setup.output_models = {"TensileStrengthMD": [[3, "tensileStrengthCDModel"]]}
+    environment = EnvironmentFactory(config).create_environment()
+    with caplog.at_level(logging.INFO, logger="adanowo_simulator.output_manager"):
+        environment.reset()
+        assert "Prefetching model tensileStrengthCDModel for output TensileStrengthMD." in caplog.messages, \
+            "Scheduled model is not prefetched."
+        for _ in range(2):
+            environment.step(step_values["zero_step"])
+        assert "Outputs/TensileStrengthMD/Swap" not in environment.stage_timer.summary(), "Model is swapped too early."
+        environment.step(step_values["zero_step"])
+    assert environment.output_manager.config.output_models["TensileStrengthMD"] == "tensileStrengthCDModel"
+    assert "Swapped in prefetched model tensileStrengthCDModel for output TensileStrengthMD." in caplog.messages, \
+        "Prefetched model is not used for the swap."
+    assert environment.stage_timer.summary()["Outputs/TensileStrengthMD/Swap"]["Count"] == 1
+    environment.close()
+
+
+@pytest.mark.parametrize("parallel_execution", [False, True])
+def test_rollout_across_model_swap(config, step_values, parallel_execution, caplog):
+    config.parallel_execution = parallel_execution
+    config.profiling_settings.enabled = True
+    config.scenario_setup.output_models = {"AreaWeightLane1": [[10, "areaWeightLane2Model"]]}
+    environment = EnvironmentFactory(config).create_environment()
+    with caplog.at_level(logging.INFO, logger="adanowo_simulator.output_manager"):
+        environment.reset()
+        rollout = environment.rollout([step_values["zero_step"]] * 30)
+        assert rollout["Outputs"]["AreaWeightLane1"].shape == (1, 30)
+        assert environment.output_manager.config.output_models["AreaWeightLane1"] == "areaWeightLane1Model"
+        # the rollout neither swaps the allocated model nor uses up its prefetch.
+        environment.step(step_values["zero_step"])
+        assert "Outputs/AreaWeightLane1/Swap" not in environment.stage_timer.summary(), \
+            "Rollout has changed the allocated model."
+        for _ in range(10):
+            environment.step(step_values["zero_step"])
+    assert environment.stage_timer.summary()["Outputs/AreaWeightLane1/Swap"]["Count"] == 1
+    assert caplog.messages.count("Prefetching model areaWeightLane2Model for output AreaWeightLane1.") == 1
+    assert "Swapped in prefetched model areaWeightLane2Model for output AreaWeightLane1." in caplog.messages, \
+        "Prefetched model is not used for the swap after the rollout."
+    environment.close()
+
+
+@pytest.mark.parametrize("parallel_execution", [False, True])
+def test_model_load_failure(config, parallel_execution):
+    config.parallel_execution = parallel_execution
+    config.output_setup.output_models.TensileStrengthMD = "missingModel"
+    environment = EnvironmentFactory(config).create_environment()
+    with pytest.raises(RuntimeError, match="missingModel for output TensileStrengthMD"):
+        environment.reset()
+
+
 # Test set 6: Test correctness of gym wrapper with action scaling
 
 def test_gym_wrapper_action_transformation(get_env, reference_values, step_values, config):
@@ -321,3 +539,26 @@ def test_gym_wrapper_state_transformation(get_env, reference_values, step_values
         assert pytest.approx(1, abs=0.01) == observations[index], (f"Observation number '{index}' has wrong value"
                                                                    f" after far away step using gymwrapper")
     gym_wrapper.close()
+
+
+def test_stage_timings(config, step_values):
+    config.profiling_settings.enabled = True
+    factory = EnvironmentFactory(config)
+    environment = factory.create_environment()
+    environment.reset()
+    num_steps = 3
+    for _ in range(num_steps):
+        environment.step(step_values["zero_step"])
+    environment.close()
+
+    summary = environment.stage_timer.summary()
+    for stage in STAGES + ("Step",):
+        assert summary[stage]["Count"] == num_steps, f"Stage '{stage}' has not been timed in every step."
+        assert summary[f"Reset/{stage}" if stage != "Step" else "Reset"]["Count"] == 1
+    for output_name in config.output_setup.output_models:
+        assert f"Outputs/{output_name}" in summary or f"Outputs/{output_name}/IPC-Wait" in summary, \
+            f"Model of output '{output_name}' has not been timed."
+    step_summary = summary["Step"]
+    assert 0 < step_summary["Mean"] <= step_summary["Max"]
+    assert step_summary["Quantile-0.5"] <= step_summary["Max"]
+    assert sum(summary[stage]["Total"] for stage in STAGES) <= step_summary["Total"]
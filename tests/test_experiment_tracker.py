@@ -0,0 +1,209 @@
+import math
+import pathlib as pl
+import threading
+
+import pytest
+import wandb
+
+from hydra import initialize, compose
+from omegaconf import OmegaConf
+
+from adanowo_simulator.experiment_tracker import WandBTracker, EmptyTracker, AsynchronousTracker, ColumnarTracker, \
+    AggregatingTracker
+from adanowo_simulator.columnar_storage import read_columnar
+from adanowo_simulator.environment import Environment
+from adanowo_simulator.environment_factory import EnvironmentFactory
+
+ENV_CONFIG_PATH = pl.Path(__file__).parent / "test_config" / "env_setup" / "test.yaml"
+
+LOG_VARIABLES = {
+    "Performance-Metrics": {"Objective-Value": 1000.0, "Output-Constraints-Met": 1},
+    "Setpoints": {"ProductionSpeedSetpoint": 13.26, "Cross-lapperLayersCount": 3.0},
+    "Outputs": {"TensileStrengthMD": 300.0}
+}
+
+
+class RecordingRun:
+    def __init__(self):
+        self.logged = []
+        self.finished = False
+
+    def log(self, data, step=None):
+        self.logged.append((data, step))
+
+    def finish(self):
+        self.finished = True
+
+
+class GatedTracker(EmptyTracker):
+    """Records the tracked steps. Each step waits until the gate is opened."""
+
+    def __init__(self):
+        super().__init__(OmegaConf.create(), OmegaConf.create())
+        self.steps = []
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+        self.fail = False
+
+    @property
+    def consumes_log_variables(self) -> bool:
+        return True
+
+    def step(self, log_variables, step_index):
+        self.entered.set()
+        self.gate.wait()
+        if self.fail:
+            raise ValueError("Tracking failed.")
+        self.steps.append((log_variables, step_index))
+
+
+@pytest.fixture(scope="function")
+def recording_run(monkeypatch):
+    run = RecordingRun()
+    monkeypatch.setattr(wandb, "init", lambda **kwargs: run)
+    return run
+
+
+def test_wandb_tracker_logs_one_row_per_step(recording_run):
+    tracker = WandBTracker(OmegaConf.create({"mode": "disabled"}), OmegaConf.create(), log_interval=3)
+    tracker.reset(LOG_VARIABLES)
+    for step_index in range(1, 5):
+        tracker.step(LOG_VARIABLES, step_index)
+    assert [step for _, step in recording_run.logged] == [1, 2, 3], "Rows have not been sent every 3 steps."
+
+    tracker.close()
+    assert [step for _, step in recording_run.logged] == [1, 2, 3, 4], "Buffered rows have not been flushed."
+    assert recording_run.finished
+    assert recording_run.logged[0][0] == {
+        "Performance-Metrics/Objective-Value": 1000.0,
+        "Performance-Metrics/Output-Constraints-Met": 1,
+        "Setpoints/ProductionSpeedSetpoint": 13.26,
+        "Setpoints/Cross-lapperLayersCount": 3.0,
+        "Outputs/TensileStrengthMD": 300.0
+    }
+
+
+def test_asynchronous_tracker_keeps_all_steps_when_blocking():
+    gated_tracker = GatedTracker()
+    tracker = AsynchronousTracker(gated_tracker, queue_size=2, back_pressure="block")
+    tracker.reset(LOG_VARIABLES)
+    gated_tracker.gate.set()
+    for step_index in range(1, 11):
+        tracker.step(LOG_VARIABLES, step_index)
+    tracker.close()
+    assert [step for _, step in gated_tracker.steps] == list(range(1, 11))
+    assert gated_tracker.steps[0][0] == LOG_VARIABLES
+    assert tracker.dropped_steps == 0
+
+
+def test_asynchronous_tracker_drops_oldest_steps():
+    gated_tracker = GatedTracker()
+    tracker = AsynchronousTracker(gated_tracker, queue_size=2, back_pressure="drop_oldest")
+    tracker.reset(LOG_VARIABLES)
+    tracker.step(LOG_VARIABLES, 1)
+    gated_tracker.entered.wait()  # step 1 is being tracked, so it has left the queue.
+    for step_index in range(2, 6):
+        tracker.step(LOG_VARIABLES, step_index)
+    gated_tracker.gate.set()
+    tracker.close()
+    assert [step for _, step in gated_tracker.steps] == [1, 4, 5]
+    assert tracker.dropped_steps == 2
+
+
+def test_asynchronous_tracker_raises_errors_of_decorated_tracker():
+    gated_tracker = GatedTracker()
+    gated_tracker.fail = True
+    gated_tracker.gate.set()
+    tracker = AsynchronousTracker(gated_tracker)
+    tracker.reset(LOG_VARIABLES)
+    tracker.step(LOG_VARIABLES, 1)
+    tracker._flush()
+    with pytest.raises(RuntimeError):
+        tracker.step(LOG_VARIABLES, 2)
+    tracker.close()
+
+
+@pytest.mark.parametrize("file_format", ["hdf5", "parquet", "npy"])
+def test_columnar_tracker(tmp_path, file_format):
+    if file_format == "parquet":
+        pytest.importorskip("pyarrow")
+    path = tmp_path / {"hdf5": "log.h5", "parquet": "log.parquet", "npy": "log"}[file_format]
+    tracker_config = OmegaConf.create({"path": str(path), "format": file_format, "chunk_size": 2})
+    tracker = ColumnarTracker(tracker_config, OmegaConf.create({"seed": 1}), OmegaConf.load(ENV_CONFIG_PATH))
+    initial_log_variables = LOG_VARIABLES | {"Actions": {}}
+    tracker.reset(initial_log_variables)
+    for step_index in range(1, 5):
+        log_variables = LOG_VARIABLES | {"Actions": {"ProductionSpeedSetpoint": float(step_index)},
+                                         "Unknown": {"Variable": 1.0}}
+        tracker.step(log_variables, step_index)
+    tracker.close()
+
+    log = read_columnar(path)
+    assert list(log["Step"]) == [0, 1, 2, 3, 4]
+    assert list(log["Actions/ProductionSpeedSetpoint"])[1:] == [1.0, 2.0, 3.0, 4.0]
+    assert math.isnan(log["Actions/ProductionSpeedSetpoint"][0]), "Missing variable has not been stored as NaN."
+    assert math.isnan(log["Outputs/AreaWeightLane1"][1]), "Missing variable has not been stored as NaN."
+    assert list(log["Performance-Metrics/Objective-Value"]) == [1000.0] * 5
+    assert "Disturbances/ProductWidth" in log.columns, "Schema has not been derived from the env_setup."
+    assert "Unknown/Variable" not in log.columns
+
+
+class ListTracker(EmptyTracker):
+    def __init__(self):
+        super().__init__(OmegaConf.create(), OmegaConf.create())
+        self.steps = []
+
+    @property
+    def consumes_log_variables(self) -> bool:
+        return True
+
+    def step(self, log_variables, step_index):
+        self.steps.append(log_variables)
+
+
+def test_log_variables_are_compiled_lazily():
+    with initialize(version_base=None, config_path="test_config"):
+        config = compose(config_name="main")
+    config.action_setup.actions_are_relative = False
+    setpoints = OmegaConf.to_container(config.action_setup.initial_setpoints, resolve=True)
+
+    log_variables = []
+    for tracker in (ListTracker(), EmptyTracker(OmegaConf.create(), OmegaConf.create())):
+        factory = EnvironmentFactory(config)
+        environment = Environment(config.env_setup, factory.create_disturbance_manager(),
+                                  factory.create_action_manager(), factory.create_output_manager(),
+                                  factory.create_objective_manager(), factory.create_scenario_manager(), tracker)
+        environment.reset()
+        environment.step(setpoints)
+        log_variables.append(environment.log_vars)
+        environment.close()
+        if isinstance(tracker, ListTracker):
+            assert tracker.steps == [log_variables[-1]], "Tracker has not received the log variables."
+    eager, lazy = log_variables
+    assert {category: set(values) for category, values in eager.items()} == \
+        {category: set(values) for category, values in lazy.items()}, "Lazily compiled log variables differ."
+    for category in ("Actions", "Setpoints", "Dependent-Variables", "Disturbances"):
+        assert eager[category] == pytest.approx(lazy[category]), f"Lazily compiled {category} differ."
+
+
+def test_aggregating_tracker():
+    list_tracker = ListTracker()
+    tracker = AggregatingTracker(list_tracker, summary_interval=2, quantiles=[0.5],
+                                 categories=["Performance-Metrics", "Outputs"])
+    tracker.reset(LOG_VARIABLES)
+    for step_index, objective_value in enumerate([2000.0, 3000.0, 4000.0], start=1):
+        log_variables = LOG_VARIABLES | {
+            "Performance-Metrics": {"Objective-Value": objective_value, "Output-Constraints-Met": step_index % 2}}
+        tracker.step(log_variables, step_index)
+    assert len(list_tracker.steps) == 1, "Summary has not been emitted after 2 steps."
+    tracker.close()
+    assert len(list_tracker.steps) == 2, "Episode summary has not been emitted on close."
+
+    summary = list_tracker.steps[-1]
+    assert set(summary.keys()) == {"Performance-Metrics-Summary", "Outputs-Summary"}
+    metrics = summary["Performance-Metrics-Summary"]
+    assert metrics["Objective-Value/Count"] == 4
+    assert metrics["Objective-Value/Mean"] == pytest.approx(2500.0)
+    assert metrics["Objective-Value/Quantile-0.5"] == pytest.approx(2500.0)
+    assert metrics["Output-Constraints-Met/Violation-Rate"] == pytest.approx(0.25)
+    assert summary["Outputs-Summary"]["TensileStrengthMD/Variance"] == pytest.approx(0.0)
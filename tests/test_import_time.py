@@ -0,0 +1,41 @@
+import sys
+import json
+import subprocess
+import pathlib as pl
+
+IMPORT_TIME_BUDGET = 1.0  # seconds
+# Backends that must only be imported when the config selects them.
+OPTIONAL_BACKENDS = ("torch", "gpytorch", "sklearn", "pandas", "wandb", "asyncua", "gymnasium")
+TEST_CONFIG_PATH = pl.Path(__file__).parent / "test_config"
+
+
+def run_in_fresh_interpreter(code: str) -> dict:
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=pl.Path(__file__).parent.parent)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def test_import_time():
+    result = run_in_fresh_interpreter(
+        "import sys, time, json\n"
+        "start = time.perf_counter()\n"
+        "import adanowo_simulator.environment_factory\n"
+        "duration = time.perf_counter() - start\n"
+        f"print(json.dumps({{'duration': duration, 'backends': [m for m in {OPTIONAL_BACKENDS} if m in sys.modules]}}))"
+    )
+    assert result["backends"] == [], f"Optional backends {result['backends']} are imported with the factory."
+    assert result["duration"] < IMPORT_TIME_BUDGET, \
+        f"Importing the factory took {result['duration']:.2f} s, the budget is {IMPORT_TIME_BUDGET} s."
+
+
+def test_backends_are_not_imported_before_use():
+    result = run_in_fresh_interpreter(
+        "import sys, json\n"
+        "from hydra import initialize_config_dir, compose\n"
+        "from adanowo_simulator.environment_factory import EnvironmentFactory\n"
+        f"with initialize_config_dir(version_base=None, config_dir={str(TEST_CONFIG_PATH)!r}):\n"
+        "    config = compose(config_name='main')\n"
+        "EnvironmentFactory(config).create_environment()\n"
+        "print(json.dumps({'backends': [m for m in ('wandb', 'asyncua', 'gymnasium') if m in sys.modules]}))"
+    )
+    assert result["backends"] == [], f"Unused backends {result['backends']} are imported by the factory."
@@ -0,0 +1,103 @@
+import os
+import stat
+import threading
+from multiprocessing import AuthenticationError
+
+import numpy as np
+import pytest
+
+from hydra import initialize, compose
+from omegaconf import OmegaConf
+
+from adanowo_simulator.environment_factory import EnvironmentFactory
+from adanowo_simulator.model_server import ModelServer, ModelServerClient, ServerOutputManager, default_address
+from adanowo_simulator.output_manager import model_loader, get_path_to_output_models
+
+NUM_CLIENTS = 8
+MODEL_NAME = "tensileStrengthMDModel"
+
+
+@pytest.fixture(scope="function")
+def config(tmp_path):
+    with initialize(version_base=None, config_path="test_config"):
+        config = compose(config_name="main", overrides=["output_setup.model_server.enabled=true",
+                                                         f"output_setup.model_server.address={tmp_path}/server.sock"])
+        config.action_setup.actions_are_relative = False
+        return config
+
+
+@pytest.fixture(scope="function")
+def server(config):
+    # a long batching window, so the concurrent requests of the test are batched.
+    with ModelServer(config.output_setup.model_server.address, max_batch_size=NUM_CLIENTS, max_latency=0.5) as server:
+        yield server
+
+
+def test_environment_with_model_server(server, config):
+    environment = EnvironmentFactory(config).create_environment()
+    assert isinstance(environment.output_manager, ServerOutputManager)
+    environment.reset()
+    setpoints = OmegaConf.to_container(config.action_setup.initial_setpoints, resolve=True)
+    _, _, outputs, _ = environment.step(setpoints)
+    # a rollout sends several states per request.
+    rollout = environment.rollout([setpoints] * 5, num_samples=2)
+    environment.close()
+    assert rollout["Objective-Value"].shape == (2, 5)
+    assert all(np.isfinite(samples).all() for samples in rollout["Outputs"].values())
+    assert set(outputs.keys()) == set(config.output_setup.output_models.keys())
+    assert all(np.isfinite(value) for value in outputs.values())
+
+
+def test_dynamic_batching(server, config):
+    environment = EnvironmentFactory(config).create_environment()
+    _, state, _, _ = environment.reset()
+    environment.close()
+    states = [state | {"CardDeliveryWeightPerArea": state["CardDeliveryWeightPerArea"] + index}
+              for index in range(NUM_CLIENTS)]
+
+    clients = [ModelServerClient(server.address) for _ in range(NUM_CLIENTS)]
+    clients[0].load([MODEL_NAME])
+    predictions = [None] * NUM_CLIENTS
+    initial_statistics = clients[0].statistics()  # includes the requests of the environment.
+
+    def predict(index):
+        predictions[index] = clients[index].predict({"TensileStrengthMD": MODEL_NAME}, states[index])
+
+    threads = [threading.Thread(target=predict, args=(index,)) for index in range(NUM_CLIENTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    statistics = clients[0].statistics()
+    for client in clients:
+        client.close()
+    assert statistics["requests"] - initial_statistics["requests"] == NUM_CLIENTS
+    assert statistics["batches"] - initial_statistics["batches"] < NUM_CLIENTS, \
+        "Concurrent requests have not been batched."
+
+    mdl = model_loader(MODEL_NAME, get_path_to_output_models(None))
+    for index, (mean_pred, var_pred) in enumerate(predictions):
+        expected_mean, expected_var = mdl.predict_y(states[index], observation_noise_only=True)
+        assert mean_pred["TensileStrengthMD"].shape == expected_mean.shape
+        assert pytest.approx(expected_mean[0, 0], rel=1e-4) == mean_pred["TensileStrengthMD"][0, 0], \
+            f"Batched prediction of request {index} does not match the single prediction."
+        assert pytest.approx(expected_var[0, 0], rel=1e-4) == var_pred["TensileStrengthMD"][0, 0]
+
+
+def test_authentication(server):
+    with pytest.raises(AuthenticationError):
+        ModelServerClient(server.address, os.urandom(32))
+    # the server keeps serving clients with the key.
+    client = ModelServerClient(server.address, server.authkey)
+    assert client.statistics()["requests"] >= 0
+    client.close()
+
+
+def test_default_address(monkeypatch, tmp_path):
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    directory = os.path.dirname(default_address())
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    os.chmod(directory, 0o777)
+    with pytest.raises(PermissionError):
+        default_address()
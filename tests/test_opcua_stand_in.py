@@ -0,0 +1,90 @@
+import math
+import time
+
+import pytest
+
+from hydra import initialize, compose
+from omegaconf import OmegaConf
+
+from adanowo_simulator.environment_factory import EnvironmentFactory
+from adanowo_simulator.opcua_stand_in import OpcuaStandInServer
+
+CONFIG_NAME = "main"
+UNIT_STEP = 1
+SHADOW_TIMEOUT = 30  # seconds
+
+
+@pytest.fixture(scope="function")
+def config():
+    with initialize(version_base=None, config_path="test_config"):
+        config = compose(config_name=CONFIG_NAME, overrides=[
+            "output_setup=opcua_stand_in", "+stand_in_setup=test", "physical_execution=true"])
+        config.action_setup.actions_are_relative = False
+        return config
+
+
+@pytest.fixture(scope="function")
+def stand_in(config):
+    server = OpcuaStandInServer(config.output_setup, config.stand_in_setup, config.action_setup,
+                                config.disturbance_setup)
+    server.start()
+    yield server
+    server.close()
+
+
+@pytest.fixture(scope="function")
+def get_env(config, stand_in):
+    factory = EnvironmentFactory(config)
+    environment = factory.create_environment()
+    environment.reset()  # the scripted operator accepts the initial recommendation.
+    yield environment
+    environment.close()
+
+
+def test_operator_decisions(get_env, stand_in, config):
+    setpoints = OmegaConf.to_container(config.action_setup.initial_setpoints, resolve=True)
+    unit_step = {key: value + UNIT_STEP for key, value in setpoints.items()}
+    user_feedback_key = config.output_setup.user_feedback_key
+
+    # rejected recommendation: no measurements and the plant keeps its setpoints.
+    _, state, outputs, _ = get_env.step(unit_step)
+    assert outputs[user_feedback_key] == config.output_setup.agent_state_values["rejected"]
+    assert outputs["TensileStrengthMD"] is None, "Measurement has been served after rejection."
+    for key, value in setpoints.items():
+        assert pytest.approx(value) == state[key], f"Key '{key}' has changed after rejection."
+
+    # accepted recommendation: the plant applies the setpoints and serves simulated measurements.
+    _, state, outputs, _ = get_env.step(unit_step)
+    assert outputs[user_feedback_key] == config.output_setup.agent_state_values["accepted"]
+    for key, value in setpoints.items():
+        assert pytest.approx(value + UNIT_STEP) == state[key], f"Key '{key}' has not been applied by the plant."
+    assert pytest.approx(stand_in.outputs["TensileStrengthMD"]) == outputs["TensileStrengthMD"]
+    assert stand_in.decision_count == {"ACCEPTED": 2, "REJECTED": 1}
+
+
+def test_reconnect_after_restart(get_env, stand_in, config):
+    setpoints = OmegaConf.to_container(config.action_setup.initial_setpoints, resolve=True)
+    stand_in.restart(downtime=0.2)
+    _, state, _, _ = get_env.step(setpoints)
+    for key, value in setpoints.items():
+        assert pytest.approx(value) == state[key], f"Key '{key}' has wrong value after reconnect."
+
+
+def test_shadow_simulation(get_env, stand_in, config):
+    setpoints = OmegaConf.to_container(config.action_setup.initial_setpoints, resolve=True)
+    get_env.step(setpoints)  # rejected
+    _, _, outputs, _ = get_env.step(setpoints)  # accepted
+
+    output_manager = get_env.output_manager
+    deadline = time.monotonic() + SHADOW_TIMEOUT
+    while len(output_manager.shadow_records) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert [record["Step"] for record in output_manager.shadow_records] == [0, 2], \
+        "Shadow predictions have not been recorded for the accepted recommendations."
+
+    shadow_record = output_manager.shadow_records[-1]
+    assert pytest.approx(outputs["TensileStrengthMD"]) == shadow_record["TensileStrengthMD/Measured"]
+    deviation = abs(shadow_record["TensileStrengthMD/Predicted-Mean"] - shadow_record["TensileStrengthMD/Measured"])
+    assert deviation < 5 * math.sqrt(shadow_record["TensileStrengthMD/Predicted-Variance"]), \
+        "Shadow prediction does not match the simulated measurement."
+    assert "CardWebUnevenness/Predicted-Mean" not in shadow_record
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from hydra import initialize, compose
+
+from adanowo_simulator.optimization import CMAES, SetpointOptimizer, constrained_fitness
+from adanowo_simulator.sweep import SweepEvaluator
+
+
+@pytest.fixture(scope="function")
+def config(tmp_path):
+    with initialize(version_base=None, config_path="test_config"):
+        config = compose(config_name="main", overrides=[
+            "optimization_settings.max_generations=10", f"optimization_settings.checkpoint_path={tmp_path}/cma.pkl"])
+        return config
+
+
+def _rosenbrock(points: np.ndarray) -> np.ndarray:
+    return np.sum(100 * (points[:, 1:] - points[:, :-1] ** 2) ** 2 + (1 - points[:, :-1]) ** 2, axis=1)
+
+
+def test_cmaes():
+    strategy = CMAES(np.zeros(4), 0.5, seed=1)
+    while strategy.stop(1e-12, 1e-12) is None and strategy.generation < 2000:
+        candidates = strategy.ask()
+        strategy.tell(candidates, _rosenbrock(candidates))
+    assert strategy.mean == pytest.approx(np.ones(4), abs=1e-4)
+
+    # a strategy restored from its state continues identically.
+    copy = CMAES.from_state(strategy.state)
+    candidates = strategy.ask()
+    assert np.array_equal(copy.ask(), candidates)
+    strategy.tell(candidates, _rosenbrock(candidates))
+    copy.tell(candidates, _rosenbrock(candidates))
+    assert np.array_equal(copy.ask(), strategy.ask())
+
+
+def test_constrained_fitness():
+    fitness = constrained_fitness(np.array([5.0, 1.0, 9.0, 7.0]), np.array([0.0, 0.0, 0.5, 2.0]))
+    assert list(np.argsort(fitness)) == [0, 1, 2, 3], "Infeasible points outrank feasible points."
+
+
+def test_setpoint_optimizer(config):
+    evaluator = SweepEvaluator(config)
+    initial_setpoints = config.action_setup.initial_setpoints
+    optimizer = SetpointOptimizer(config)
+    initial_value, _ = evaluator.evaluate_objective(
+        {name: np.array([initial_setpoints[name]]) for name in optimizer.bounds})
+    result = optimizer.run()
+    # the following runs reuse the evaluator of the first one.
+    repeated = optimizer.run()
+    optimizer.close()
+    assert repeated["Setpoints"] == pytest.approx(result["Setpoints"])
+    value, violation = evaluator.evaluate_objective(
+        {name: np.array([setpoint]) for name, setpoint in result["Setpoints"].items()})
+    evaluator.close()
+    assert result["Constraints-Met"] and violation[0] == 0
+    assert result["Objective-Value"] == pytest.approx(value[0])
+    assert result["Objective-Value"] > initial_value[0]
+    assert len(optimizer.history) == result["Generations"] == 10
+
+    # a resumed search continues the checkpoint as if it was not interrupted.
+    config.optimization_settings.max_generations = 14
+    with SetpointOptimizer(config) as optimizer:
+        resumed = optimizer.run(resume=True)
+    config.optimization_settings.checkpoint_path = None
+    with SetpointOptimizer(config) as optimizer:
+        uninterrupted = optimizer.run()
+    assert resumed["Generations"] == uninterrupted["Generations"] == 14
+    assert resumed["Setpoints"] == pytest.approx(uninterrupted["Setpoints"])
+
+    config.optimization_settings.num_workers = 2
+    with SetpointOptimizer(config) as optimizer:
+        parallel = optimizer.run()
+        assert optimizer.run()["Setpoints"] == pytest.approx(parallel["Setpoints"])
+    assert parallel["Setpoints"] == pytest.approx(uninterrupted["Setpoints"])
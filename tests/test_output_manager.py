@@ -0,0 +1,23 @@
+import pytest
+
+from adanowo_simulator.output_manager import parse_cpu_list, format_cpu_list, plan_worker_cpus
+
+
+def test_cpu_list_round_trip():
+    assert parse_cpu_list("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+    assert format_cpu_list([11, 0, 1, 2, 3, 8, 10]) == "0-3,8,10-11"
+
+
+def test_plan_worker_cpus():
+    assert plan_worker_cpus(None, 3) == [None, None, None]
+    assert plan_worker_cpus({"cpus": [4, 5]}, 2) == [[4, 5], [4, 5]]
+    # blocks wrap around if there are more workers than blocks.
+    assert plan_worker_cpus({"cpus": [0, 1, 2, 3, 4, 5], "cpus_per_worker": 2}, 4) == [[0, 1], [2, 3], [4, 5], [0, 1]]
+    with pytest.raises(ValueError):
+        plan_worker_cpus({"cpus": [0, 1], "cpus_per_worker": 3}, 1)
+    # environments with different indices use different blocks.
+    settings = {"cpus": list(range(8)), "cpus_per_worker": 2}
+    assert plan_worker_cpus(settings | {"environment_index": 1}, 2) == [[4, 5], [6, 7]]
+    assert plan_worker_cpus(settings | {"environment_index": 2}, 2) == [[0, 1], [2, 3]]
+    with pytest.raises(ValueError):
+        plan_worker_cpus({"numa_node_cpus": 4096}, 1)
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+from omegaconf import OmegaConf
+
+from adanowo_simulator.scenario_manager import ScenarioTimeline
+from adanowo_simulator.scenario_source import StreamingScenarioSource
+
+
+def test_timeline_events():
+    config = OmegaConf.create({
+        "disturbances": {"CalenderTemperature": [[10, 160.0], [3, 150.0]]},
+        "output_bounds": {"AreaWeightLane1": {"lower": [[3, 350.0]], "upper": None}},
+        "output_models": {"TensileStrengthMD": [[0, "ignoredModel"], [5, "modelA"], [8, "modelB"]]}
+    })
+    timeline = ScenarioTimeline(config, first_step=1)
+    assert timeline.upcoming_output_models() == {"TensileStrengthMD": "modelA"}
+    assert timeline.upcoming_output_models() is None, "Unchanged upcoming models are reported again."
+
+    updates = {step_index: timeline.due(step_index) for step_index in range(1, 12)}
+    assert updates[3] == [(("disturbances", "CalenderTemperature", None), 150.0),
+                          (("output_bounds", "AreaWeightLane1", "lower"), 350.0)]
+    assert updates[5] == [(("output_models", "TensileStrengthMD", None), "modelA")]
+    assert updates[8] == [(("output_models", "TensileStrengthMD", None), "modelB")]
+    assert updates[10] == [(("disturbances", "CalenderTemperature", None), 160.0)]
+    assert sum(len(u) for u in updates.values()) == 5
+    assert timeline.upcoming_output_models() == dict()
+
+
+def test_timeline_random_triggers():
+    config = OmegaConf.create({
+        "disturbances": {"ProductWidth": {"trigger_interval": 4, "mean": 2.0, "range": 0.5}},
+        "output_bounds": None,
+        "output_models": None
+    })
+    timeline = ScenarioTimeline(config, first_step=1)
+    trigger_steps = [step_index for step_index in range(1, 4001) if timeline.due(step_index)]
+    assert trigger_steps == list(range(4, 4001, 4))
+    values = [timeline.due(step_index)[0][1] for step_index in range(4004, 8001, 4)]
+    assert all(1.5 <= value <= 2.5 for value in values)
+    assert len(set(values)) == len(values)
+
+
+def write_recording(path, steps, values):
+    frame = pd.DataFrame({"Step": steps, "Width": values, "Lower": np.where(steps % 2 == 0, values, np.nan)})
+    if path.suffix == ".csv":
+        frame.to_csv(path, index=False)
+    elif path.suffix == ".parquet":
+        frame.to_parquet(path)
+    else:
+        frame.to_hdf(path, key="table", format="table")
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet", ".h5"])
+def test_streaming_source(tmp_path, suffix):
+    path = tmp_path / f"recording{suffix}"
+    steps = np.arange(0, 1000, 3)
+    write_recording(path, steps, steps * 0.5)
+    source = StreamingScenarioSource(path, {"Width": "disturbances/ProductWidth",
+                                            "Lower": "output_bounds/AreaWeightLane1/lower"}, chunk_size=7)
+    updates = {step_index: source.due(step_index) for step_index in range(1, 1000)}
+    source.close()
+
+    assert updates[1] == updates[2] == []
+    assert updates[3] == [(("disturbances", "ProductWidth", None), 1.5)]
+    # empty values leave the target unchanged.
+    assert updates[6] == [(("disturbances", "ProductWidth", None), 3.0),
+                          (("output_bounds", "AreaWeightLane1", "lower"), 3.0)]
+    assert sum(len(u) for u in updates.values()) == (len(steps) - 1) + (len(steps) - 1) // 2
+
+
+def test_streaming_source_errors(tmp_path):
+    path = tmp_path / "recording.csv"
+    write_recording(path, np.array([1, 5, 3]), np.ones(3))
+    with pytest.raises(ValueError, match="Invalid scenario target"):
+        StreamingScenarioSource(path, {"Width": "output_models/TensileStrengthMD"})
+    source = StreamingScenarioSource(path, {"Width": "disturbances/ProductWidth"})
+    with pytest.raises(RuntimeError, match="Reading scenario file"):
+        source.due(10)
+    source.close()
+
+
+def test_streamed_scenario_in_timeline(tmp_path):
+    path = tmp_path / "recording.parquet"
+    write_recording(path, np.arange(1, 101), np.linspace(1.0, 2.0, 100))
+    config = OmegaConf.create({"disturbances": {"CalenderTemperature": [[4, 160.0]]}, "output_bounds": None,
+                               "output_models": None,
+                               "sources": [{"path": str(path), "targets": {"Width": "disturbances/ProductWidth"}}]})
+    timeline = ScenarioTimeline(config, first_step=4)
+    assert timeline.due(4) == [(("disturbances", "CalenderTemperature", None), 160.0),
+                               (("disturbances", "ProductWidth", None), pytest.approx(1.0 + 3 / 99))]
+    timeline.close()
+
+
+def test_timeline_snapshot(tmp_path):
+    path = tmp_path / "recording.csv"
+    write_recording(path, np.arange(1, 5001), np.arange(1, 5001) * 0.1)
+    config = OmegaConf.create({
+        "disturbances": {"ProductWidth": {"trigger_interval": 1, "mean": 2.0, "range": 0.5}},
+        "output_bounds": None,
+        "output_models": {"TensileStrengthMD": [[100, "modelA"], [3000, "modelB"]]},
+        "sources": [{"path": str(path), "targets": {"Width": "disturbances/CalenderTemperature"}, "chunk_size": 100}]
+    })
+    timeline = ScenarioTimeline(config, first_step=1)
+    for step_index in range(1, 51):
+        timeline.due(step_index)
+    snapshot = timeline.snapshot()
+    # crosses blocks of random values, chunks of the file and the model events.
+    first_branch = [timeline.due(step_index) for step_index in range(51, 4001)]
+    timeline.restore(snapshot)
+    assert timeline.upcoming_output_models() == {"TensileStrengthMD": "modelA"}
+    second_branch = [timeline.due(step_index) for step_index in range(51, 4001)]
+    timeline.close()
+    assert first_branch == second_branch
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from hydra import initialize, compose
+
+from adanowo_simulator.sensitivity import SaltelliDesign, MorrisDesign, SensitivityAnalysis, sobol_indices, \
+    morris_indices
+
+ISHIGAMI_BOUNDS = {f"x{index}": (-np.pi, np.pi) for index in range(3)}
+
+
+def ishigami(points: dict[str, np.ndarray]) -> np.ndarray:
+    return np.sin(points["x0"]) + 7 * np.sin(points["x1"]) ** 2 + 0.1 * points["x2"] ** 4 * np.sin(points["x0"])
+
+
+def test_sobol_indices_of_ishigami_function():
+    design = SaltelliDesign(ISHIGAMI_BOUNDS, 4096, seed=1)
+    assert len(design) == 4096 * 5
+    # chunks that cross the sample matrices.
+    values = np.concatenate([ishigami(design.points(start, min(start + 3000, len(design))))
+                             for start in range(0, len(design), 3000)])
+    indices = sobol_indices(values, design.base_samples, 3)
+    assert indices["First-Order"] == pytest.approx([0.314, 0.442, 0.0], abs=0.03)
+    assert indices["Total"] == pytest.approx([0.558, 0.442, 0.244], abs=0.03)
+    assert np.all(indices["First-Order-Lower"] <= indices["First-Order"])
+    assert np.all(indices["Total"] <= indices["Total-Upper"])
+    with pytest.raises(ValueError, match="power of two"):
+        SaltelliDesign(ISHIGAMI_BOUNDS, 100)
+
+
+def test_morris_indices_of_linear_function():
+    design = MorrisDesign(ISHIGAMI_BOUNDS, 50, num_levels=4, seed=1)
+    points = design.points(0, len(design))
+    for lower, upper in ISHIGAMI_BOUNDS.values():
+        assert all(np.all((lower - 1e-9 <= values) & (values <= upper + 1e-9)) for values in points.values())
+    # effects are per unit of the normalized setpoint range.
+    values = 3 * points["x0"] - points["x2"]
+    indices = morris_indices(design.elementary_effects(values))
+    assert indices["Mu"] == pytest.approx([3 * 2 * np.pi, 0.0, -2 * np.pi])
+    assert indices["Mu-Star"] == pytest.approx([3 * 2 * np.pi, 0.0, 2 * np.pi])
+    assert indices["Sigma"] == pytest.approx([0.0, 0.0, 0.0], abs=1e-9)
+
+
+@pytest.mark.parametrize("method", ["sobol", "morris"])
+def test_sensitivity_analysis(method):
+    with initialize(version_base=None, config_path="test_config"):
+        config = compose(config_name="main", overrides=[
+            f"sensitivity_settings.method={method}", "sensitivity_settings.base_samples=256",
+            "sensitivity_settings.num_trajectories=20", "sensitivity_settings.chunk_size=500",
+            "sensitivity_settings.setpoints=[Cross-lapperLayersCount,ProductionSpeedSetpoint,v_PreRoll]"])
+    analysis = SensitivityAnalysis(config)
+    results = analysis.run()
+    assert len(results) == 3 * len(config.output_setup.output_models)
+    results = results.set_index(["Output", "Setpoint"])
+    index = "Total" if method == "sobol" else "Mu-Star"
+    # the models do not depend on v_PreRoll.
+    assert results.loc[("TensileStrengthMD", "v_PreRoll"), index] == pytest.approx(0.0, abs=1e-6)
+    assert results.loc[("TensileStrengthMD", "Cross-lapperLayersCount"), index] > 0.1
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from adanowo_simulator.streaming_statistics import RunningMoments, P2Quantile, VariableStatistics
+
+NUM_VALUES = 20000
+
+
+def test_running_moments():
+    values = np.random.default_rng(0).normal(5.0, 2.0, NUM_VALUES)
+    moments = RunningMoments()
+    for value in values:
+        moments.update(value)
+    assert moments.count == NUM_VALUES
+    assert pytest.approx(values.mean()) == moments.mean
+    assert pytest.approx(values.var(ddof=1)) == moments.variance
+    assert (values.min(), values.max()) == (moments.min, moments.max)
+
+
+@pytest.mark.parametrize("p", [0.05, 0.5, 0.95])
+def test_p2_quantile(p):
+    values = np.random.default_rng(1).lognormal(0.0, 0.5, NUM_VALUES)
+    quantile = P2Quantile(p)
+    for value in values[:3]:
+        quantile.update(value)
+    assert pytest.approx(np.quantile(values[:3], p)) == quantile.value, "Quantile of few values is not exact."
+    for value in values[3:]:
+        quantile.update(value)
+    assert pytest.approx(np.quantile(values, p), rel=0.02) == quantile.value
+
+
+def test_constraint_statistics():
+    statistics = VariableStatistics([0.5], is_constraint=True)
+    for value in [1, 0, 1, None, 1]:
+        statistics.update(value)
+    assert statistics.summary() == {"Count": 4, "Violations": 1, "Violation-Rate": 0.25}
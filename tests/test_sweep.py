@@ -0,0 +1,106 @@
+import itertools
+
+import numpy as np
+import pytest
+from hydra import initialize, compose
+
+from adanowo_simulator.columnar_storage import read_columnar
+from adanowo_simulator.environment_factory import EnvironmentFactory
+from adanowo_simulator.sweep import FullFactorialDesign, LatinHypercubeDesign, SetpointSweep, sweep_bounds, \
+    JITTER_BLOCK_SIZE
+
+SWEPT_SETPOINTS = ["CardDeliveryWeightPerArea", "Cross-lapperLayersCount", "ProductionSpeedSetpoint"]
+
+
+@pytest.fixture(scope="function")
+def config(tmp_path):
+    with initialize(version_base=None, config_path="test_config"):
+        config = compose(config_name="main", overrides=[
+            "sweep_settings.num_points=200", "sweep_settings.chunk_size=64", f"sweep_settings.path={tmp_path}/sweep.h5",
+            f"sweep_settings.setpoints=[{','.join(SWEPT_SETPOINTS)}]"])
+        return config
+
+
+def test_full_factorial_design():
+    bounds = {"A": (0.0, 1.0), "B": (10.0, 20.0), "C": (-1.0, 1.0)}
+    design = FullFactorialDesign(bounds, {"A": 2, "B": 3, "C": 4})
+    assert len(design) == 24
+    expected = list(itertools.product(np.linspace(0, 1, 2), np.linspace(10, 20, 3), np.linspace(-1, 1, 4)))
+    chunks = [design.points(start, min(start + 5, len(design))) for start in range(0, len(design), 5)]
+    points = list(zip(*(np.concatenate([chunk[name] for chunk in chunks]) for name in bounds)))
+    assert points == pytest.approx(expected)
+
+
+def test_latin_hypercube_design():
+    bounds = {"A": (0.0, 1.0), "B": (10.0, 20.0)}
+    num_points = JITTER_BLOCK_SIZE + 1000
+    design = LatinHypercubeDesign(bounds, num_points, seed=3)
+    points = design.points(0, num_points)
+    for name, (lower, upper) in bounds.items():
+        strata = np.floor((points[name] - lower) / (upper - lower) * num_points)
+        assert np.array_equal(np.sort(strata), np.arange(num_points)), f"Strata of {name} are not used exactly once."
+    # chunks across the jitter blocks reproduce the same points.
+    start, stop = JITTER_BLOCK_SIZE - 10, JITTER_BLOCK_SIZE + 10
+    assert np.array_equal(design.points(start, stop)["B"], points["B"][start:stop])
+    assert np.array_equal(LatinHypercubeDesign(bounds, num_points, seed=3).points(0, 100)["A"], points["A"][:100])
+
+
+def test_sweep_bounds(config):
+    assert sweep_bounds(config.action_setup, ["ProductionSpeedSetpoint"]) == {
+        "ProductionSpeedSetpoint": (config.action_setup.setpoint_bounds.ProductionSpeedSetpoint.lower,
+                                    config.action_setup.setpoint_bounds.ProductionSpeedSetpoint.upper)}
+    with pytest.raises(ValueError, match="Unknown setpoint"):
+        sweep_bounds(config.action_setup, ["Missing"])
+
+
+def test_vectorized_setpoint_constraints(config):
+    environment = EnvironmentFactory(config).create_environment()
+    environment.reset()
+    action_manager = environment.action_manager
+    disturbances = environment.disturbance_manager.step()
+    design = LatinHypercubeDesign(sweep_bounds(config.action_setup), 20)
+    setpoints = design.points(0, 20)
+    setpoints["ProductionSpeedSetpoint"] = setpoints["ProductionSpeedSetpoint"] * 1.5  # some points are infeasible.
+    dependent_variables, setpoints_okay, dependent_variables_okay = action_manager.evaluate_setpoints(
+        setpoints, disturbances)
+    for index in range(20):
+        point = {name: float(values[index]) for name, values in setpoints.items()}
+        _, expected_dependent_variables, expected_setpoints_okay, expected_dependent_variables_okay = \
+            action_manager.step(point, disturbances)
+        if all((expected_setpoints_okay | expected_dependent_variables_okay).values()):
+            # step keeps the previous setpoints otherwise.
+            assert dependent_variables["MassThroughput"][index] == \
+                pytest.approx(expected_dependent_variables["MassThroughput"])
+        assert setpoints_okay[index] == all(expected_setpoints_okay.values())
+        assert dependent_variables_okay[index] == all(expected_dependent_variables_okay.values())
+    environment.close()
+
+
+def test_setpoint_sweep(config):
+    summary = SetpointSweep(config).run()
+    frame = read_columnar(config.sweep_settings.path)
+    assert summary["Points"] == 200
+    assert summary["Feasible-Points"] == len(frame) > 0
+    assert frame["Point"].is_monotonic_increasing
+    fixed_setpoint = config.action_setup.initial_setpoints.Needleloom1DraftRatio
+    assert frame["Setpoints/Needleloom1DraftRatio"].eq(fixed_setpoint).all(), "Setpoints that are not swept vary."
+    for bound_type, comparison in (("lower", np.greater_equal), ("upper", np.less_equal)):
+        bound = config.action_setup.dependent_variable_bounds.MassThroughput[bound_type]
+        assert comparison(frame["Dependent-Variables/MassThroughput"], bound).all(), "Infeasible points are written."
+    assert frame[[f"Outputs/{name}" for name in config.output_setup.output_models]].notna().all().all()
+
+    # the objective is evaluated for the mean outputs.
+    environment = EnvironmentFactory(config).create_environment()
+    environment.reset()
+    row = frame.iloc[0]
+    state = {column.split("/")[1]: row[column] for column in frame.columns
+             if column.split("/")[0] in ("Disturbances", "Setpoints", "Dependent-Variables")}
+    outputs = {name: row[f"Outputs/{name}"] for name in config.output_setup.output_models}
+    objective_value, _ = environment.objective_manager.step(state, outputs, dict(), dict())
+    environment.close()
+    assert row["Performance-Metrics/Objective-Value"] == pytest.approx(objective_value)
+
+    config.sweep_settings.num_workers = 2
+    SetpointSweep(config).run(config.sweep_settings.path.replace("sweep.h5", "parallel_sweep.h5"))
+    parallel_frame = read_columnar(config.sweep_settings.path.replace("sweep.h5", "parallel_sweep.h5"))
+    assert parallel_frame.equals(frame), "Parallel sweep differs from sequential sweep."